@@ -0,0 +1,78 @@
+# This script compares the performance of two git revisions of idealreport.
+# Each revision is checked out into a temporary git worktree and measured by benchmarks/run.py
+# of the current checkout (so both revisions run the same cases).
+#
+# Usage:
+#   python benchmarks/compare.py master HEAD                 # all cases
+#   python benchmarks/compare.py v0.15 HEAD --quick          # only the smaller cases
+#   python benchmarks/compare.py HEAD~1 HEAD --filter table  # other options are passed to run.py
+#
+# Ratios are new / old: below 1.0 means the second revision is faster (or smaller).
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def run_revision(repo, revision, run_args, work_dir):
+    """ measure one revision in a temporary worktree
+        Returns:
+            dict of results (see run.py) by (name, params) key
+    """
+    worktree = os.path.join(work_dir, "worktree")
+    output = os.path.join(work_dir, "results.json")
+    subprocess.check_call(["git", "worktree", "add", "--detach", worktree, revision], cwd=repo)
+    try:
+        run_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run.py")
+        subprocess.check_call([sys.executable, run_py, "--path", worktree, "--output", output] + run_args)
+        with open(output) as f:
+            results = json.load(f)["results"]
+    finally:
+        subprocess.call(["git", "worktree", "remove", "--force", worktree], cwd=repo)
+        if os.path.exists(output):
+            os.remove(output)
+    return {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in results}
+
+
+def ratio(new, old):
+    """ new / old as text """
+    if not old:
+        return "-"
+    return "%.2f" % (float(new) / old)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare the performance of two git revisions of idealreport")
+    parser.add_argument("old", help="baseline revision (e.g. master)")
+    parser.add_argument("new", help="revision to compare (e.g. HEAD)")
+    args, run_args = parser.parse_known_args()
+
+    repo = subprocess.check_output(["git", "rev-parse", "--show-toplevel"]).decode("utf-8").strip()
+    work_dir = tempfile.mkdtemp(prefix="idealreport-compare-")
+    try:
+        print("==== %s ====" % args.old)
+        old = run_revision(repo, args.old, run_args, work_dir)
+        print("==== %s ====" % args.new)
+        new = run_revision(repo, args.new, run_args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("")
+    print("%-10s %-32s %10s %10s %6s %8s %8s %12s" % ("case", "params", "old s", "new s", "time", "memory", "output", "new bytes"))
+    for key in old:
+        if key not in new:
+            continue
+        (o, n) = (old[key], new[key])
+        label = " ".join("%s=%s" % (k, v) for (k, v) in sorted(o["params"].items()))
+        print(
+            "%-10s %-32s %10.4f %10.4f %6s %8s %8s %12d"
+            % (o["name"], label, o["seconds"], n["seconds"], ratio(n["seconds"], o["seconds"]), ratio(n["peak_bytes"], o["peak_bytes"]), ratio(n["output_bytes"], o["output_bytes"]), n["output_bytes"])
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+# This script measures the performance of the report pipeline:
+# - table: create_html.table() of 1k to 1M cells, with and without MultiIndex columns
+# - serialize: create_html.dataframe_to_dict() of 1k to 10M points, numeric or datetime index
+# - plot: PlotSpec.line() HTML of 1k to 10M points, numeric or datetime index
+# - report: Reporter with 10 to 2000 plots, saved to a temporary directory
+# - time: PlotSpec.time() of 1 to 3 years of minute bars, with time_format (categorical) or skip_gaps
+# - json: create_html.plotly() of 100k to 10M points (numpy arrays), or create_html.plot() of a line plot of a
+#   DataFrame of as many points, with each installed JSON engine
+# - precision: PlotSpec.line() HTML of 100k to 10M points at full precision, 4 significant digits, ".2f" or "float32"
+# - compress: 10 MB of report HTML written through compress.CompressedWriter at each gzip and brotli level
+#   (MB/s = 10 / seconds; the output size is the compressed size)
+# - downsample: downsample.downsample() of 1M and 10M rows (datetime index, 4 random walks) to 5000 points, lttb or minmax
+#   (the output size is the number of rows kept)
+#
+# For each case it records the wall time (best of --repeat runs), the peak memory allocated
+# during one more run (tracemalloc) and the size of the output (characters of HTML/JSON).
+#
+# Usage:
+#   python benchmarks/run.py                       # all cases
+#   python benchmarks/run.py --quick               # only the smaller cases
+#   python benchmarks/run.py --filter table        # cases whose name contains "table"
+#   python benchmarks/run.py --output results.json # also save the results (see compare.py)
+#
+# The cases only use the API of older versions too (except json, precision, compress, downsample and time with skip_gaps, which are
+# skipped where they are not supported), so compare.py can run them against any revision.
+
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+# ======== cases ========
+# each case is (name, list of params dicts, setup(params) -> state (None to skip), run(state) -> output size, teardown)
+
+QUICK_LIMIT = 100000  # largest cells/points/plots * points of a --quick run
+
+
+def setup_table(params):
+    """ DataFrame of params["cells"] cells (10 columns of floats, ints and strings) """
+    rows = params["cells"] // 10
+    rng = np.random.RandomState(0)
+    data = {}
+    for j in range(10):
+        if j % 3 == 0:
+            data["str %d" % j] = np.array(["item <%d> & co" % i for i in rng.randint(0, 1000, rows)], dtype=object)
+        elif j % 3 == 1:
+            data["int %d" % j] = rng.randint(-(10 ** 6), 10 ** 6, rows)
+        else:
+            data["float %d" % j] = rng.randn(rows) * 1000
+    df = pd.DataFrame(data)
+    if params["multiindex"]:
+        df.columns = pd.MultiIndex.from_tuples([("group %d" % (j // 4), name) for (j, name) in enumerate(df.columns)])
+    return df
+
+
+def run_table(df):
+    import idealreport
+
+    return len(str(idealreport.create_html.table(df)))
+
+
+def setup_points(params):
+    """ DataFrame of params["points"] points in 2 columns """
+    n = params["points"] // 2
+    rng = np.random.RandomState(0)
+    if params["index"] == "datetime":
+        index = pd.date_range("2020-01-01", periods=n, freq="s")
+    else:
+        index = pd.RangeIndex(n).astype("float64")
+    return pd.DataFrame({"a": rng.randn(n).cumsum(), "b": rng.randn(n).cumsum()}, index=index)
+
+
+def run_serialize(df):
+    import idealreport
+
+    return len(json.dumps(idealreport.create_html.dataframe_to_dict(df)))
+
+
+def run_plot(df):
+    import idealreport
+
+    ps = idealreport.plot.PlotSpec(return_html=True)
+    html = str(ps.line(df, title="benchmark"))
+    idealreport.create_html.NEXT_PLOT_INDEX = 1  # (reset_plot_index() does not exist in older versions)
+    return len(html)
+
+
+def setup_report(params):
+    """ params["plots"] DataFrames of 1000 points each, and a temporary output directory """
+    rng = np.random.RandomState(0)
+    index = pd.date_range("2020-01-01", periods=500, freq="min")
+    dfs = [pd.DataFrame({"a": rng.randn(500).cumsum(), "b": rng.randn(500).cumsum()}, index=index) for i in range(params["plots"])]
+    return (dfs, tempfile.mkdtemp(prefix="idealreport-benchmark-"))
+
+
+def run_report(state):
+    import idealreport
+
+    (dfs, output_path) = state
+    output_file = os.path.join(output_path, "report.html")
+    r = idealreport.Reporter(title="benchmark", output_file=output_file)
+    for (i, df) in enumerate(dfs):
+        r.h += r.plot.line(df, title="plot %d" % i)
+    r.generate()
+    return os.path.getsize(output_file)
+
+
+def teardown_report(state):
+    shutil.rmtree(state[1], ignore_errors=True)
+
+
+def setup_minute_bars(params):
+    """ minute bars (09:30 to 16:00 on weekdays) of params["years"] years, or None if the mode is not supported """
+    import idealreport
+
+    if params["mode"] == "skip_gaps" and "skip_gaps" not in inspect.signature(idealreport.plot.PlotSpec.time).parameters:
+        return None
+    days = pd.bdate_range("2018-01-01", periods=261 * params["years"])
+    minutes = pd.timedelta_range("09:30:00", "15:59:00", freq="min")
+    index = pd.DatetimeIndex((days.values[:, None] + minutes.values[None, :]).ravel())
+    df = pd.DataFrame({"price": np.random.RandomState(0).randn(len(index)).cumsum()}, index=index)
+    return (df, params["mode"])
+
+
+def run_minute_bars(state):
+    import idealreport
+
+    (df, mode) = state
+    ps = idealreport.plot.PlotSpec(return_html=True)
+    if mode == "skip_gaps":
+        html = str(ps.time(df, skip_gaps=True))
+    else:
+        html = str(ps.time(df, time_format="%Y-%m-%d %H:%M"))
+    idealreport.create_html.NEXT_PLOT_INDEX = 1
+    return len(html)
+
+
+def setup_json(params):
+    """ plotly data of params["points"] points as numpy arrays, or a line plot spec of a DataFrame of
+        params["points"] points (see setup_points), or None if the engine is not available
+    """
+    import idealreport
+
+    if not hasattr(idealreport.serialize, "set_json_engine"):
+        return None
+    try:
+        idealreport.serialize._engine_module(params["engine"])
+    except ImportError:
+        return None
+    if params["data"] == "dataframe":
+        df = setup_points({"points": params["points"], "index": "numeric"})
+        return ({"title": "benchmark", "data": [{"df": df, "type": "line"}]}, params["engine"])
+    n = params["points"] // 2
+    rng = np.random.RandomState(0)
+    data = [{"x": np.arange(n, dtype="float64"), "y": rng.randn(n).cumsum(), "type": "scatter"}]
+    return (data, params["engine"])
+
+
+def run_json(state):
+    import idealreport
+
+    (data, engine) = state
+    if isinstance(data, dict):
+        html = str(idealreport.create_html.plot(data, json_engine=engine))
+    else:
+        html = str(idealreport.create_html.plotly(data, {"title": "benchmark"}, json_engine=engine))
+    idealreport.create_html.NEXT_PLOT_INDEX = 1
+    return len(html)
+
+
+def setup_precision(params):
+    """ DataFrame of params["points"] points (see setup_points) and a precision, or None if precision is not supported """
+    import idealreport
+
+    if params["precision"] != "full" and "precision" not in inspect.signature(idealreport.plot.PlotSpec.line).parameters:
+        return None
+    df = setup_points({"points": params["points"], "index": "numeric"})
+    return (df, None if params["precision"] == "full" else params["precision"])
+
+
+def run_precision(state):
+    import idealreport
+
+    (df, precision) = state
+    ps = idealreport.plot.PlotSpec(return_html=True)
+    html = str(ps.line(df, title="benchmark") if precision is None else ps.line(df, title="benchmark", precision=precision))
+    idealreport.create_html.NEXT_PLOT_INDEX = 1
+    return len(html)
+
+
+def setup_compress(params):
+    """ about 10 MB of report HTML (plots of random walks), a temporary file and the compression, or None if not supported """
+    import idealreport
+
+    if not hasattr(idealreport, "compress"):
+        return None
+    if params["encoding"] == "brotli":
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            return None
+    rng = np.random.RandomState(0)
+    ps = idealreport.plot.PlotSpec(return_html=True)
+    parts = []
+    while sum(len(p) for p in parts) < 10 * 10 ** 6:
+        parts.append(str(ps.line(pd.DataFrame({"a": rng.randn(10000).cumsum(), "b": rng.randn(10000).cumsum()}), title="plot %d" % len(parts))))
+    idealreport.create_html.NEXT_PLOT_INDEX = 1
+    (fd, path) = tempfile.mkstemp(prefix="idealreport-benchmark-", suffix=".html.gz")
+    os.close(fd)
+    return (parts, path, params["encoding"], params["level"])
+
+
+def run_compress(state):
+    import idealreport
+
+    (parts, path, encoding, level) = state
+    writer = idealreport.compress.CompressedWriter(path, encoding, level)
+    for part in parts:
+        writer.write(part)
+    writer.close()
+    return writer.bytes_out
+
+
+def teardown_compress(state):
+    os.remove(state[1])
+
+
+def setup_downsample(params):
+    """ DataFrame of params["rows"] rows of 4 random walks (datetime index) and a method, or None if downsampling is not supported """
+    import idealreport
+
+    if not hasattr(idealreport, "downsample"):
+        return None
+    rng = np.random.RandomState(0)
+    index = pd.date_range("2000-01-01", periods=params["rows"], freq="s")
+    df = pd.DataFrame(rng.randn(params["rows"], 4).cumsum(axis=0), index=index, columns=["a", "b", "c", "d"])
+    return (df, params["method"])
+
+
+def run_downsample(state):
+    import idealreport
+
+    (df, method) = state
+    return len(idealreport.downsample.downsample(df, 5000, method))
+
+
+CASES = [
+    ("table", [{"cells": c, "multiindex": m} for c in [1000, 10000, 100000, 1000000] for m in [False, True]], setup_table, run_table, None),
+    ("serialize", [{"points": p, "index": i} for p in [1000, 100000, 1000000, 10000000] for i in ["numeric", "datetime"]], setup_points, run_serialize, None),
+    ("plot", [{"points": p, "index": i} for p in [1000, 100000, 1000000, 10000000] for i in ["numeric", "datetime"]], setup_points, run_plot, None),
+    ("report", [{"plots": p} for p in [10, 100, 500, 2000]], setup_report, run_report, teardown_report),
+    ("time", [{"years": y, "mode": m} for y in [1, 3] for m in ["time_format", "skip_gaps"]], setup_minute_bars, run_minute_bars, None),
+    ("json", [{"points": p, "data": d, "engine": e} for p in [100000, 1000000, 10000000] for d in ["arrays", "dataframe"] for e in ["json", "orjson", "rapidjson"]], setup_json, run_json, None),
+    ("precision", [{"points": p, "precision": q} for p in [100000, 1000000, 10000000] for q in ["full", 4, ".2f", "float32"]], setup_precision, run_precision, None),
+    ("compress", [{"encoding": "gzip", "level": l} for l in range(1, 10)] + [{"encoding": "brotli", "level": l} for l in range(0, 12)], setup_compress, run_compress, teardown_compress),
+    ("downsample", [{"rows": r, "method": m} for r in [1000000, 10000000] for m in ["lttb", "minmax"]], setup_downsample, run_downsample, None),
+]
+
+
+def case_size(params):
+    """ size of a case (compared with QUICK_LIMIT) """
+    return params.get("cells", 0) + params.get("points", 0) + params.get("rows", 0) + params.get("plots", 0) * 1000 + params.get("years", 0) * 101790
+
+
+# ======== runner ========
+
+
+def measure(setup, run, teardown, params, repeat):
+    """ run one case
+        Returns:
+            dict with seconds (best of repeat runs), peak_bytes (tracemalloc) and output_bytes,
+            or None if the case is not supported
+    """
+    state = setup(params)
+    if state is None:
+        return None
+    try:
+        seconds = []
+        with contextlib.redirect_stdout(io.StringIO()):  # Reporter.generate() prints the file name
+            for i in range(repeat):
+                start = time.perf_counter()
+                output_bytes = run(state)
+                seconds.append(time.perf_counter() - start)
+            tracemalloc.start()
+            try:
+                run(state)
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        if teardown is not None:
+            teardown(state)
+    return {"seconds": min(seconds), "peak_bytes": peak_bytes, "output_bytes": output_bytes}
+
+
+def git_revision(path):
+    """ git revision (commit hash) of path, or None """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=path, stderr=subprocess.DEVNULL).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark the idealreport pipeline")
+    parser.add_argument("--path", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), help="directory containing the idealreport package to measure")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="only run the cases of at most %d cells/points" % QUICK_LIMIT)
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs per case (the best is reported)")
+    parser.add_argument("--output", help="JSON file to save the results to")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, args.path)
+    import idealreport
+
+    results = []
+    for (name, params_list, setup, run, teardown) in CASES:
+        if args.filter not in name:
+            continue
+        for params in params_list:
+            if args.quick and case_size(params) > QUICK_LIMIT:
+                continue
+            result = measure(setup, run, teardown, params, args.repeat)
+            if result is None:
+                continue
+            result.update({"name": name, "params": params})
+            results.append(result)
+            label = " ".join("%s=%s" % (k, v) for (k, v) in sorted(params.items()))
+            print("%-10s %-32s %9.4fs %9.1f MB peak %12d bytes" % (name, label, result["seconds"], result["peak_bytes"] / 1e6, result["output_bytes"]))
+            sys.stdout.flush()
+
+    if args.output:
+        info = {
+            "revision": git_revision(args.path),
+            "path": os.path.abspath(args.path),
+            "idealreport": os.path.dirname(os.path.abspath(idealreport.__file__)),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(info, f, indent=1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
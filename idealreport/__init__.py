@@ -1,3 +1,14 @@
+__version__ = "0.15"
+
+from idealreport import downsample
+from idealreport import serialize
+from idealreport import compress
+from idealreport import frequency
 from idealreport import create_html
-from idealreport.reporter import Reporter
+from idealreport import sink
+from idealreport import live
 from idealreport import plot
+from idealreport.reporter import Reporter
+from idealreport import batch
+from idealreport import cache
+from idealreport import timeaxis
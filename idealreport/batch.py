@@ -0,0 +1,124 @@
+""" The batch module contains:
+    ReportJob class describing one report to build
+    ReportResult class with the outcome (timings or error) of one ReportJob
+    generate_many() to build and save many reports across a pool of processes
+"""
+
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import idealreport
+
+
+class ReportJob(object):
+    """ a report to build and save
+        builder(*args, **kwargs) must return an idealreport.Reporter whose generate() has not been called;
+        it runs in a worker process, so builder and its arguments must be picklable
+        (e.g. a module level function and DataFrames)
+        Attributes:
+            builder (callable): creates the report
+            args (tuple): positional arguments of builder
+            kwargs (dict): keyword arguments of builder
+            name (str): name used in the results (default: builder name and job number)
+    """
+
+    def __init__(self, builder, args=(), kwargs=None, name=None):
+        self.builder = builder
+        self.args = tuple(args)
+        self.kwargs = kwargs if kwargs is not None else {}
+        self.name = name
+
+
+class ReportResult(object):
+    """ outcome of one ReportJob
+        Attributes:
+            name (str): name of the job
+            output_file (str): file the report was saved to (None if the build failed)
+            build_seconds (float): time spent in the builder
+            save_seconds (float): time spent in Reporter.generate()
+            error (str): traceback if the job failed, else None
+            lib_dir (str): directory the report expects the library files (css/js) in
+            asset_mode (str): how the report deploys its library files ("copy", "hardlink" or "symlink")
+            compress_libs (tuple): encodings of the precompressed copies of the library files (e.g. ("gzip",))
+    """
+
+    def __init__(self, name, output_file=None, build_seconds=0.0, save_seconds=0.0, error=None, lib_dir=None, asset_mode="copy", compress_libs=()):
+        self.name = name
+        self.output_file = output_file
+        self.lib_dir = lib_dir
+        self.asset_mode = asset_mode
+        self.compress_libs = compress_libs
+        self.build_seconds = build_seconds
+        self.save_seconds = save_seconds
+        self.error = error
+
+    @property
+    def ok(self):
+        """ True if the report was saved """
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "ReportResult(%r, %r, %.3fs)" % (self.name, self.output_file, self.build_seconds + self.save_seconds)
+        return "ReportResult(%r, failed: %s)" % (self.name, self.error.strip().splitlines()[-1])
+
+
+def generate_many(jobs, max_workers=None):
+    """ build and save many reports in parallel processes
+        A failing job does not stop the others; its ReportResult holds the traceback.
+        The workers do not copy the HTML library files (css/js); they are copied once into each
+        output (or shared lib_dir) directory after the reports are saved.
+        Each job starts from a reset plot counter, so the HTML does not depend on the number of workers.
+        Args:
+            jobs (list): ReportJob objects, or (builder, args) / (builder, args, kwargs) tuples
+            max_workers (int): number of processes (default: number of CPUs); 1 --> build in this process
+        Returns:
+            list of ReportResult, in the order of jobs
+    """
+    jobs = [_as_job(job, i) for (i, job) in enumerate(jobs)]
+
+    if max_workers == 1:
+        results = [_run_job(job) for job in jobs]
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_job, job) for job in jobs]
+            for (job, future) in zip(jobs, futures):
+                try:
+                    results.append(future.result())
+                except Exception:  # e.g. the job could not be pickled or the worker died
+                    results.append(ReportResult(job.name, error=traceback.format_exc()))
+
+    # one copy of the library files per directory
+    lib_dirs = set((result.lib_dir, result.asset_mode, result.compress_libs) for result in results if result.ok)
+    for (lib_dir, asset_mode, compress_libs) in sorted(lib_dirs):
+        idealreport.create_html.copy_libs(lib_dir, asset_mode, compress_libs)
+    return results
+
+
+def _as_job(job, i):
+    """ helper function to convert a tuple to a ReportJob and name unnamed jobs """
+    if not isinstance(job, ReportJob):
+        job = ReportJob(*job)
+    if job.name is None:
+        job.name = "%s-%d" % (getattr(job.builder, "__name__", "report"), i)
+    return job
+
+
+def _run_job(job):
+    """ helper function to build and save one report (in a worker process; generate_many() copies the library files) """
+    idealreport.create_html.reset_plot_index()
+    start = time.time()
+    try:
+        reporter = job.builder(*job.args, **job.kwargs)
+        built = time.time()
+        reporter.generate(copy_libs=False)
+        lib_dir = reporter.lib_dir if reporter.lib_dir is not None else os.path.dirname(reporter.output_file)
+        compress_libs = tuple(idealreport.compress._encodings(reporter.compress_libs))
+        return ReportResult(job.name, reporter.output_file, built - start, time.time() - built, lib_dir=lib_dir, asset_mode=reporter.asset_mode, compress_libs=compress_libs)
+    except Exception:
+        return ReportResult(job.name, build_seconds=time.time() - start, error=traceback.format_exc())
+    finally:
+        idealreport.create_html.reset_plot_index()
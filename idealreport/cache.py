@@ -0,0 +1,200 @@
+""" The cache module contains:
+    FragmentCache class to keep rendered HTML fragments (tables, plots, sections of a report)
+        on disk, keyed by a hash of their inputs, so unchanged sections are not rendered again
+    hash_key() to combine the inputs of a fragment (DataFrames, arguments) into a cache key
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import idealreport
+
+
+class FragmentCache(object):
+    """ class to store HTML fragments in a directory, evicting the least recently used
+        fragments once the files exceed max_bytes
+
+        Fragments can contain plots: their plot IDs (allocated from a ReportContext) are stored
+        relative to the first ID of the fragment and renumbered when the fragment is reused,
+        so a cached fragment can be spliced anywhere in a report.
+
+        Attributes:
+            cache_dir (str): directory of the cached fragments
+            max_bytes (int): maximum total size of the cached fragments
+            hits (int): number of get() calls that found a fragment
+            misses (int): number of get() calls that did not
+    """
+
+    def __init__(self, cache_dir, max_bytes=256 << 20):
+        """ Args:
+                cache_dir (str): directory of the cached fragments (created if needed)
+                max_bytes (int): maximum total size of the cached fragments
+        """
+        if max_bytes < 1:
+            raise Exception("idealreport.cache.FragmentCache() max_bytes must be positive")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        idealreport.create_html._makedirs(cache_dir)
+
+    def clear(self):
+        """ remove every cached fragment """
+        for fn in self._files():
+            _remove(os.path.join(self.cache_dir, fn))
+
+    def get(self, key, context=None):
+        """ look up a fragment
+            Args:
+                key (str): cache key (see hash_key())
+                context (create_html.ReportContext): allocates new IDs for the plots of the fragment
+            Returns:
+                HTML (str), or None if the fragment is not cached
+        """
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                header = f.readline()
+                html = f.read()
+        except IOError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path, None)  # most recently used
+        except OSError:
+            pass
+        prefix, count = header.split()
+        count = int(count)
+        if count:
+            if context is None:
+                raise Exception("idealreport.cache.FragmentCache.get() fragments with plots need a context")
+            first = context.reserve_plot_ids(count)
+            html = _renumber(html, prefix, 1, count, first, context.prefix)
+        return html
+
+    def put(self, key, html, context=None, first_plot_index=None):
+        """ store a fragment, then evict the least recently used fragments if the cache is too large
+            Args:
+                key (str): cache key (see hash_key())
+                html (str): HTML fragment
+                context (create_html.ReportContext): context the plots of the fragment were created with
+                first_plot_index (int): context.next_plot_index before the fragment was created
+                    (the IDs from first_plot_index on belong to the fragment)
+        """
+        html = str(html)
+        prefix, count = "-", 0
+        if context is not None and first_plot_index is not None:
+            prefix, count = context.prefix, context.next_plot_index - first_plot_index
+            if count:
+                html = _renumber(html, prefix, first_plot_index, count, 1, prefix)
+        idealreport.create_html._write_atomic(self._path(key), "%s %d\n%s" % (prefix, count, html))
+        self.evict()
+
+    def evict(self):
+        """ remove the least recently used fragments until the cache is at most max_bytes """
+        files = []
+        for fn in self._files():
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, fn))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, fn))
+        total = sum(size for (_, size, _) in files)
+        for (_, size, fn) in sorted(files):
+            if total <= self.max_bytes:
+                break
+            _remove(os.path.join(self.cache_dir, fn))
+            total -= size
+
+    def _files(self):
+        """ helper function to list the fragment files """
+        return [fn for fn in os.listdir(self.cache_dir) if fn.endswith(".html")]
+
+    def _path(self, key):
+        """ helper function for the file name of a fragment """
+        return os.path.join(self.cache_dir, key + ".html")
+
+
+def hash_key(*args, **kwargs):
+    """ combine the inputs of a fragment into a cache key
+        DataFrames, Series and indexes are hashed by their values, index, column names and dtypes;
+        numpy arrays by their bytes; lists, tuples and dicts recursively; anything else by repr().
+        The idealreport version is part of every key.
+        Returns:
+            hex str
+    """
+    h = hashlib.sha256()
+    h.update(("idealreport %s\n" % idealreport.__version__).encode("utf-8"))
+    _hash_value(h, args)
+    _hash_value(h, sorted(kwargs.items()))
+    return h.hexdigest()
+
+
+def _hash_value(h, value):
+    """ helper function to add a value to a hash """
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        h.update(("%s %r %r\n" % (type(value).__name__, value.shape, _frame_meta(value))).encode("utf-8"))
+        if isinstance(value, pd.Index):
+            h.update(pd.util.hash_pandas_object(value).values.tobytes())
+        else:
+            h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+            h.update(pd.util.hash_pandas_object(value.index).values.tobytes())
+    elif isinstance(value, np.ndarray) and value.dtype.kind != "O":
+        h.update(("ndarray %s %r\n" % (value.dtype.str, value.shape)).encode("utf-8"))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(("%s %d\n" % (type(value).__name__, len(value))).encode("utf-8"))
+        for v in value:
+            _hash_value(h, v)
+    elif isinstance(value, dict):
+        h.update(("dict %d\n" % len(value)).encode("utf-8"))
+        for k in sorted(value, key=repr):
+            _hash_value(h, k)
+            _hash_value(h, value[k])
+    else:
+        h.update(("%r\n" % (value,)).encode("utf-8"))
+
+
+def _frame_meta(value):
+    """ helper function for the names and dtypes of a DataFrame, Series or Index """
+    if isinstance(value, pd.DataFrame):
+        return (list(value.columns), [str(t) for t in value.dtypes], list(value.index.names), str(value.index.dtype))
+    if isinstance(value, pd.Series):
+        return (value.name, str(value.dtype), list(value.index.names), str(value.index.dtype))
+    return (list(value.names), str(value.dtype))
+
+
+def _remove(path):
+    """ helper function to remove a file that another process may have removed """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _renumber(html, prefix, first, count, new_first, new_prefix):
+    """ helper function to move the plot IDs prefix<first>...prefix<first + count - 1> to new_prefix<new_first>...
+        Only the places create_html puts a plot ID are changed: the id of the plot's div, the variable of
+        its plot spec (g_rplot3) and the first argument of the calls that render it, so other text that
+        looks like a plot ID (e.g. in a table cell or a paragraph) is kept.
+    """
+    name = re.escape(prefix) + "([0-9]+)(?![0-9A-Za-z_$])"
+    pattern = re.compile(r'(<div id="|\bvar g_|\b(?:generatePlot|registerPlot|registerPlotly|Plotly\.newPlot)\(")%s(?:(", g_)%s)?' % (name, name))
+
+    def move(index):
+        if first <= index < first + count:
+            return "%s%d" % (new_prefix, index - first + new_first)
+        return "%s%d" % (prefix, index)
+
+    def replace(match):
+        moved = match.group(1) + move(int(match.group(2)))
+        if match.group(3) is not None:  # generatePlot("rplot3", g_rplot3)
+            moved += match.group(3) + move(int(match.group(4)))
+        return moved
+
+    return pattern.sub(replace, html)
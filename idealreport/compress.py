@@ -0,0 +1,175 @@
+""" The compress module contains:
+    ENCODINGS of the compressed files ("gzip" --> report.html.gz, "brotli" --> report.html.br)
+    CompressedWriter class to compress text (e.g. report HTML) into a file as it is written
+    ReportWriter class to write a report to its HTML file and/or compressed copies in one pass
+    compress_file() to write a compressed copy of a file (e.g. htmlLibs/plotly.min.js)
+    output_files() to list the files a ReportWriter writes
+    brotli is optional: it is only imported when a "brotli" file is written
+"""
+
+import os
+import threading
+import zlib
+
+# file name suffix of each encoding
+ENCODINGS = {"gzip": ".gz", "brotli": ".br"}
+
+# compression levels: default (fast enough to compress reports as they are generated) and maximum
+DEFAULT_LEVELS = {"gzip": 6, "brotli": 5}
+MAX_LEVELS = {"gzip": 9, "brotli": 11}
+
+
+class CompressedWriter(object):
+    """ class to compress text (or bytes) into a file as it is written, so the whole
+        uncompressed document never has to be held in memory
+        (gzip files have no timestamp, so the same report always compresses to the same bytes)
+        Attributes:
+            path (str): compressed file
+            encoding (str): "gzip" or "brotli"
+            level (int): compression level (gzip: 1 to 9, brotli: 0 to 11)
+            bytes_in (int): number of uncompressed bytes written so far
+            bytes_out (int): number of compressed bytes written so far
+    """
+
+    def __init__(self, path, encoding="gzip", level=None):
+        """ Args:
+                path (str): compressed file (created or replaced)
+                encoding (str): "gzip" or "brotli" (needs the brotli package)
+                level (int): compression level (default: DEFAULT_LEVELS[encoding])
+        """
+        if encoding not in ENCODINGS:
+            raise Exception("idealreport.compress.CompressedWriter() encoding must be in %s" % sorted(ENCODINGS))
+        if level is None:
+            level = DEFAULT_LEVELS[encoding]
+        if encoding == "gzip":
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip header and trailer
+            (self._process, self._finish) = (compressor.compress, compressor.flush)
+        else:
+            try:
+                import brotli
+            except ImportError:
+                raise Exception("idealreport.compress.CompressedWriter() brotli output needs the brotli package (pip install brotli)")
+            compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+            (self._process, self._finish) = (compressor.process, compressor.finish)
+        self.path = path
+        self.encoding = encoding
+        self.level = level
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.closed = False
+        self._file = open(path, "wb")
+
+    def write(self, data):
+        """ compress a str (encoded as UTF-8) or bytes """
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        self.bytes_in += len(data)
+        self._write_through(self._process(data))
+
+    def close(self):
+        """ finish the compressed stream and close the file """
+        if self.closed:
+            return
+        self._write_through(self._finish())
+        self._file.close()
+        self.closed = True
+
+    def _write_through(self, data):
+        """ helper function to write compressed bytes (the compressors return nothing until a block is full) """
+        if data:
+            self._file.write(data)
+            self.bytes_out += len(data)
+
+
+class ReportWriter(object):
+    """ class to write a report to its HTML file and/or compressed copies (e.g. report.html.gz) in one pass
+        Used as the file of create_html.save() and sink.HtmlSink, so the HTML is compressed as it is generated.
+        Attributes:
+            paths (list): files written (see output_files())
+    """
+
+    def __init__(self, output_file, compression=None, keep_html=True, level=None):
+        """ Args:
+                output_file (str): full name of the HTML file
+                compression (str or list): "gzip" and/or "brotli" --> also write output_file + ".gz" / ".br"
+                keep_html (bool): if False, only write the compressed files
+                level (int): compression level (default: DEFAULT_LEVELS of each encoding)
+        """
+        self.paths = output_files(output_file, compression, keep_html)
+        self._files = []
+        try:
+            if keep_html:
+                self._files.append(open(output_file, "w"))
+            for encoding in _encodings(compression):
+                self._files.append(CompressedWriter(output_file + ENCODINGS[encoding], encoding, level))
+        except Exception:
+            self.close()
+            raise
+
+    def write(self, text):
+        """ write a str to every file """
+        for f in self._files:
+            f.write(text)
+
+    def close(self):
+        """ finish and close every file """
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+def compress_file(source, target=None, encoding="gzip", level=None, block_size=1 << 20):
+    """ write a compressed copy of a file (replaced atomically, so concurrent calls from threads and processes are safe)
+        Args:
+            source (str): file to compress
+            target (str): compressed file (default: source + ".gz" / ".br")
+            encoding (str): "gzip" or "brotli"
+            level (int): compression level (default: MAX_LEVELS[encoding], as the copy is made once and served many times)
+            block_size (int): number of bytes read at a time
+        Returns:
+            target (str)
+    """
+    if encoding not in ENCODINGS:
+        raise Exception("idealreport.compress.compress_file() encoding must be in %s" % sorted(ENCODINGS))
+    if target is None:
+        target = source + ENCODINGS[encoding]
+    temp = "%s.%d.%d.tmp" % (target, os.getpid(), threading.get_ident())  # unique to this process and thread
+    writer = CompressedWriter(temp, encoding, MAX_LEVELS[encoding] if level is None else level)
+    try:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                writer.write(block)
+    except Exception:
+        writer.close()
+        os.remove(temp)
+        raise
+    writer.close()
+    os.replace(temp, target)
+    return target
+
+
+def output_files(output_file, compression=None, keep_html=True):
+    """ files written for a report
+        Args:
+            output_file (str): full name of the HTML file
+            compression (str or list): "gzip" and/or "brotli"
+            keep_html (bool): if False, the HTML file itself is not written
+        Returns:
+            list of file names
+    """
+    encodings = _encodings(compression)
+    if not keep_html and not encodings:
+        raise Exception("idealreport.compress keep_html=False needs a compression")
+    paths = [output_file] if keep_html else []
+    return paths + [output_file + ENCODINGS[encoding] for encoding in encodings]
+
+
+def _encodings(compression):
+    """ helper function to check a compression (None, str or list) and convert it to a list of encodings """
+    if compression is None:
+        return []
+    encodings = [compression] if isinstance(compression, str) else list(compression)
+    for encoding in encodings:
+        if encoding not in ENCODINGS:
+            raise Exception("idealreport.compress compression must be in %s" % sorted(ENCODINGS))
+    return encodings
@@ -2,68 +2,410 @@
     convert pandas DataFrame data to HTML
 """
 
+import datetime
 import os
 import json
+import hashlib
 import shutil
+import threading
+import time
+from contextlib import contextmanager
 
 # external libraries
 import htmltag
 import jinja2
+import numpy as np
+import pandas as pd
 
+import idealreport.compress
+import idealreport.frequency
+import idealreport.serialize
 
-# a counter used to assign each plot a unique ID
+
+# a counter used to assign each plot a unique ID (for plots created without a ReportContext)
 NEXT_PLOT_INDEX = 1
+_PLOT_INDEX_LOCK = threading.Lock()
+
+# ways to deploy the library files, and the file (in each directory) recording what was deployed
+ASSET_MODES = ["copy", "hardlink", "symlink"]
+ASSET_MANIFEST = ".idealreport-assets.json"
+
+# default column formatting of tables (see table())
+DEFAULT_COLUMN_FORMAT = {"align": "right", "decimal_places": 2, "commas": True, "width": None}
+
+# locks serializing the deployment of the library files into each directory by the threads of this process
+# (other processes are handled by replacing each file atomically)
+_DEPLOY_LOCKS = {}
+_DEPLOY_LOCKS_LOCK = threading.Lock()
+
+# compiled report template (see load_template()) and sha256 of the library files, keyed by (path, size, mtime)
+_TEMPLATE = None
+_SHA256_CACHE = {}
+
+
+class ReportContext(object):
+    """ state shared by the plots of one report, passed to the create_html functions as context=
+        Each report allocates its own plot IDs, so reports can be built concurrently (e.g. in threads)
+        and the IDs (and therefore the HTML) do not depend on what other reports are doing.
+        Attributes:
+            prefix (str): prefix of the plot IDs (distinct from the "plot" IDs of plots created
+                          without a context, so both can be used in one report; note that before
+                          0.15 the plots of a Reporter had the "plot" IDs too)
+            next_plot_index (int): index of the next plot ID
+            data (idealreport.serialize.DataStore): columns embedded so far, so each distinct column is
+                                                    embedded once (None to embed the data in every plot)
+            profile (list): a record (dict) per element of the report once start_profile() is called, else None
+            on_element (callable): called with each record as it is added (e.g. to send metrics)
+            json_engine (str): JSON library used for the plots of the report ("json", "orjson" or "rapidjson";
+                               None for idealreport.serialize.JSON_ENGINE)
+    """
 
+    def __init__(self, prefix="rplot", share_data=False, json_engine=None):
+        if json_engine is not None:
+            idealreport.serialize._engine_module(json_engine)  # check it is available
+        self.prefix = prefix
+        self.next_plot_index = 1
+        self.data = idealreport.serialize.DataStore() if share_data else None
+        self.json_engine = json_engine
+        self.profile = None
+        self.on_element = None
+        self._lock = threading.Lock()
+
+    def start_profile(self, on_element=None):
+        """ start recording the elements (plots, tables, text, ...) of the report, see record() """
+        self.profile = []
+        self.on_element = on_element
+
+    def record(self, kind, html, **values):
+        """ add a record of an element to the profile (if profiling)
+            Args:
+                kind (str): type of element e.g. "plot", "plotly", "table", "text"
+                html (str): HTML of the element (its length is recorded as "bytes")
+                values: other values to record e.g. name, plot_id, seconds, prep_seconds, serialize_seconds,
+                        points (number of data values of a plot), cells (number of cells of a table)
+            Returns:
+                record (dict), or None if not profiling
+        """
+        if self.profile is None:
+            return None
+        record = {"index": len(self.profile), "kind": kind, "bytes": len(html)}
+        record.update(values)
+        self.profile.append(record)
+        if self.on_element is not None:
+            self.on_element(record)
+        return record
+
+    @contextmanager
+    def separate_data(self):
+        """ within the with block, plots only refer to columns they define themselves,
+            so the HTML created is self-contained (e.g. to be cached and reused in another report)
+        """
+        if self.data is None:
+            yield
+            return
+        data = self.data
+        self.data = idealreport.serialize.DataStore()
+        try:
+            yield
+        finally:
+            self.data = data
+
+    def next_plot_id(self):
+        """ allocate a unique plot ID (thread-safe) """
+        with self._lock:
+            index = self.next_plot_index
+            self.next_plot_index += 1
+        return "%s%d" % (self.prefix, index)
+
+    def reserve_plot_ids(self, count):
+        """ allocate count consecutive plot IDs (thread-safe)
+            Returns:
+                index (int) of the first ID
+        """
+        with self._lock:
+            index = self.next_plot_index
+            self.next_plot_index += count
+        return index
 
-def save(html, title, output_file):
-    """ save HTML output; copies files into the directory containing the output file """
-    global NEXT_PLOT_INDEX
 
-    # the HTML library (css/js) path is relative to this module
-    lib_path = os.path.dirname(__file__)
+def save(html, title, output_file, lib_dir=None, asset_mode="copy", compression=None, keep_html=True, compression_level=None, compress_libs=None, copy_libs=True):
+    """ save HTML output; deploys the library files (css/js) into the directory containing the output file
+        Args:
+            html (str): report contents
+            title (str): report title
+            output_file (str): full name of the resulting HTML file
+            lib_dir (str): directory shared by many reports for the library files (default: next to output_file);
+                           the report refers to it by a relative path
+            asset_mode (str): "copy", "hardlink" or "symlink" (see copy_libs())
+            compression (str or list): "gzip" and/or "brotli" --> also write output_file + ".gz" / ".br"
+            keep_html (bool): if False, only write the compressed files
+            compression_level (int): see idealreport.compress.DEFAULT_LEVELS
+            compress_libs (str or list): also deploy compressed copies of the library files (see copy_libs())
+            copy_libs (bool): if False, do not deploy the library files (e.g. the caller deploys them once for many reports)
+    """
 
-    # create output directory if needed
+    # deploy files referenced by HTML file
+    lib_prefix = deploy_libs(output_file, lib_dir, asset_mode, compress_libs, copy_libs)
+
+    # fill the template and save the html file(s) to disk, compressing the parts as they are rendered
+    writer = idealreport.compress.ReportWriter(output_file, compression, keep_html, compression_level)
+    try:
+        for part in load_template().generate(title=title, contents=str(html), lib_prefix=lib_prefix):
+            writer.write(part)
+    finally:
+        writer.close()
+
+    # reset the plot counter
+    reset_plot_index()
+
+
+def deploy_libs(output_file, lib_dir=None, asset_mode="copy", compress_libs=None, copy_libs=True):
+    """ deploy the library files (css/js) for a report
+        Args:
+            output_file (str): full name of the HTML file
+            lib_dir (str): shared directory for the library files (default: the directory of output_file)
+            asset_mode (str): "copy", "hardlink" or "symlink" (see copy_libs())
+            compress_libs (str or list): "gzip" and/or "brotli" copies of the library files (see copy_libs())
+            copy_libs (bool): if False, only create the directory of output_file (the library files are deployed
+                              separately, e.g. by idealreport.batch.generate_many())
+        Returns:
+            prefix (str) of the library file names relative to the HTML file ("" or e.g. "../libs/")
+    """
     output_path = os.path.dirname(output_file)
-    if not os.path.exists(output_path):
-        os.makedirs(output_path)
+    if output_path and not os.path.exists(output_path):
+        _makedirs(output_path)
+    if copy_libs:
+        _deploy_libs_into(output_path if lib_dir is None else lib_dir, asset_mode, compress_libs)
+    if lib_dir is None:
+        return ""
+    lib_prefix = os.path.relpath(lib_dir, output_path or os.curdir).replace(os.sep, "/")
+    return "" if lib_prefix == "." else lib_prefix + "/"
+
+
+def copy_libs(output_path, asset_mode="copy", compress_libs=None):
+    """ deploy the HTML library files (css/js) into the output directory, creating it if needed
+        The files deployed are recorded (sha256, size and mtime) in ASSET_MANIFEST in the output directory;
+        a file is only deployed again if its content changed, so saving many reports into one
+        directory copies each file once.
+        Args:
+            output_path (str): directory
+            asset_mode (str): "copy" the files, "hardlink" or "symlink" them to the installed files
+                              (falls back to copying where links are not supported)
+            compress_libs (str or list): "gzip" and/or "brotli" --> also write precompressed copies of the
+                              css/js files (e.g. plotly.min.js.gz) for web servers that serve them
+                              (e.g. nginx gzip_static), compressed once at the maximum level
+    """
+    _deploy_libs_into(output_path, asset_mode, compress_libs)
 
-    # copy files referenced by HTML file into output directory
-    source_path = lib_path + "/htmlLibs"
-    file_list = os.listdir(source_path)
-    for fn in file_list:
-        shutil.copy(source_path + "/" + fn, output_path + "/" + fn)
 
-    # fill the template
-    template_contents = open(lib_path + "/template.html").read()
-    template = jinja2.Template(template_contents)
-    html = template.render(title=title, contents=str(html))
+def _deploy_libs_into(output_path, asset_mode, compress_libs):
+    """ helper function of copy_libs() (called by deploy_libs(), whose copy_libs argument hides copy_libs()) """
+    if asset_mode not in ASSET_MODES:
+        raise Exception("idealreport.create_html.copy_libs() asset_mode must be in %s" % ASSET_MODES)
+    encodings = idealreport.compress._encodings(compress_libs)
+    # create output directory if needed
+    if output_path and not os.path.exists(output_path):
+        _makedirs(output_path)
+    with _deploy_lock(output_path):
+        _copy_libs(output_path, asset_mode, encodings)
 
-    # save the html file to disk
-    open(output_file, "w").write(html)
 
-    # reset the plot counter
-    NEXT_PLOT_INDEX = 1
+def _copy_libs(output_path, asset_mode, encodings):
+    """ helper function for copy_libs(), called by one thread at a time per directory """
+    # the HTML library (css/js) path is relative to this module
+    source_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "htmlLibs")
+    manifest_file = os.path.join(output_path, ASSET_MANIFEST)
+    try:
+        manifest = json.load(open(manifest_file))
+    except (IOError, ValueError):
+        manifest = {}
+
+    changed = False
+    for fn in sorted(os.listdir(source_path)):
+        source = os.path.join(source_path, fn)
+        target = os.path.join(output_path, fn)
+        sha256 = _file_sha256(source)
+        entry = manifest.get(fn)
+        if entry is not None and entry["sha256"] == sha256 and entry["mode"] == asset_mode and _stat_matches(target, entry):
+            continue
+        if entry is None and asset_mode == "copy" and os.path.isfile(target) and _file_sha256(target) == sha256:
+            pass  # already there (e.g. deployed before the manifest existed)
+        else:
+            _deploy_file(source, target, asset_mode)
+        stat = os.stat(target)
+        manifest[fn] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime, "mode": asset_mode}
+        changed = True
+
+    # precompressed copies of the text files, recorded with the sha256 of the file they were compressed from
+    for fn in sorted(os.listdir(source_path)):
+        if os.path.splitext(fn)[1] not in (".css", ".js"):
+            continue
+        source = os.path.join(source_path, fn)
+        sha256 = _file_sha256(source)
+        for encoding in encodings:
+            name = fn + idealreport.compress.ENCODINGS[encoding]
+            target = os.path.join(output_path, name)
+            entry = manifest.get(name)
+            if entry is not None and entry["sha256"] == sha256 and entry["mode"] == encoding and _stat_matches(target, entry):
+                continue
+            idealreport.compress.compress_file(source, target, encoding)
+            stat = os.stat(target)
+            manifest[name] = {"sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime, "mode": encoding}
+            changed = True
+
+    if changed:
+        _write_atomic(manifest_file, json.dumps(manifest, indent=1, sort_keys=True))
+
+
+def load_template():
+    """ load the report template (template.html), compiled once per process """
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        lib_path = os.path.dirname(__file__)
+        template_contents = open(lib_path + "/template.html").read()
+        _TEMPLATE = jinja2.Template(template_contents)
+    return _TEMPLATE
+
+
+def next_plot_id(context=None):
+    """ allocate a unique plot ID from the context, or from the module counter if context is None """
+    global NEXT_PLOT_INDEX
+    if context is not None:
+        return context.next_plot_id()
+    with _PLOT_INDEX_LOCK:
+        plot_id = "plot%d" % NEXT_PLOT_INDEX
+        NEXT_PLOT_INDEX += 1
+    return plot_id
+
+
+def reset_plot_index():
+    """ reset the plot counter (called once a report has been saved) """
+    global NEXT_PLOT_INDEX
+    with _PLOT_INDEX_LOCK:
+        NEXT_PLOT_INDEX = 1
+
+
+def template_parts(title, lib_prefix=""):
+    """ split the filled template around the report contents
+        Args:
+            title (str): report title
+            lib_prefix (str): prefix of the library file names (see deploy_libs())
+        Returns:
+            (header, footer) tuple of str; header + contents + footer is the same as save() writes
+    """
+    marker = "<!-- idealreport contents -->"
+    html = load_template().render(title=title, contents=marker, lib_prefix=lib_prefix)
+    header, footer = html.split(marker)
+    return header, footer
+
+
+def _deploy_file(source, target, asset_mode):
+    """ helper function to copy or link a library file (replaces target atomically, so concurrent saves are safe) """
+    temp = _temp_path(target)
+    if os.path.lexists(temp):
+        os.remove(temp)
+    try:
+        if asset_mode == "hardlink":
+            os.link(source, temp)
+        elif asset_mode == "symlink":
+            os.symlink(source, temp)
+        else:
+            shutil.copy(source, temp)
+    except (OSError, AttributeError, NotImplementedError):  # e.g. another file system or no link support
+        if os.path.lexists(temp):
+            os.remove(temp)
+        shutil.copy(source, temp)
+    os.replace(temp, target)
+    if os.path.lexists(temp):  # rename does nothing if target already is a hard link to source
+        os.remove(temp)
+
+
+def _deploy_lock(path):
+    """ helper function for the lock of a directory (see copy_libs()) """
+    path = os.path.abspath(path or os.curdir)
+    with _DEPLOY_LOCKS_LOCK:
+        if path not in _DEPLOY_LOCKS:
+            _DEPLOY_LOCKS[path] = threading.Lock()
+        return _DEPLOY_LOCKS[path]
+
+
+def _file_sha256(path):
+    """ helper function to hash a file (cached while its size and mtime do not change) """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if key not in _SHA256_CACHE:
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+        _SHA256_CACHE[key] = sha256.hexdigest()
+    return _SHA256_CACHE[key]
+
+
+def _makedirs(path):
+    """ helper function to create a directory (another process may be creating it too) """
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+
+
+def _stat_matches(path, entry):
+    """ helper function to check that a deployed file still has the size and mtime in its manifest entry """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_size == entry["size"] and stat.st_mtime == entry["mtime"]
+
+
+def _temp_path(path):
+    """ helper function for the name of a temporary file next to path, unique to this process and thread """
+    return "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+
+
+def _write_atomic(path, text):
+    """ helper function to write a small text file atomically """
+    temp = _temp_path(path)
+    with open(temp, "w") as f:
+        f.write(text)
+    os.replace(temp, path)
 
 
 # ======== HTML generating functions (all return HTML string) ========
 
 
 def frequency_table(item_counts, name, max_items=10):
-    """ create a table of item frequencies """
+    """ create a table of item frequencies
+        If the counts are approximate (a FrequencyCounter with max_keys that has dropped items), the table has
+        two count columns, "Count (at least)" and "Count (at most)": the true count of each item is between them.
+        Args:
+            item_counts (dict or frequency.FrequencyCounter): count of each item
+            name (str): header of the item column
+            max_items (int): number of rows (most frequent items)
+    """
 
     # create header
-    row = htmltag.tr(htmltag.th(name), htmltag.th("Count"))
+    error = 0
+    if isinstance(item_counts, idealreport.frequency.FrequencyCounter):
+        error = item_counts.error
+        items = item_counts.top(max_items)
+    else:
+        items = idealreport.frequency.top_items(item_counts, max_items)
+    if error:
+        row = htmltag.tr(htmltag.th(name), htmltag.th("Count (at least)"), htmltag.th("Count (at most)"))
+    else:
+        row = htmltag.tr(htmltag.th(name), htmltag.th("Count"))
     thead = htmltag.thead(row)
 
     # add items
     trs = []
-    items = [(v, k) for (k, v) in item_counts.items()]
-    items.sort(reverse=True)
-    if len(items) > max_items:
-        items = items[:max_items]
     for (value, key) in items:
-        row = htmltag.tr(htmltag.td(key), htmltag.td(str(value)))
-        trs.append(row)
+        cells = [htmltag.td(key if isinstance(key, str) else str(key)), htmltag.td(str(value))]
+        if error:
+            cells.append(htmltag.td(str(value + error)))
+        trs.append(htmltag.tr(*cells))
     tbody = htmltag.tbody(*trs)
     return htmltag.table(thead, tbody)
 
@@ -78,46 +420,103 @@ def paragraph(text):
     return htmltag.p(text)
 
 
-def plot(plot_spec):
-    """ create a plot by storing the data in a json file and returning HTML for displaying the plot """
-    global NEXT_PLOT_INDEX
-
+def plot(plot_spec, binary=False, lazy=False, purge=False, context=None, json_engine=None, precision=None, spec_seconds=0.0):
+    """ create a plot by storing the data in a json file and returning HTML for displaying the plot
+        Args:
+            plot_spec (dict): dictionary of plot specifications
+            binary (bool): if True, numeric data is embedded as base64 typed arrays (smaller, faster to load)
+            lazy (bool): if True, the plot is only rendered when it scrolls into view
+            purge (bool): if True (and lazy), the plot is removed again when it is far off-screen
+            context (ReportContext): report the plot belongs to (optional)
+            json_engine (str): "json", "orjson" or "rapidjson" (default: the engine of the context, or
+                               idealreport.serialize.JSON_ENGINE), for the plot spec and the numeric columns of its
+                               DataFrames (see idealreport.serialize.dataframe_to_json)
+            precision (int or str): precision of the float data, e.g. 4 significant digits, ".2f" or "float32"
+                                    (default: plot_spec["precision"] if any, else full precision),
+                                    see idealreport.serialize.quantize
+            spec_seconds (float): seconds already spent creating plot_spec (e.g. downsampling by idealreport.plot.PlotSpec),
+                                  included in the seconds and prep_seconds of the profile
+        Returns:
+            HTML (str)
+    """
     # compute an ID for this plot
-    plot_id = "plot%d" % NEXT_PLOT_INDEX
-    NEXT_PLOT_INDEX += 1
+    plot_id = next_plot_id(context)
+    if json_engine is None and context is not None:
+        json_engine = context.json_engine
+    profiling = context is not None and context.profile is not None
+    if profiling:
+        start = time.perf_counter()
+        points = sum(ds["df"].size + len(ds["df"]) for ds in plot_spec.get("data", []) if "df" in ds)
+        name = plot_spec.get("type") or "+".join(str(ds.get("type")) for ds in plot_spec.get("data", []))
+        title = plot_spec.get("title")
 
     # process the dictionary of plot specifications
-    plot_spec = prep_plot_spec(plot_spec)
-
-    # create HTML
-    h = htmltag.div("", id=plot_id)
-    h += htmltag.script('var g_%s = %s;\ngeneratePlot("%s", g_%s);' % (plot_id, json.dumps(plot_spec), plot_id, plot_id))
-    return h
+    store = context.data if context is not None else None
+    plot_spec = prep_plot_spec(plot_spec, binary=binary, store=store, precision=precision, json_engine=json_engine)
+    if profiling:
+        prepared = time.perf_counter()
+
+    # create HTML (defining any data not embedded by earlier plots first)
+    script = store.pop_definitions() if store is not None else ""
+    if lazy:
+        script += 'var g_%s = %s;\nregisterPlot("%s", g_%s, %s);' % (plot_id, idealreport.serialize.dumps(plot_spec, json_engine), plot_id, plot_id, json.dumps(purge))
+    else:
+        script += 'var g_%s = %s;\ngeneratePlot("%s", g_%s);' % (plot_id, idealreport.serialize.dumps(plot_spec, json_engine), plot_id, plot_id)
+    html = _plot_html(plot_id, script)
+    if profiling:
+        end = time.perf_counter()
+        context.record("plot", html, name=name, title=title, plot_id=plot_id, points=points, seconds=spec_seconds + end - start, prep_seconds=spec_seconds + prepared - start, serialize_seconds=end - prepared)
+    return html
 
 
-def plotly(data, layout, modebar=False, json_engine=None):
+def plotly(data, layout, modebar=False, json_engine=None, lazy=False, purge=False, context=None):
     """ directly call Plotly.newPlot(data, layout)
         Args:
             data (list): list of dictionaries
                 each dictionary has keys relevant to the plot e.g. x, y, mode, type
             layout (dict): dictionary to describe the overall layout e.g. title, xaxis.label
+            modebar (bool): if True, show the plotly mode bar
+            json_engine (str): "json", "orjson" or "rapidjson" (default: the engine of the context, or
+                               idealreport.serialize.JSON_ENGINE); numpy arrays and datetimes can be used in data
+            lazy (bool): if True, the plot is only rendered when it scrolls into view
+            purge (bool): if True (and lazy), the plot is removed again when it is far off-screen
+            context (ReportContext): report the plot belongs to (optional)
         Returns:
             HTML (str)
     """
     # compute an ID for this plot
-    global NEXT_PLOT_INDEX
-    plot_id = "plot%d" % NEXT_PLOT_INDEX
-    NEXT_PLOT_INDEX += 1
+    plot_id = next_plot_id(context)
+    if json_engine is None and context is not None:
+        json_engine = context.json_engine
+    profiling = context is not None and context.profile is not None
+    if profiling:
+        start = time.perf_counter()
 
     # create HTML
     mode_bar_dict = {"displayModeBar": modebar}
-    h = htmltag.div("", id=plot_id)
-    if json_engine is None:
-        h += htmltag.script("\nPlotly.newPlot(%s, %s, %s, %s);" % (plot_id, json.dumps(data), json.dumps(layout), json.dumps(mode_bar_dict)))
-    elif json_engine == 'rapidjson':
-        import rapidjson
-        h += htmltag.script("\nPlotly.newPlot(%s, %s, %s, %s);" % (plot_id, rapidjson.dumps(data), rapidjson.dumps(layout), rapidjson.dumps(mode_bar_dict)))
-    return h
+
+    def dumps(obj):
+        return idealreport.serialize.dumps(obj, json_engine)
+
+    if lazy:
+        script = '\nregisterPlotly("%s", %s, %s, %s, %s);' % (plot_id, dumps(data), dumps(layout), dumps(mode_bar_dict), json.dumps(purge))
+    else:
+        script = '\nPlotly.newPlot("%s", %s, %s, %s);' % (plot_id, dumps(data), dumps(layout), dumps(mode_bar_dict))
+    html = _plot_html(plot_id, script)
+    if profiling:
+        points = sum(len(v) if isinstance(v, (list, tuple)) else np.size(v) for trace in data for v in trace.values() if isinstance(v, (list, tuple)) or np.ndim(v) > 0)
+        title = layout.get("title") if isinstance(layout, dict) else None
+        seconds = time.perf_counter() - start
+        context.record("plotly", html, name="plotly", title=title, plot_id=plot_id, points=points, seconds=seconds, prep_seconds=0.0, serialize_seconds=seconds)
+    return html
+
+
+def _plot_html(plot_id, script):
+    """ helper function to create the HTML of a plot: an empty div and the script that fills it
+        (the same HTML as htmltag.div("", id=plot_id) + htmltag.script(script), without scanning the
+        escaped script one character at a time)
+    """
+    return _wrap_html("div", "", id=plot_id) + _wrap_html("script", _escape_html(script))
 
 
 def table(df, sortable=False, last_row_is_footer=False, col_format=None):
@@ -132,119 +531,256 @@ def table(df, sortable=False, last_row_is_footer=False, col_format=None):
     if col_format is None:
         col_format = {}
     row_count = len(df)
+    thead = _table_head(df.columns, sortable, col_format)
+    rows = _table_rows(df, col_format)
 
-    # default column formatting
-    default_format = {"align": "right", "decimal_places": 2, "commas": True, "width": None}
+    tfoot = ""
+    if last_row_is_footer:
+        footer_rows = [i for (i, label) in enumerate(df.index) if label == row_count - 1]
+        if footer_rows:
+            tfoot = _wrap_html("tfoot", rows[footer_rows[-1]])
+            for i in reversed(footer_rows):
+                del rows[i]
+    tbody = _wrap_html("tbody", "".join(rows))
+    return _wrap_html("table", thead + tbody + tfoot, **_table_attrs(sortable, row_count))
+
+
+def table_chunks(chunks, sortable=False, last_row_is_footer=False, col_format=None):
+    """ generate an HTML table from DataFrame chunks (e.g. pd.read_csv(..., chunksize=...)) one chunk at a time,
+        so only one chunk (and its HTML) is in memory at once
+        The HTML is the same as table(pd.concat(chunks)), except with last_row_is_footer: table() moves the rows
+        labelled number of rows - 1 to the footer wherever they are, whereas here only the final row of the last
+        chunk can be the footer (if its index label is the number of rows - 1, e.g. chunks of pd.read_csv()).
+        Args:
+            chunks (iterable): DataFrames with the same columns
+            sortable, last_row_is_footer, col_format: see table()
+        Returns:
+            generator of HTML fragments (str) e.g. to write to an idealreport.sink.HtmlSink
+    """
+    if col_format is None:
+        col_format = {}
+    columns = None
+    row_count = 0
+    pending = []  # rows not written yet: the first 16 (the table tag depends on whether there are more than 15) and the last (footer)
+    started = False
+    for df in chunks:
+        if columns is None:
+            columns = df.columns
+        elif not df.columns.equals(columns):
+            raise Exception("idealreport.create_html.table_chunks() every chunk must have the same columns")
+        if len(df) == 0:
+            continue
+        pending.extend(_table_rows(df, col_format))
+        row_count += len(df)
+        last_label = df.index[-1]
+        if not started and (row_count > 15 or not sortable):
+            yield _start_tag("table", **_table_attrs(sortable, row_count)) + _table_head(columns, sortable, col_format) + "<tbody>"
+            started = True
+        if started:
+            held = pending.pop() if last_row_is_footer else None
+            yield "".join(pending)
+            pending = [held] if last_row_is_footer else []
+    if columns is None:
+        raise Exception("idealreport.create_html.table_chunks() no chunks")
+    if not started:
+        yield _start_tag("table", **_table_attrs(sortable, row_count)) + _table_head(columns, sortable, col_format) + "<tbody>"
+    tfoot = ""
+    if last_row_is_footer and row_count and last_label == row_count - 1:
+        tfoot = _wrap_html("tfoot", pending.pop())
+    yield "".join(pending) + "</tbody>" + tfoot + "</table>"
 
-    def get_format(col, attribute):
-        """ helper function to get column formatting
-            Args:
-                col: column name (key in the col_format)
-                attribute (str)
-            Returns:
-                format (str) for the specified col
-        """
-        if col in col_format and attribute in col_format[col_name]:
-            value = col_format[col_name][attribute]
-        elif "*" in col_format and attribute in col_format["*"]:
-            value = col_format["*"][attribute]
+
+def _table_attrs(sortable, row_count):
+    """ helper function for the attributes of the table tag """
+    # if sortable, apply the bootstrap-table tab, bs-table
+    if sortable:
+        if row_count > 15:
+            return {"class": "bs-table", "data-striped": "true", "data-height": "600"}
         else:
-            value = default_format[attribute]
-        return value
+            return {"class": "bs-table", "data-striped": "true"}
+    else:
+        return {"class": "table-striped"}
 
-    # create header
+
+def _column_format(col_format, col_name, attribute):
+    """ helper function to get column formatting
+        Args:
+            col_format (dict): format of each column (key), "*" for every column
+            col_name: column name
+            attribute (str): "align", "decimal_places", "commas" or "width"
+        Returns:
+            format (str) for the specified column
+    """
+    if col_name in col_format and attribute in col_format[col_name]:
+        value = col_format[col_name][attribute]
+    elif "*" in col_format and attribute in col_format["*"]:
+        value = col_format["*"][attribute]
+    else:
+        value = DEFAULT_COLUMN_FORMAT[attribute]
+    return value
+
+
+def _table_head(columns, sortable, col_format):
+    """ helper function to create the thead of a table
+        Args:
+            columns (pd.Index): column names (tuples of 2 levels --> the top level spans its columns)
+            sortable (bool): if True, the columns are sortable
+            col_format (dict): see table()
+        Returns:
+            HTML (str)
+    """
     items = []
     # if there's a hierarchical index for the columns, span the top level; only suppots 2 levels
-    if isinstance(df.columns[0], tuple):
+    if isinstance(columns[0], tuple):
         headers = []
-        prev_header = df.columns[0][0]
+        prev_header = columns[0][0]
         span = 0
-        for i, col_name in enumerate(df.columns):
+        for i, col_name in enumerate(columns):
             h1 = col_name[0]
             h2 = col_name[1]
             if h1 == prev_header:
                 span += 1
-                if i == (len(df.columns) - 1):
+                if i == (len(columns) - 1):
                     headers.append(htmltag.th(h1, colspan=span, _class="centered"))
             else:
                 headers.append(htmltag.th(prev_header, colspan=span, _class="centered"))
-                if i == (len(df.columns) - 1):
+                if i == (len(columns) - 1):
                     headers.append(htmltag.th(h1, colspan=1))
                 else:
                     prev_header = h1
                     span = 1
 
-            if get_format(col_name, "align") == "right":
+            if _column_format(col_format, col_name, "align") == "right":
                 items.append(htmltag.th(h2, _class="alignRight"))
             else:
                 items.append(htmltag.th(h2))
-        thead = htmltag.thead(htmltag.tr(*headers), htmltag.tr(*items))
+        return htmltag.thead(htmltag.tr(*headers), htmltag.tr(*items))
 
-    else:
-        for col_name in df.columns:
-            if get_format(col_name, "align") == "right":
-                if sortable:
-                    items.append(htmltag.th(col_name, **{"class": "alignRight", "data-sortable": "true"}))
-                else:
-                    items.append(htmltag.th(col_name, _class="alignRight"))
+    for col_name in columns:
+        if _column_format(col_format, col_name, "align") == "right":
+            if sortable:
+                items.append(htmltag.th(col_name, **{"class": "alignRight", "data-sortable": "true"}))
             else:
-                if sortable:
-                    items.append(htmltag.th(col_name, **{"data-sortable": "true"}))
-                else:
-                    items.append(htmltag.th(col_name))
+                items.append(htmltag.th(col_name, _class="alignRight"))
+        else:
+            if sortable:
+                items.append(htmltag.th(col_name, **{"data-sortable": "true"}))
+            else:
+                items.append(htmltag.th(col_name))
+    return htmltag.thead(htmltag.tr(*items))
 
-        thead = htmltag.thead(htmltag.tr(*items))
 
-    # create body (and optionally footer)
-    tfoot = ""
-    rows = []
-    for i, row in df.iterrows():
-        values = row.tolist()
-        items = []
-        for j, v in enumerate(values):
-            col_name = df.columns[j]
-            if is_numeric(v):
-                decimal_places = get_format(col_name, "decimal_places")
-                if get_format(col_name, "commas"):
-                    pattern = "{:,." + str(decimal_places) + "f}"
-                else:
-                    pattern = "{:." + str(decimal_places) + "f}"
-                v = pattern.format(v)
-            if get_format(col_name, "align") == "right":
-                items.append(htmltag.td(v, _class="alignRight"))
-            # TODO - need to implement width control
-            # width = get_format(col_name, 'width')
-            # if is_numeric(width):
-            #    style='width:' + str(width) + 'px'
-            #    items.append(htmltag.td(v, style=style ))
-            else:
-                items.append(htmltag.td(v))
-        if last_row_is_footer and i == row_count - 1:
-            tfoot = htmltag.tfoot(htmltag.tr(*items))
+def _table_rows(df, col_format):
+    """ helper function to create the <tr> HTML of each row of a DataFrame, one column at a time
+        Returns:
+            list of str
+    """
+    columns = []
+    values = df.values  # the same (common dtype) values that df.iterrows() yields for each row
+    for j, col_name in enumerate(df.columns):
+        decimal_places = _column_format(col_format, col_name, "decimal_places")
+        if _column_format(col_format, col_name, "commas"):
+            pattern = "{:,." + str(decimal_places) + "f}"
         else:
-            rows.append(htmltag.tr(*items))
-    tbody = htmltag.tbody(*rows)
-    # if sortable, apply the bootstrap-table tab, bs-table
-    if sortable:
-        if row_count > 15:
-            return htmltag.table(thead, tbody, tfoot, **{"class": "bs-table", "data-striped": "true", "data-height": "600"})
+            pattern = "{:." + str(decimal_places) + "f}"
+        if _column_format(col_format, col_name, "align") == "right":
+            columns.append(_table_cells(values[:, j], pattern, '<td class="alignRight">', {"_class": "alignRight"}))
+        # TODO - need to implement width control
+        # width = _column_format(col_format, col_name, 'width')
+        # if is_numeric(width):
+        #    style='width:' + str(width) + 'px'
         else:
-            return htmltag.table(thead, tbody, tfoot, **{"class": "bs-table", "data-striped": "true"})
-    else:
-        return htmltag.table(thead, tbody, tfoot, **{"class": "table-striped"})
+            columns.append(_table_cells(values[:, j], pattern, "<td>", {}))
+    return ["<tr>" + "".join(cells) + "</tr>" for cells in zip(*columns)]
+
+
+def _table_cells(values, pattern, td, td_attrs):
+    """ helper function to convert one column of table values to <td> HTML
+        Args:
+            values (np.ndarray): 1-d array of column values
+            pattern (str): format string for numeric values e.g. "{:,.2f}"
+            td (str): opening <td> tag
+            td_attrs (dict): attributes of td (used by htmltag for values that are already HTML)
+        Returns:
+            list of <td> strings (the same as htmltag.td() produces for each value)
+    """
+    if values.dtype.kind in "biufc":
+        # numeric column: format every value with the same pattern
+        return [td + text + "</td>" for text in map(pattern.format, values.tolist())]
+    if values.dtype.kind in "mM":
+        # datetime64 / timedelta64 column: values.tolist() would give integers (nanoseconds)
+        values = pd.Series(values).astype(object).to_numpy()
+
+    # mixed column: format numbers, escape plain strings in bulk and let htmltag handle anything else
+    cells = [None] * len(values)
+    strings = []
+    string_indexes = []
+    for i, v in enumerate(values.tolist()):
+        if type(v) is str:
+            strings.append(v)
+            string_indexes.append(i)
+        elif isinstance(v, (datetime.date, datetime.time, datetime.timedelta)) or v is pd.NaT:
+            # timestamps and durations as pandas prints them e.g. 2020-01-01 00:00:00, 0 days 00:00:01
+            strings.append(str(v))
+            string_indexes.append(i)
+        elif is_numeric(v):
+            strings.append(pattern.format(v))
+            string_indexes.append(i)
+        else:
+            cells[i] = str(htmltag.td(v, **td_attrs))
+    if strings:
+        text = "\x00".join(strings)
+        if text.count("\x00") != len(strings) - 1:  # a value contains the separator
+            strings = [_escape_html(v) for v in strings]
+        else:
+            strings = _escape_html(text).split("\x00")
+        for i, v in zip(string_indexes, strings):
+            cells[i] = td + v + "</td>"
+    return cells
+
+
+def _escape_html(text):
+    """ convert '&', '<' and '>' to HTML entities (as htmltag does for non-HTML strings) """
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _wrap_html(tag, content, **attrs):
+    """ wrap content that is already HTML in a tag
+        (produces the same string as htmltag without re-escaping or re-scanning the content)
+    """
+    html = htmltag.HTML("%s%s</%s>" % (_start_tag(tag, **attrs), content, tag))
+    html.tagname = tag
+    return html
+
+
+def _start_tag(tag, **attrs):
+    """ helper function for the opening tag of _wrap_html() e.g. '<table class="table-striped">' """
+    tagstart = tag
+    for key, value in attrs.items():
+        tagstart += ' %s="%s"' % (key.lstrip("_"), value)
+    return "<%s>" % tagstart
 
 
 # ======== report spec functions ========
 
 
-def prep_plot_spec(plot_spec):
-    """ process the dictionary of plot specifications """
+def prep_plot_spec(plot_spec, binary=False, store=None, precision=None, json_engine=None):
+    """ process the dictionary of plot specifications
+        (binary=True encodes numeric data as base64 typed arrays, see idealreport.serialize.typed_array_json;
+         with a store, columns refer to data defined once per report, see idealreport.serialize.DataStore;
+         precision (default: plot_spec["precision"]) rounds the float data, see idealreport.serialize.quantize;
+         json_engine encodes the numeric columns, see idealreport.serialize.dataframe_to_json)
+        note: data frames are converted to idealreport.serialize.JsonFragment,
+              so use idealreport.serialize.dumps() to convert the result to JSON
+    """
 
     # make a copy of the plot spec (except data) so that we can re-generate
     # a report without regenerating the plot specs
     # (converting the data frames will take place only in this copy)
     data_specs = plot_spec.get("data", [])
-    plot_spec = {k: v for (k, v) in plot_spec.items() if k != "data"}  # copy all but data
+    if precision is None:
+        precision = plot_spec.get("precision")
+    plot_spec = {k: v for (k, v) in plot_spec.items() if k not in ("data", "precision")}  # copy all but data
     plot_spec["data"] = []
 
     # get original value for timestamp type
@@ -252,6 +788,11 @@ def prep_plot_spec(plot_spec):
 
     # convert data frames
     for ds in data_specs:
+        # data specs without a df (e.g. box plot summaries) are copied as they are
+        if "df" not in ds:
+            plot_spec["data"].append(dict(ds))
+            continue
+
         # check for timestamp index
         df = ds["df"]
         time_df = df.index.dtype == "datetime64[ns]"
@@ -260,15 +801,23 @@ def prep_plot_spec(plot_spec):
         if time_df:
             time_x = True
 
-        # create new data spec with df converted to dict/lists for json
+        # create new data spec with df converted to json
         new_data_spec = {k: v for (k, v) in ds.items() if k != "df"}  # copy all but df
-        new_data_spec["df"] = dataframe_to_dict(df)
+        new_data_spec["df"] = idealreport.serialize.dataframe_to_json(df, binary=binary, store=store, precision=precision, engine=json_engine)
         plot_spec["data"].append(new_data_spec)
 
     # set timestamp type
     if time_x:
         plot_spec["typeX"] = "timestamp"
 
+    # heat map values (a DataFrame or 2-d array) are sent as one typed array
+    if getattr(plot_spec.get("z"), "ndim", 0) == 2:
+        plot_spec["z"] = idealreport.serialize.typed_matrix_json(plot_spec["z"], precision)
+
+    # horizon (cubism) series are sent as typed arrays (NaN marks gaps)
+    if "plots" in plot_spec:
+        plot_spec["plots"] = [dict(item, data=idealreport.serialize.typed_float_json(item["data"], precision)) for item in plot_spec["plots"]]
+
     # convert timestamp fields
     if "startTimestamp" in plot_spec:
         plot_spec["startTimestamp"] = plot_spec["startTimestamp"].isoformat() + "Z"
@@ -305,9 +854,9 @@ def prep_amcharts_spec(plot_spec):
         if time_df:
             time_x = True
 
-        # create new data spec with df converted to dict/lists for json
+        # create new data spec with df converted to json
         new_data_spec = {k: v for (k, v) in ds.items() if k != "df"}  # copy all but df
-        new_data_spec["df"] = dataframe_to_dict(df)
+        new_data_spec["df"] = idealreport.serialize.dataframe_to_json(df)
         plot_spec["data"].append(new_data_spec["df"])
         return plot_spec
 
@@ -315,19 +864,12 @@ def prep_amcharts_spec(plot_spec):
 # ======== utility functions ========
 
 
-def dataframe_to_dict(df):
-    """ convert a pandas DataFrame (or series) to a list of columns ready for conversion to JSON """
-    # assume df is a pd.DataFrame if it contains "columns", else it is a pd.Series
-    columns = []
-    if hasattr(df, "columns"):  # data frame
-        columns.append({"name": df.index.name, "values": json.loads(df.to_json(orient="split", date_format="iso"))["index"]})  # index
-        for col in df.columns:  # columns
-            columns.append({"name": col, "values": json.loads(df[col].to_json(orient="values", date_format="iso"))})
-    else:  # series
-        series = df
-        columns.append({"name": series.index.name, "values": json.loads(series.to_json(orient="split", date_format="iso"))["index"]})  # index
-        columns.append({"name": series.name, "values": json.loads(series.to_json(orient="values", date_format="iso"))})  # values
-    return columns
+def dataframe_to_dict(df, binary=False, json_engine=None, precision=None):
+    """ convert a pandas DataFrame (or series) to a list of columns ready for conversion to JSON
+        (binary=True encodes numeric columns as base64 typed arrays, see idealreport.serialize.typed_array_json)
+        note: plots use idealreport.serialize.dataframe_to_json() which skips the python lists
+    """
+    return idealreport.serialize.loads(idealreport.serialize.dataframe_to_json(df, binary=binary, precision=precision, engine=json_engine), json_engine)
 
 
 def is_numeric(value):
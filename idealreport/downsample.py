@@ -0,0 +1,346 @@
+""" The downsample module contains functions to reduce the number of points sent to a plot
+    while keeping its shape:
+        downsample(): downsample the rows of a pandas DataFrame (or Series)
+        lttb(): positions selected by Largest-Triangle-Three-Buckets
+        minmax(): positions of the minimum and maximum of each bucket (keeps spikes visible)
+        downsample_matrix(): shrink a matrix (e.g. of a heat map) to a number of cells
+        resample_pixels(): aggregate a time series to evenly spaced buckets (e.g. one per pixel of a horizon chart)
+        histogram_counts(): bin the values of each column (a histogram of any number of samples)
+        box_summary(): quartiles, fences and outliers of each column and group (a box plot of any number of samples)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+METHODS = ["lttb", "minmax"]
+MATRIX_METHODS = ["mean", "stride"]
+PIXEL_METHODS = ["mean", "max", "min", "last"]
+
+
+def downsample(df, max_points, method="lttb"):
+    """ downsample the rows of a DataFrame (or Series) before it is plotted
+        Each numeric column is downsampled separately against the index (datetime, numeric or,
+        for other index types, row position) and the rows selected for any column are kept,
+        so every column keeps the points that define its shape. If the columns select more than
+        max_points rows together, they are downsampled again to fewer points each until they do not.
+        Args:
+            df: pandas DataFrame or Series
+            max_points (int): maximum number of rows kept (at least 1); None --> no downsampling
+            method (str): "lttb" (Largest-Triangle-Three-Buckets) or "minmax" (min and max per bucket)
+        Returns:
+            df (same type) with at most max_points of its rows, or df itself if it is already small enough
+    """
+    if method not in METHODS:
+        raise Exception("idealreport.downsample.downsample() method must be in %s" % METHODS)
+    if max_points is not None and max_points < 1:
+        raise ValueError("idealreport.downsample.downsample() max_points must be at least 1, not %s" % max_points)
+    if max_points is None or len(df) <= max_points:
+        return df
+
+    x = _index_values(df.index)
+    columns = [df.iloc[:, j] for j in range(df.shape[1])] if hasattr(df, "columns") else [df]
+    ys = [col.to_numpy(dtype="float64") for col in columns if col.dtype.kind in "biuf"]
+    points = max_points
+    while ys and points >= 3:
+        if method == "lttb":
+            selected = np.unique(np.concatenate([lttb(x, y, points) for y in ys]))
+        else:
+            selected = np.unique(np.concatenate([minmax(y, points) for y in ys]))
+        if len(selected) <= max_points:
+            return df.iloc[selected]
+        # fewer points per column, in proportion to the excess
+        points = min(points - 1, points * max_points // len(selected))
+    # no numeric columns (or too many to keep the shape of each): keep evenly spaced rows
+    return df.iloc[np.unique(np.linspace(0, len(df) - 1, max_points).astype(np.int64))]
+
+
+def lttb(x, y, n_out):
+    """ Largest-Triangle-Three-Buckets (Steinarsson 2013)
+        The first and last points are kept, the rest are split into n_out - 2 buckets and from each
+        bucket the point forming the largest triangle with the previously selected point and the
+        average of the next bucket is selected. NaN values are never preferred over numbers.
+        Args:
+            x (np.ndarray): float64 x values (sorted)
+            y (np.ndarray): float64 y values
+            n_out (int): number of points to select
+        Returns:
+            np.ndarray of selected (sorted) positions
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.unique(np.array([0, n - 1]))
+
+    # bucket boundaries for the points between the first and the last
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+
+    # average of every bucket (ignoring NaN), used as the third point of the triangles
+    finite = ~np.isnan(y)
+    counts = np.add.reduceat(finite[: n - 1].astype(np.int64), edges[:-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_x = np.add.reduceat(np.where(finite, x, 0.0)[: n - 1], edges[:-1]) / counts
+        avg_y = np.add.reduceat(np.where(finite, y, 0.0)[: n - 1], edges[:-1]) / counts
+    # the third point for bucket i is the average of bucket i + 1 (the last point for the last bucket)
+    avg_x = np.append(avg_x[1:], x[n - 1])
+    avg_y = np.append(avg_y[1:], y[n - 1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if finite[a] and not np.isnan(avg_y[i]):
+            area = np.abs((x[a] - avg_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i] - y[a]))
+            area[np.isnan(area)] = -1.0
+        else:
+            area = finite[start:end].astype("float64")  # no triangle: take the first number
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y, n_out):
+    """ positions of the minimum and maximum value of each bucket (ignoring NaN)
+        The points are split into n_out / 2 buckets of consecutive points; the first and last
+        points are always kept.
+        Args:
+            y (np.ndarray): float64 y values
+            n_out (int): (maximum) number of points to select
+        Returns:
+            np.ndarray of selected (sorted) positions
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    n_buckets = max(n_out // 2 - 1, 1)
+    starts = np.unique(np.floor(np.linspace(0, n, n_buckets + 1)[:-1]).astype(np.int64))
+    sizes = np.diff(np.append(starts, n))
+    bucket = np.repeat(np.arange(len(starts)), sizes)
+
+    selected = [np.array([0, n - 1])]
+    with np.errstate(invalid="ignore"):
+        for reduce in (np.fmin, np.fmax):
+            extreme = reduce.reduceat(y, starts)
+            positions = np.flatnonzero(y == np.repeat(extreme, sizes))
+            # first position in each bucket (all-NaN buckets have no match)
+            _, first = np.unique(bucket[positions], return_index=True)
+            selected.append(positions[first])
+    return np.unique(np.concatenate(selected))
+
+
+def downsample_matrix(df, max_cells, method="mean"):
+    """ shrink a matrix (DataFrame) to at most max_cells cells by splitting it into blocks of
+        k x k rows and columns (k as small as possible; a side shorter than k is not split)
+        Args:
+            df (DataFrame): matrix (e.g. a correlation matrix)
+            max_cells (int): maximum number of cells; None --> no downsampling
+            method (str): "mean" (average of the numbers of each block, NaN if it has none)
+                          or "stride" (first row and column of each block)
+        Returns:
+            df (DataFrame) of one cell per block, or df itself if it is already small enough;
+            each block is labelled by its first row / column label ("first - last" for text labels of "mean")
+    """
+    if method not in MATRIX_METHODS:
+        raise Exception("idealreport.downsample.downsample_matrix() method must be in %s" % MATRIX_METHODS)
+    (rows, cols) = df.shape
+    if max_cells is None or rows * cols <= max_cells:
+        return df
+    if max_cells < 1:
+        raise Exception("idealreport.downsample.downsample_matrix() max_cells must be positive")
+
+    # block sizes: square blocks, unless one side of the matrix is shorter than the block
+    k = int(np.ceil(np.sqrt(rows * cols / float(max_cells))))
+    row_k = min(k, rows)
+    col_k = min(k, cols)
+    while -(-rows // row_k) * -(-cols // col_k) > max_cells:  # ceiling divisions
+        if row_k < rows:
+            row_k += 1
+        if col_k < cols:
+            col_k += 1
+    row_starts = np.arange(0, rows, row_k)
+    col_starts = np.arange(0, cols, col_k)
+
+    if method == "stride":
+        return df.iloc[row_starts, col_starts]
+    values = df.to_numpy(dtype="float64")
+    finite = ~np.isnan(values)
+    sums = np.add.reduceat(np.add.reduceat(np.where(finite, values, 0.0), row_starts, axis=0), col_starts, axis=1)
+    counts = np.add.reduceat(np.add.reduceat(finite.astype(np.int32), row_starts, axis=0), col_starts, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return pd.DataFrame(means, index=_block_labels(df.index, row_starts, row_k), columns=_block_labels(df.columns, col_starts, col_k))
+
+
+def resample_pixels(df, width, method="mean"):
+    """ aggregate a time series to at most width evenly spaced buckets, e.g. one value per pixel
+        The bucket length is the time span / (width - 1), rounded up to a millisecond, but at least the
+        median spacing of the data (so sparse data is not spread over empty buckets).
+        Args:
+            df (DataFrame or Series): time series (DatetimeIndex, times in UTC if it has a time zone)
+            width (int): maximum number of buckets
+            method (str): value of each bucket: "mean", "max", "min" or "last" (NaN for buckets without data)
+        Returns:
+            (df, step) tuple: df (same type) with one row per bucket, indexed by the start of the bucket
+                              (naive UTC if df had a time zone), and step (pd.Timedelta) the bucket length
+    """
+    if method not in PIXEL_METHODS:
+        raise Exception("idealreport.downsample.resample_pixels() method must be in %s" % PIXEL_METHODS)
+    if not isinstance(df.index, pd.DatetimeIndex) or len(df) == 0:
+        raise Exception("idealreport.downsample.resample_pixels() df must have a non-empty DatetimeIndex")
+    if width < 1:
+        raise Exception("idealreport.downsample.resample_pixels() width must be positive")
+    if df.index.tz is not None:
+        df = df.tz_convert("UTC").tz_localize(None)
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    t = df.index.asi8
+    step = -(-(t[-1] - t[0]) // (width - 1)) if width > 1 else t[-1] - t[0] + 1  # ceiling division (one bucket: all the data)
+    if len(t) > 1:
+        step = max(step, int(np.median(np.diff(t))))
+    step = max(-(-step // 10 ** 6), 1) * 10 ** 6  # whole milliseconds
+    buckets = (t - t[0]) // step
+    count = int(buckets[-1]) + 1
+    result = df.groupby(buckets).agg(method).reindex(np.arange(count))
+    result.index = pd.DatetimeIndex(t[0] + np.arange(count) * step, name=df.index.name)
+    return result, pd.Timedelta(int(step), "ns")
+
+
+def histogram_counts(df, bins="fd", max_bins=1000, density=False):
+    """ count the values of each column of df in bins shared by all the columns (NaN is ignored)
+        Args:
+            df (DataFrame or Series): numeric samples, e.g. 20M returns
+            bins: int (number of equal bins between the minimum and maximum), "fd" (Freedman-Diaconis:
+                  bins of 2 * IQR / n ** (1/3), using all the columns) or a sorted list/array of bin edges
+            max_bins (int): maximum number of bins for "fd"
+            density (bool): if True, the probability density (count / (total * bin width)) instead of counts
+        Returns:
+            (counts, edges) tuple: counts (DataFrame) with a row per bin, indexed by the bin centers, and
+                                   a column per column of df; edges (np.ndarray) the len(counts) + 1 bin edges
+    """
+    if not hasattr(df, "columns"):
+        df = df.to_frame()
+    columns = []
+    for j in range(df.shape[1]):
+        values = df.iloc[:, j].to_numpy()
+        if values.dtype.kind not in "biuf":
+            raise Exception("idealreport.downsample.histogram_counts() column %r is not numeric" % (df.columns[j],))
+        values = values.astype("float64", copy=False)
+        columns.append(values[np.isfinite(values)])
+
+    if isinstance(bins, str) or np.ndim(bins) == 0:
+        n_values = sum(len(values) for values in columns)
+        (low, high) = (min(v.min() for v in columns if len(v)), max(v.max() for v in columns if len(v))) if n_values else (0.0, 1.0)
+        if high == low:
+            (low, high) = (low - 0.5, high + 0.5)
+        if bins == "fd":
+            width = 0
+            if n_values:  # (no values, e.g. all NaN: a single bin)
+                (q1, q3) = np.percentile(np.concatenate(columns), [25, 75])
+                width = 2 * (q3 - q1) / n_values ** (1.0 / 3)
+            bins = int(np.ceil((high - low) / width)) if width > 0 else 1
+            bins = min(max(bins, 1), max_bins)
+        elif isinstance(bins, str) or bins < 1:
+            raise Exception('idealreport.downsample.histogram_counts() bins must be a positive int, "fd" or bin edges')
+        edges = np.linspace(low, high, int(bins) + 1)
+        bin_range = (low, high)  # equal bins: numpy computes the bin of each value directly
+    else:
+        edges = np.asarray(bins, dtype="float64")
+        if len(edges) < 2 or (np.diff(edges) <= 0).any():
+            raise Exception("idealreport.downsample.histogram_counts() bin edges must be increasing")
+        bins = edges
+        bin_range = None
+
+    counts = {}
+    for (col, values) in zip(df.columns, columns):
+        counts[col] = np.histogram(values, bins=bins, range=bin_range, density=density and len(values) > 0)[0]
+    centers = pd.Index((edges[:-1] + edges[1:]) / 2, name=df.columns.name if df.shape[1] > 1 else df.columns[0])
+    return pd.DataFrame(counts, index=centers, columns=df.columns), edges
+
+
+def box_summary(df, groups=None, max_outliers=100):
+    """ statistics of the boxes of a box plot (as plotly computes them), for each column and group
+        Args:
+            df (DataFrame or Series): numeric samples (NaN is ignored)
+            groups (list or array): group of each row (None --> one box per column)
+            max_outliers (int): maximum number of outliers kept per box (evenly spaced in sorted order,
+                                including the most extreme ones)
+        Returns:
+            list with a dict per column: {"name": column name, "groups": group labels (None if no groups),
+                "q1", "median", "q3": quartiles, "lowerfence", "upperfence": most extreme values within
+                1.5 IQR of the quartiles, "count": number of values, "outliers": list of values beyond the fences},
+                each a list with an item per group (in order of appearance; None for a group without values)
+    """
+    if not hasattr(df, "columns"):
+        df = df.to_frame()
+    if groups is None:
+        (codes, order) = (np.zeros(len(df), dtype=np.int64), np.zeros(1))
+    else:
+        (codes, order) = pd.factorize(np.asarray(groups))  # group numbers in order of appearance
+    if len(codes) != len(df):
+        raise Exception("idealreport.downsample.box_summary() groups must have one item per row")
+    positions = np.arange(len(order))
+
+    summaries = []
+    for j in range(df.shape[1]):
+        values = df.iloc[:, j].to_numpy(dtype="float64")
+        keep = np.isfinite(values) & (codes >= 0)
+        frame = pd.DataFrame({"g": codes[keep], "v": values[keep]})
+        grouped = frame.groupby("g")["v"]
+        quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack().reindex(positions)
+        (q1, median, q3) = (quartiles[0.25].to_numpy(), quartiles[0.5].to_numpy(), quartiles[0.75].to_numpy())
+
+        # fences: the most extreme values within 1.5 IQR of the quartiles (vectorized over all the groups)
+        values = frame["v"].to_numpy()
+        group = frame["g"].to_numpy()
+        inside = (values >= (q1 - 1.5 * (q3 - q1))[group]) & (values <= (q3 + 1.5 * (q3 - q1))[group])
+        within = frame[inside].groupby("g")["v"]
+        (lowerfence, upperfence) = (within.min().reindex(positions), within.max().reindex(positions))
+
+        # outliers, at most max_outliers per group
+        outliers = [[] for k in positions]
+        for (k, group_outliers) in frame[~inside].groupby("g")["v"]:
+            group_outliers = np.sort(group_outliers.to_numpy())
+            if len(group_outliers) > max_outliers:
+                group_outliers = group_outliers[np.unique(np.linspace(0, len(group_outliers) - 1, max_outliers).round().astype(np.int64))]
+            outliers[k] = group_outliers.tolist()
+
+        summary = {
+            "name": df.columns[j],
+            "groups": None if groups is None else list(order),
+            "q1": _none_if_nan(q1),
+            "median": _none_if_nan(median),
+            "q3": _none_if_nan(q3),
+            "lowerfence": _none_if_nan(lowerfence),
+            "upperfence": _none_if_nan(upperfence),
+            "count": grouped.size().reindex(positions, fill_value=0).tolist(),
+            "outliers": outliers,
+        }
+        summaries.append(summary)
+    return summaries
+
+
+def _none_if_nan(values):
+    """ helper function to convert an array to a list, with None instead of NaN """
+    return [None if v != v else v for v in np.asarray(values).tolist()]
+
+
+def _block_labels(labels, starts, k):
+    """ helper function to label blocks of k labels: the first label, or "first - last" for text (of blocks of more than one label) """
+    if k == 1 or labels.dtype.kind != "O":
+        return labels[starts]
+    ends = np.minimum(starts + k, len(labels)) - 1
+    return pd.Index([str(labels[i]) if i == j else "%s - %s" % (labels[i], labels[j]) for (i, j) in zip(starts, ends)], name=labels.name)
+
+
+def _index_values(index):
+    """ helper function to convert an index to float64 x values (row position if not numeric or datetime) """
+    if index.dtype.kind == "M":
+        values = index.asi8.astype("float64")
+        return values - values[0]  # keep the triangle areas well conditioned
+    if index.dtype.kind in "biuf" and index.is_monotonic_increasing:
+        return index.to_numpy(dtype="float64")
+    return np.arange(len(index), dtype="float64")
@@ -0,0 +1,99 @@
+""" The frequency module contains:
+    FrequencyCounter class to count items incrementally (e.g. chunks of read_csv(chunksize=...)),
+        optionally in bounded memory, for create_html.frequency_table()
+    top_items() to select the most frequent items of a dict of counts without sorting all of them
+"""
+
+import heapq
+from collections import Counter
+
+import pandas as pd
+
+import idealreport
+
+
+class FrequencyCounter(object):
+    """ class to count items chunk by chunk
+        Exact by default. With max_keys, at most max_keys items are kept (Misra-Gries summary):
+        when there are more, the (max_keys + 1)-th largest count is subtracted from every count and the
+        items left without a count are dropped. Each count is then a lower bound of the true count, which
+        is at most count + error; every item occurring more than total / (max_keys + 1) times is kept.
+
+        Attributes:
+            counts (collections.Counter): count of each item
+            max_keys (int): maximum number of items kept (None --> exact counts)
+            error (int): maximum undercount of any item (0 if exact)
+            total (int): number of items counted
+    """
+
+    def __init__(self, max_keys=None):
+        """ Args:
+                max_keys (int): maximum number of items kept (None --> exact counts of every item)
+        """
+        if max_keys is not None and max_keys < 1:
+            raise Exception("idealreport.frequency.FrequencyCounter() max_keys must be positive")
+        self.counts = Counter()
+        self.max_keys = max_keys
+        self.error = 0
+        self.total = 0
+
+    def update(self, values):
+        """ count a chunk of items
+            Args:
+                values: pandas Series / Index / numpy array (counted with value_counts(), NaN is ignored)
+                        or any iterable of hashable items (not a str: use update([text]) to count one string)
+        """
+        if isinstance(values, (str, bytes)):
+            raise Exception("idealreport.frequency.FrequencyCounter.update() values must be an iterable of items, not a %s" % type(values).__name__)
+        if isinstance(values, (pd.Series, pd.Index)) or hasattr(values, "dtype"):
+            self.update_counts(pd.Series(values).value_counts(sort=False))
+            return
+        chunk = Counter(values)
+        self.counts.update(chunk)
+        self.total += sum(chunk.values())
+        self._truncate()
+
+    def update_counts(self, item_counts):
+        """ add counts of items
+            Args:
+                item_counts: dict {item: count} or pandas Series of counts indexed by item (e.g. value_counts())
+        """
+        if isinstance(item_counts, pd.Series):
+            item_counts = dict(zip(item_counts.index, item_counts.to_numpy().tolist()))
+        self.counts.update(item_counts)
+        self.total += sum(item_counts.values())
+        self._truncate()
+
+    def top(self, n=10):
+        """ most frequent items
+            Args:
+                n (int): number of items
+            Returns:
+                list of (count, item) tuples, largest count first (ties: largest item first)
+        """
+        return top_items(self.counts, n)
+
+    def table(self, name, max_items=10):
+        """ HTML table of the most frequent items (see create_html.frequency_table())
+            if error > 0, the table shows the bounds of each count: count and count + error
+        """
+        return idealreport.create_html.frequency_table(self, name, max_items)
+
+    def _truncate(self):
+        """ helper function to keep at most max_keys items (see the class description) """
+        if self.max_keys is None or len(self.counts) <= self.max_keys:
+            return
+        threshold = heapq.nlargest(self.max_keys + 1, self.counts.values())[-1]
+        self.counts = Counter({key: count - threshold for (key, count) in self.counts.items() if count > threshold})
+        self.error += threshold
+
+
+def top_items(item_counts, n=10):
+    """ most frequent items of a dict of counts, using a heap of n items instead of sorting all of them
+        Args:
+            item_counts (dict): count of each item
+            n (int): number of items
+        Returns:
+            list of (count, item) tuples, largest count first (ties: largest item first)
+    """
+    return heapq.nlargest(n, ((count, key) for (key, count) in item_counts.items()))
@@ -1,8 +1,27 @@
 var g_autoLegendGroupId = 1;
 
+// typed arrays that idealreport.serialize.typed_array_json() can produce
+var g_typedArrays = {float64: Float64Array, float32: Float32Array, int32: Int32Array};
+
+// columns shared by the plots of a report (idealreport.serialize.DataStore), by key
+var g_data = {};
+
+// lazy rendering: functions that render plots which have not been rendered yet, by div id
+var g_pendingPlots = {};
+var g_lazyObserver = null;  // renders plots as they scroll into view
+var g_purgeObserver = null;  // purges plots once they are far off-screen
+var g_purgeMargin = '3000px';  // distance off-screen at which plots are purged
+
+// live reports (idealreport.live): plots extended by the server's events, by key ({id: div id, maxPoints: ...})
+var g_livePlots = {};
+var g_liveSource = null;
+
 
 function generatePlot(id, plotSpec) {
 	var plotDiv = document.getElementById(id);
+
+	// convert any base64 encoded columns to typed arrays
+	decodePlotSpec(plotSpec);
 	
 	// common to all plot types
 	/*if (plotSpec.layout == undefined) {
@@ -27,6 +46,245 @@ function generatePlot(id, plotSpec) {
 	} else {
 		generateGenericPlot(plotDiv, plotSpec);
 	}
+
+	if (plotSpec.live) {
+		registerLivePlot(id, plotSpec.live, plotSpec.typeX === 'timestamp');
+	}
+}
+
+
+/* register a plot to be rendered when it scrolls into view (Reporter(lazy=True))
+   if purge is true, the plot is removed again when it is far off-screen and re-rendered when it returns
+   without IntersectionObserver support the plot is rendered immediately */
+function registerPlot(id, plotSpec, purge) {
+	registerLazyPlot(id, function() { generatePlot(id, plotSpec); }, plotSpec.layout, purge);
+}
+
+
+/* register a direct Plotly.newPlot call to be made when the plot scrolls into view (see registerPlot) */
+function registerPlotly(id, data, layout, config, purge) {
+	registerLazyPlot(id, function() { Plotly.newPlot(document.getElementById(id), data, layout, config); }, layout, purge);
+}
+
+
+function registerLazyPlot(id, render, layout, purge) {
+	var plotDiv = document.getElementById(id);
+	if (!('IntersectionObserver' in window)) {
+		render();
+		return;
+	}
+	if (!g_lazyObserver) {
+		g_lazyObserver = new IntersectionObserver(function(entries) {
+			entries.forEach(function(entry) {
+				if (entry.isIntersecting) {
+					renderPendingPlot(entry.target.id);
+				}
+			});
+		}, {rootMargin: '200px'});
+		// render everything before printing (e.g. to pdf)
+		window.addEventListener('beforeprint', renderAllPlots);
+	}
+
+	// reserve the plot's height so that only plots in view intersect
+	plotDiv.style.minHeight = ((layout && layout.height) || 450) + 'px';
+	plotDiv.setAttribute('data-purge', purge ? 'true' : 'false');
+	g_pendingPlots[id] = render;
+	g_lazyObserver.observe(plotDiv);
+}
+
+
+function renderPendingPlot(id) {
+	var render = g_pendingPlots[id];
+	if (!render) {
+		return;
+	}
+	var plotDiv = document.getElementById(id);
+	delete g_pendingPlots[id];
+	g_lazyObserver.unobserve(plotDiv);
+	render();
+
+	// watch for the plot moving far off-screen
+	if (plotDiv.getAttribute('data-purge') === 'true') {
+		if (!g_purgeObserver) {
+			g_purgeObserver = new IntersectionObserver(function(entries) {
+				entries.forEach(function(entry) {
+					if (!entry.isIntersecting) {
+						purgePlot(entry.target.id);
+					}
+				});
+			}, {rootMargin: g_purgeMargin});
+		}
+		plotDiv.idealreportRender = render;
+		g_purgeObserver.observe(plotDiv);
+	}
+}
+
+
+/* remove a rendered plot (freeing its memory) and wait for it to scroll back into view */
+function purgePlot(id) {
+	var plotDiv = document.getElementById(id);
+	if (!plotDiv.idealreportRender || g_pendingPlots[id] || !plotDiv.classList.contains('js-plotly-plot')) {
+		return;
+	}
+	plotDiv.style.minHeight = plotDiv.offsetHeight + 'px';
+	g_purgeObserver.unobserve(plotDiv);
+	Plotly.purge(plotDiv);
+	g_pendingPlots[id] = plotDiv.idealreportRender;
+	g_lazyObserver.observe(plotDiv);
+}
+
+
+/* render every plot that is waiting to scroll into view */
+function renderAllPlots() {
+	Object.keys(g_pendingPlots).forEach(renderPendingPlot);
+}
+
+
+/* extend the traces of a plot with the rows the report server sends for it (idealreport.live.LivePlot.append())
+   live.maxPoints is the number of points each trace keeps (older points are dropped), or null to keep them all
+   timestamps is true if the x values are ISO timestamps converted to milliseconds (as in generateGenericPlot)
+   the server's events are only received when the report is served over http (not opened as a file) */
+function registerLivePlot(id, live, timestamps) {
+	g_livePlots[live.key] = {id: id, maxPoints: live.maxPoints, timestamps: timestamps};
+	if (g_liveSource || typeof EventSource === 'undefined' || location.protocol.indexOf('http') !== 0) {
+		return;
+	}
+	g_liveSource = new EventSource('/idealreport-events');
+	g_liveSource.onmessage = function(event) {
+		applyLiveUpdate(JSON.parse(event.data));
+	};
+}
+
+
+/* append the columns of an update {key: ..., df: [x column, y columns...]} to the traces of its plot (one trace per y column) */
+function applyLiveUpdate(update) {
+	var live = g_livePlots[update.key];
+	if (!live) {
+		return;
+	}
+	var plotDiv = document.getElementById(live.id);
+	var columns = update.df;
+	var x = decodeArray(columns[0].values);
+	if (live.timestamps) {
+		x = x.map(Date.parse);
+	}
+	var traces = {x: [], y: []};
+	var indices = [];
+	for (var j = 1; j < columns.length; j++) {
+		var trace = plotDiv.data[j - 1];
+		traces.x.push(liveArray(trace.x, x));
+		traces.y.push(liveArray(trace.y, decodeArray(columns[j].values)));
+		indices.push(j - 1);
+	}
+	// only trim once the traces are full (plotly.js fails to trim typed arrays shorter than maxPoints)
+	if (live.maxPoints && plotDiv.data[0].x.length + x.length > live.maxPoints) {
+		Plotly.extendTraces(plotDiv, traces, indices, live.maxPoints);
+	} else {
+		Plotly.extendTraces(plotDiv, traces, indices);
+	}
+}
+
+
+/* values as the same kind of array as the trace values they extend (Plotly.extendTraces needs the same type,
+   e.g. a Float64Array for the columns of binary reports) */
+function liveArray(target, values) {
+	if (target.constructor === values.constructor) {
+		return values;
+	}
+	if (Array.isArray(target)) {
+		return Array.from(values);
+	}
+	return target.constructor.from(values, function(v) { return v === null ? NaN : v; });
+}
+
+
+/* label the ticks of an x axis without gaps, and show the timestamp of each point in its hover label
+   gapAxis.segments are [x, epoch milliseconds] of the first point after each gap (see idealreport.timeaxis) */
+function applyGapAxis(data, layout, gapAxis) {
+	let segments = gapAxis.segments;
+	let length = gapAxis.seconds ? 19 : 16;  // "YYYY-MM-DD HH:MM(:SS)"
+	if (!layout.xaxis.tickvals) {
+		layout.xaxis.tickvals = gapAxis.tickvals;
+		layout.xaxis.ticktext = gapAxis.ticktext;
+	}
+	for (var i = 0; i < data.length; i++) {
+		let x = data[i].x;
+		let text = new Array(x.length);
+		for (var j = 0; j < x.length; j++) {
+			// last segment starting at or before x[j]
+			let lo = 0, hi = segments.length - 1;
+			while (lo < hi) {
+				let mid = (lo + hi + 1) >> 1;
+				if (segments[mid][0] <= x[j]) {
+					lo = mid;
+				} else {
+					hi = mid - 1;
+				}
+			}
+			let ms = segments[lo][1] + Math.round((x[j] - segments[lo][0]) * 1000);
+			text[j] = new Date(ms).toISOString().slice(0, length).replace('T', ' ');
+		}
+		data[i].text = text;
+		data[i].hoverinfo = 'text+y+name';
+	}
+}
+
+
+/* decode a base64 little-endian typed array {dtype: ..., data: ...} (values of other types are returned unchanged)
+   if a shape [rows, cols] is given, return an array of rows (for heat map z values);
+   the rows are views of one typed array, so the values are not copied */
+function decodeArray(value) {
+	if (value === null || typeof value !== 'object' || typeof value.data !== 'string' || !g_typedArrays[value.dtype]) {
+		return value;
+	}
+	var binary = atob(value.data);
+	var bytes = new Uint8Array(binary.length);
+	for (var i = 0; i < binary.length; i++) {
+		bytes[i] = binary.charCodeAt(i);
+	}
+	var array = new g_typedArrays[value.dtype](bytes.buffer);
+	if (value.shape) {
+		var rows = [];
+		var cols = value.shape[1];
+		for (var i = 0; i < value.shape[0]; i++) {
+			rows.push(array.subarray(i * cols, (i + 1) * cols));
+		}
+		return rows;
+	}
+	return array;
+}
+
+
+/* decode the typed arrays in a plot spec in place and resolve columns defined in g_data (safe to call more than once)
+   shared columns are decoded once and the same array is used by every plot that refers to them */
+function decodePlotSpec(plotSpec) {
+	if (plotSpec.data) {
+		for (var i = 0; i < plotSpec.data.length; i++) {
+			var columns = plotSpec.data[i].df || [];
+			for (var j = 0; j < columns.length; j++) {
+				if (columns[j].ref !== undefined) {
+					g_data[columns[j].ref] = decodeArray(g_data[columns[j].ref]);
+					columns[j].values = g_data[columns[j].ref];
+				} else {
+					columns[j].values = decodeArray(columns[j].values);
+				}
+			}
+		}
+	}
+	if (plotSpec.plots) {
+		for (var i = 0; i < plotSpec.plots.length; i++) {
+			plotSpec.plots[i].data = decodeArray(plotSpec.plots[i].data);
+		}
+	}
+	plotSpec.z = decodeArray(plotSpec.z);
+	plotSpec.rangeX = decodeArray(plotSpec.rangeX);
+	plotSpec.rangeY = decodeArray(plotSpec.rangeY);
+}
+
+
+/* trace type of the scatter traces of a data spec: 'scattergl' if the spec asks for WebGL (see PlotSpec webgl) */
+function scatterType(dataSpec) {
+	return dataSpec.webgl ? 'scattergl' : 'scatter';
 }
 
 
@@ -240,7 +498,7 @@ function generateGenericPlot(plotDiv, plotSpec) {
 					dataItem.fill = 'tonexty';
 					dataItem.line = {color: 'transparent'};
 					dataItem.showlegend = false;
-					dataItem.type = 'scatter';
+					dataItem.type = scatterType(dataSpec);
 
 					// make a copy for the lower bound
 					let newDataItem = {};
@@ -253,7 +511,7 @@ function generateGenericPlot(plotDiv, plotSpec) {
 					
 				// handle mean line of continuous error bars
 				} else {
-					dataItem.type = 'scatter';
+					dataItem.type = scatterType(dataSpec);
 					dataItem.mode = 'lines';
 				}
 			}
@@ -334,6 +592,11 @@ function generateGenericPlot(plotDiv, plotSpec) {
 			if (dataSpec.type === 'line' && !dataItem.mode) {
 				dataItem.mode = 'lines';
 			}
+
+			// large traces are drawn with WebGL (markers, lines and error bars alike)
+			if (dataSpec.webgl && (dataItem.type === undefined || dataItem.type === 'scatter')) {
+				dataItem.type = 'scattergl';
+			}
 			//console.log(dataItem);
 			data.push(dataItem);
 		}
@@ -353,6 +616,11 @@ function generateGenericPlot(plotDiv, plotSpec) {
 		}
 	}
 	
+	// x axis without gaps (PlotSpec.time(skip_gaps=true)): x is seconds of the series without its gaps
+	if (plotSpec.gapAxis) {
+		applyGapAxis(data, layout, plotSpec.gapAxis);
+	}
+
 	// other layout
 	if (plotSpec.title) {
 		layout.title = plotSpec.title;
@@ -391,10 +659,15 @@ function generateHeatMap(plotDiv, plotSpec) {
 	if (plotSpec.reversescale) {
 		data[0]['reversescale'] = plotSpec.reversescale;
 	}
-	//if (plotSpec.showscale !== undefined) {
-	if (plotSpec.showscale) {
+	if (plotSpec.showscale !== undefined) {
 		data[0]['showscale'] = plotSpec.showscale;
 	}
+	if (plotSpec.zmin !== undefined) {
+		data[0]['zmin'] = plotSpec.zmin;
+	}
+	if (plotSpec.zmax !== undefined) {
+		data[0]['zmax'] = plotSpec.zmax;
+	}
 
 	// create layout object
 	var layout = { 
@@ -439,9 +712,10 @@ function generateSankeyPlot(plotDiv, plotSpec) {
 		node: {},
 
 		link: {
-			source: columns[1].values,
-			target: columns[2].values,
-			value: columns[3].values,
+			// plain arrays, in case the columns were sent as typed arrays
+			source: Array.prototype.slice.call(columns[1].values),
+			target: Array.prototype.slice.call(columns[2].values),
+			value: Array.prototype.slice.call(columns[3].values),
 			label: linkLabels,
 		}
 	};
@@ -474,10 +748,38 @@ function generateSankeyPlot(plotDiv, plotSpec) {
 	Plotly.newPlot(plotDiv, [data], layout, {staticPlot: staticPlot});
 }
 
+/* values (and their groups) of a box plot summary (PlotSpec.box(summary=True)) from which plotly computes
+   the same quartiles, fences and outliers: per group the outliers, the fences and m copies of each quartile,
+   with m large enough that plotly's interpolated quartiles fall inside the copies */
+function boxSummarySample(summary) {
+	var values = [];
+	var groups = [];
+	for (var k = 0; k < summary.q1.length; k++) {
+		if (summary.q1[k] === null) {
+			continue;  // no values in this group
+		}
+		var outliers = summary.outliers[k];
+		var m = 2 * outliers.length + 6;
+		var sample = outliers.concat([summary.lowerfence[k], summary.upperfence[k]]);
+		for (var c = 0; c < m; c++) {
+			sample.push(summary.q1[k], summary.median[k], summary.q3[k]);
+		}
+		for (var c = 0; c < sample.length; c++) {
+			values.push(sample[c]);
+			if (summary.groups) {
+				groups.push(summary.groups[k]);
+			}
+		}
+	}
+	return {values: values, groups: summary.groups ? groups : null};
+}
+
+
 function generateBoxPlot(plotDiv, plotSpec) {
 
 	var dataSpec = plotSpec.data[0];
-	var columns = dataSpec.df.slice(1);
+	var summaries = dataSpec.summary;
+	var columns = summaries ? summaries : dataSpec.df.slice(1);
 	var names = plotSpec.names;
 	var markers = plotSpec.markers;
 	var boxpoints = plotSpec.boxpoints;
@@ -490,6 +792,11 @@ function generateBoxPlot(plotDiv, plotSpec) {
 			y: columns[i].values,
 			name: columns[i].name,
 		};
+		if (summaries) {
+			var sample = boxSummarySample(summaries[i]);
+			trace.y = sample.values;
+			groups = sample.groups;
+		}
 
 		// Change trace.y to trace.x to switch to horizontal orientation
 		if (dataSpec.orientation == 'h'){
@@ -504,6 +811,9 @@ function generateBoxPlot(plotDiv, plotSpec) {
 		if (boxpoints != null){
 			trace.boxpoints = boxpoints[i];
 		}
+		if (summaries && trace.boxpoints === 'all') {
+			trace.boxpoints = 'outliers';  // the other values of a summary are not samples
+		}
 		// Set groups for vertical orientation
 		if (groups != null && trace.x == null){
 			trace.x = groups;
@@ -544,7 +854,8 @@ function createMetric(context, label, data) {
 /* from https://stackoverflow.com/questions/27012854/change-iso-date-string-to-date-object-javascript */
 function parseISOString(s) {
 	var b = s.split(/\D+/);
-	return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
+	var ms = b[6] ? Math.round(Number('0.' + b[6]) * 1000) : 0;  // the fraction may be missing or have 6 digits
+	return new Date(Date.UTC(b[0], --b[1], b[2], b[3] || 0, b[4] || 0, b[5] || 0, ms));
 }
 
 
@@ -563,6 +874,12 @@ function generateCubismPlot(plotDiv, plotSpec) {
 
 		div.attr('style', 'width:' + size + 'px;position:relative');  // needed to show cursor value in correct location
 
+		if (plotSpec.title) {
+			div.append('div')
+				.attr('class', 'cubismTitle')
+				.text(plotSpec.title);
+		}
+
 		div.append('div')
 			.attr('class', 'axis')
 			.call(context.axis().orient('top').ticks(plotSpec.tickCount).tickFormat(d3.time.format(plotSpec.timestampFormat)));
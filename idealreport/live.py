@@ -0,0 +1,210 @@
+""" The live module contains:
+    LiveServer class to serve a report (and its css/js files) from a local HTTP server and push
+        the rows appended to its plots to the open pages with Server-Sent Events
+    LivePlot class for the HTML of a plot created with live=True (e.g. r.plot.time(df, live=True)),
+        whose append() method extends the traces of the plot in every open page
+    Only the python standard library is used (http.server, one thread per open page).
+"""
+
+import collections
+import functools
+import http.server
+import json
+import os
+import queue
+import threading
+
+import idealreport
+
+# URL path of the event stream (plotting.js connects to it when the report is served over http)
+EVENTS_PATH = "/idealreport-events"
+
+# seconds between keep-alive comments sent to idle pages (so closed pages are noticed)
+KEEPALIVE_SECONDS = 15
+
+
+class LiveServer(object):
+    """ class to serve the files of a directory and push updates of live plots to the pages showing them
+        Each update is kept (for pages opened or reloaded later) until the points it added have been
+        trimmed from its plot, so the history of a plot with max_points is bounded.
+        Attributes:
+            root (str): directory served
+            url (str): URL of the root directory e.g. "http://127.0.0.1:8000/"
+    """
+
+    def __init__(self, root, host="127.0.0.1", port=0):
+        """ start serving in a background thread
+            Args:
+                root (str): directory served (must contain the report and its css/js files)
+                host (str): address to listen on (default: this computer only)
+                port (int): port to listen on (0 --> any free port)
+        """
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._clients = []
+        self._plots = {}  # key --> max_points
+        self._history = {}  # key --> deque of [id, rows, message]
+        self._next_id = 1
+        handler = functools.partial(_LiveHandler, directory=self.root)
+        self._httpd = http.server.ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.live = self
+        self.url = "http://%s:%d/" % (host, self._httpd.server_address[1])
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="idealreport-live", daemon=True)
+        self._thread.start()
+
+    def url_for(self, path):
+        """ URL of a file in the root directory e.g. the report HTML """
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative.startswith(".."):
+            raise Exception("idealreport.live.LiveServer.url_for() %s is not in %s" % (path, self.root))
+        return self.url + relative.replace(os.sep, "/")
+
+    def add_plot(self, max_points=None):
+        """ allocate the key of a live plot
+            Args:
+                max_points (int): number of points each trace keeps (None --> all)
+            Returns:
+                key (str)
+        """
+        if max_points is not None and max_points < 1:
+            raise Exception("idealreport.live.LiveServer.add_plot() max_points must be positive")
+        with self._lock:
+            key = "live%d" % (len(self._plots) + 1)
+            self._plots[key] = max_points
+            self._history[key] = collections.deque()
+        return key
+
+    def publish(self, key, message, rows):
+        """ send an update of a live plot to every open page (and keep it for pages opened later)
+            Args:
+                key (str): key of the plot (see add_plot())
+                message (str): JSON of the update (one line)
+                rows (int): number of points the update adds to each trace
+        """
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            history = self._history[key]
+            history.append([event_id, rows, message])
+            max_points = self._plots[key]
+            if max_points is not None:
+                # drop the oldest updates whose points have all been trimmed by the later ones
+                newer = sum(entry[1] for entry in history) - history[0][1]
+                while len(history) > 1 and newer >= max_points:
+                    history.popleft()
+                    newer -= history[0][1]
+            for client in self._clients:
+                client.put((event_id, message))
+
+    def close(self):
+        """ disconnect the open pages and stop the server """
+        with self._lock:
+            for client in self._clients:
+                client.put(None)
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _connect(self, last_id=0):
+        """ helper function to register a page: returns its queue and the updates it has not seen yet """
+        client = queue.Queue()
+        with self._lock:
+            missed = sorted((entry[0], entry[2]) for history in self._history.values() for entry in history if entry[0] > last_id)
+            self._clients.append(client)
+        return client, missed
+
+    def _disconnect(self, client):
+        """ helper function to unregister a page """
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+
+class LivePlot(str):
+    """ HTML of a live plot (append it to the report like any plot, e.g. r.h += plot)
+        with append() to add rows to the plot in every page showing it
+        Attributes:
+            key (str): key of the plot (see LiveServer.add_plot())
+            max_points (int): number of points each trace keeps (None --> all)
+    """
+
+    def __new__(cls, html, server, key, columns, max_points=None, time_format=None, precision=None):
+        """ Args:
+                html (str): HTML of the plot
+                server (LiveServer): server of the report
+                key (str): key of the plot
+                columns (int): number of columns (traces) of the plot
+                max_points (int): number of points each trace keeps (None --> all)
+                time_format (str): strftime format of the x values (see PlotSpec.time())
+                precision (int or str): precision of the float values (see idealreport.serialize.quantize)
+        """
+        plot = str.__new__(cls, html)
+        plot.server = server
+        plot.key = key
+        plot.columns = columns
+        plot.max_points = max_points
+        plot.time_format = time_format
+        plot.precision = precision
+        return plot
+
+    def append(self, df):
+        """ add rows to the plot (older points are dropped beyond max_points)
+            Args:
+                df (DataFrame or Series): new rows, with the same columns as the plot (the index is the x value)
+        """
+        columns = df.shape[1] if len(df.shape) == 2 else 1
+        if columns != self.columns:
+            raise Exception("idealreport.live.LivePlot.append() df has %d columns, the plot has %d" % (columns, self.columns))
+        if self.time_format is not None:
+            # as PlotSpec.time(): remove nan and replace timestamps as strings
+            if columns == 1:
+                df = df[df.notnull()]
+            else:
+                df = df[df.notnull().any(axis=1)]
+            df = df.copy(deep=False)
+            df.index = df.index.strftime(self.time_format)
+        if len(df) == 0:
+            return
+        message = '{"key": %s, "df": %s}' % (json.dumps(self.key), idealreport.serialize.dataframe_to_json(df, precision=self.precision))
+        self.server.publish(self.key, message, len(df))
+
+
+class _LiveHandler(http.server.SimpleHTTPRequestHandler):
+    """ request handler serving the files of the root directory and the event stream at EVENTS_PATH """
+
+    def do_GET(self):
+        if self.path != EVENTS_PATH:
+            return super().do_GET()
+        live = self.server.live
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last_id = self.headers.get("Last-Event-ID")  # sent by the browser when it reconnects
+        client, missed = live._connect(int(last_id) if last_id and last_id.isdigit() else 0)
+        try:
+            for (event_id, message) in missed:
+                self._send_event(event_id, message)
+            while True:
+                try:
+                    event = client.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    break
+                self._send_event(*event)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            live._disconnect(client)
+
+    def _send_event(self, event_id, message):
+        """ helper function to write one event """
+        self.wfile.write(("id: %d\ndata: %s\n\n" % (event_id, message)).encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        """ do not log each request """
+        pass
@@ -3,14 +3,47 @@
     2) HTML
 """
 
+import functools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
 import idealreport
 
+# default number of points of a scatter or line trace above which it is drawn with WebGL (scattergl),
+# as SVG traces become slow to pan and zoom
+WEBGL_THRESHOLD = 10000
+
+# types of the data specs drawn as scatter traces, which plotting.js can draw with WebGL instead
+WEBGL_TYPES = ("line", "scatter")
+
+# start time of the plot function running in each thread (see _timed())
+_STARTED = threading.local()
+
+
+def _timed(plot_function):
+    """ decorator of the PlotSpec plot functions: note when the function started, so the profile of the report
+        includes the work done before create_html.plot() (e.g. downsampling, histogram binning, box summaries)
+    """
+
+    @functools.wraps(plot_function)
+    def wrapper(self, *args, **kwargs):
+        _STARTED.time = time.perf_counter()
+        try:
+            return plot_function(self, *args, **kwargs)
+        finally:
+            _STARTED.time = None
+
+    return wrapper
+
 
 class PlotSpec(object):
     """ The PlotSpec class contains functions to create various standard plots:
             basic: line(), pie(), scatter(), time()
             bar charts: bar(), barh(), baro(), histogram()
-            advanced: box(), errbar(), errline(), sankey()
+            advanced: box(), errbar(), errline(), heatmap(), horizon(), sankey()
 
         The output of the class functions will be:
             dict if return_html == False
@@ -25,9 +58,29 @@ class PlotSpec(object):
         See sample_plots.py for examples.
     """
 
-    def __init__(self, return_html=False):
-        """ store a boolean that determines if the PlotSpec f()s will return a dict or HTML"""
+    def __init__(self, return_html=False, binary=False, max_points=None, lazy=False, purge=False, context=None, precision=None, webgl_threshold=WEBGL_THRESHOLD, live=None):
+        """ store a boolean that determines if the PlotSpec f()s will return a dict or HTML
+            binary (bool): if True, the HTML embeds numeric data as base64 typed arrays
+            max_points (int): default for the max_points argument of line(), multi() and time()
+            lazy (bool): if True, the HTML renders each plot when it scrolls into view
+            purge (bool): if True (and lazy), plots far off-screen are removed until they return
+            context (create_html.ReportContext): report the HTML belongs to (allocates the plot IDs)
+            precision (int or str): default precision of the float data of the plots (None --> full precision):
+                                    significant digits (e.g. 4), decimal places (e.g. ".2f") or "float32",
+                                    see idealreport.serialize.quantize
+            webgl_threshold (int): scatter(), line(), time() and multi() traces of more points are drawn with WebGL
+                                   (None --> always SVG unless webgl=True)
+            live (idealreport.live.LiveServer): server of the report, for line(), scatter() and time() with live=True
+        """
         self.return_html = return_html
+        self.binary = binary
+        self.max_points = max_points
+        self.lazy = lazy
+        self.purge = purge
+        self.context = context
+        self.precision = precision
+        self.webgl_threshold = webgl_threshold
+        self.live = live
 
     def _add_labels(self, plot_dict, title=None, x_label=None, y_label=None, y2_label=None):
         """ add standard labels to a plot dictionary
@@ -111,19 +164,89 @@ class PlotSpec(object):
 
         return plot_dict
 
-    def _process_output(self, plot_dict):
+    def _downsample(self, df, max_points, method):
+        """ downsample df (see idealreport.downsample.downsample) to at most max_points rows
+            Args:
+                df (DataFrame): df
+                max_points (int): maximum number of rows; if None, use self.max_points (None --> no downsampling)
+                method (str): "lttb" or "minmax"
+            Returns:
+                df (DataFrame): df or a subset of its rows
+        """
+        if max_points is None:
+            max_points = self.max_points
+        return idealreport.downsample.downsample(df, max_points, method)
+
+    def _set_webgl(self, plot_dict, webgl=None):
+        """ mark the data specs whose traces are drawn with WebGL (scattergl) by plotting.js
+            Only line and scatter data specs are marked (e.g. not the bars of multi()).
+            Args:
+                plot_dict (dict): dictionary of plot specifications
+                webgl (bool): True / False --> every / no data spec; None --> data specs of more than
+                              self.webgl_threshold rows (points per trace)
+            Returns:
+                plot_dict (dict): dictionary of plot specifications
+        """
+        for data_spec in plot_dict["data"]:
+            if data_spec.get("type") not in WEBGL_TYPES:
+                continue
+            if webgl is None:
+                use_webgl = self.webgl_threshold is not None and len(data_spec["df"]) > self.webgl_threshold
+            else:
+                use_webgl = webgl
+            if use_webgl:
+                data_spec["webgl"] = True
+        return plot_dict
+
+    def _process_output(self, plot_dict, precision=None, live=False, live_points=None, time_format=None):
         """ if specified in init(), return HTML. Default is to return a dict
             Args:
                 plot_dict (dict): dictionary of plot specifications
+                precision (int or str): precision of the float data (None --> self.precision)
+                live, live_points, time_format: see _live_output()
             Returns:
-                plot_dict unchanged, if self.return_html == False
+                plot_dict, if self.return_html == False
                 create_html.plot(plot_dict), if self.return_html == True
+                idealreport.live.LivePlot, if live
         """
+        if precision is None:
+            precision = self.precision
+        if precision is not None:
+            idealreport.serialize._parse_precision(precision)  # check it now rather than when the report is saved
+            plot_dict["precision"] = precision
+        if live:
+            return self._live_output(plot_dict, live_points, time_format, precision)
         if self.return_html:
-            return idealreport.create_html.plot(plot_dict)
+            return idealreport.create_html.plot(plot_dict, binary=self.binary, lazy=self.lazy, purge=self.purge, context=self.context, spec_seconds=self._spec_seconds())
         else:
             return plot_dict
 
+    def _spec_seconds(self):
+        """ helper function to get the seconds since the plot function started (0.0 if not called from one) """
+        started = getattr(_STARTED, "time", None)
+        return 0.0 if started is None else time.perf_counter() - started
+
+    def _live_output(self, plot_dict, live_points=None, time_format=None, precision=None):
+        """ return the HTML of a live plot, whose traces are extended by the append() method of the result
+            Args:
+                plot_dict (dict): dictionary of plot specifications (one data spec, one trace per column)
+                live_points (int): number of points each trace keeps as rows are appended (None --> all)
+                time_format (str): strftime format of the x values (see time())
+                precision (int or str): precision of the appended float data
+            Returns:
+                idealreport.live.LivePlot
+        """
+        if self.live is None or not self.return_html:
+            raise Exception("idealreport.plot live=True needs a Reporter(live=True)")
+        df = plot_dict["data"][0]["df"]
+        key = self.live.add_plot(live_points)
+        plot_dict["live"] = {"key": key, "maxPoints": live_points}
+        # rendered immediately (not lazily), so no update is missed
+        html = idealreport.create_html.plot(plot_dict, binary=self.binary, context=self.context, spec_seconds=self._spec_seconds())
+        columns = df.shape[1] if len(df.shape) == 2 else 1
+        return idealreport.live.LivePlot(html, self.live, key, columns, max_points=live_points, time_format=time_format, precision=precision)
+
+    @_timed
     def amchart_plot(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None):
         """ amchart_plot
             Args:
@@ -151,6 +274,7 @@ class PlotSpec(object):
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
         return self._process_output(plot_dict)
 
+    @_timed
     def amchart_line_plot(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None):
         """ amchart_line_plot
             Args:
@@ -178,6 +302,7 @@ class PlotSpec(object):
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
         return self._process_output(plot_dict)
 
+    @_timed
     def amchart_semipie_plot(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None):
         """ amchart_semipie_plot
             Args:
@@ -205,6 +330,7 @@ class PlotSpec(object):
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
         return self._process_output(plot_dict)
 
+    @_timed
     def amchart_gauge_plot(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None):
         """ amchart_semipie_plot
             Args:
@@ -232,7 +358,8 @@ class PlotSpec(object):
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
         return self._process_output(plot_dict)
 
-    def bar(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None):
+    @_timed
+    def bar(self, df, title=None, x_label=None, y_label=None, stacked=False, horizontal=False, custom_design=None, custom_data=None, precision=None):
         """ bar chart
             Args:
                 df (DataFrame): df
@@ -243,6 +370,7 @@ class PlotSpec(object):
                                       expecting keys in set(['layout', 'markers', 'widths'])
                 custom_data (dict): dictionary of custom data
                                     expecting keys in set(['data_to_iterate', 'data_static'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -261,9 +389,10 @@ class PlotSpec(object):
         expect = ["layout", "markers", "widths"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def baroverlay(self, df, title=None, x_label=None, y_label=None, orientation="v", custom_data=None, custom_design=None):
+    @_timed
+    def baroverlay(self, df, title=None, x_label=None, y_label=None, orientation="v", custom_data=None, custom_design=None, precision=None):
         """ overlay bar chart
             Args:
                 df (DataFrame): df (index will be the x-axis)
@@ -271,6 +400,7 @@ class PlotSpec(object):
                 stacked (bool): True --> stacked bar chart (default False)
                 horizontal (bool): True / False --> horizontal / vertical bar
                 custom_design (dict): customize, expecting keys in set(['layout', 'markers', 'widths'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -283,9 +413,10 @@ class PlotSpec(object):
         expect = ["layout", "markers", "opacities", "widths"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def box(self, df, title=None, groups=None, horizontal=False, custom_design=None):
+    @_timed
+    def box(self, df, title=None, groups=None, horizontal=False, custom_design=None, summary=False, max_outliers=100, precision=None):
         """ box plot
             Args:
                 df (DataFrame): df
@@ -295,6 +426,11 @@ class PlotSpec(object):
                 boxpoints: List of strings with boxpoints types
                 horizontal (bool): True / False --> horizontal / vertical
                 custom_design (dict): customize, expecting keys in set(['layout', 'markers'])
+                summary (bool): True --> compute the quartiles, fences and outliers of each box in python and only
+                                embed them (the size of the plot does not depend on the number of samples),
+                                see idealreport.downsample.box_summary
+                max_outliers (int): maximum number of outliers shown per box if summary
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -302,15 +438,19 @@ class PlotSpec(object):
         orientation = "h" if horizontal else "v"
 
         # plot specifications
-        plot_dict = {"data": [{"df": df, "orientation": orientation, "groups": groups}], "type": "box"}
+        if summary:
+            plot_dict = {"data": [{"summary": idealreport.downsample.box_summary(df, groups, max_outliers), "orientation": orientation}], "type": "box"}
+        else:
+            plot_dict = {"data": [{"df": df, "orientation": orientation, "groups": groups}], "type": "box"}
 
         # labels and customize the plot, if specified
         expect = ["layout", "markers", "names", "boxpoints"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def errbar(self, df, title=None, x_label=None, y_label=None, symmetric=True, custom_design=None):
+    @_timed
+    def errbar(self, df, title=None, x_label=None, y_label=None, symmetric=True, custom_design=None, precision=None):
         """ error bar chart
             Args:
                 df (DataFrame): df (index will be the x-axis)
@@ -318,6 +458,7 @@ class PlotSpec(object):
                 stacked (bool): True --> stacked bar chart (default False)
                 symmetric (bool): True / False --> symmetric/unsymmetric error bars around mean (default True)
                 custom_design (dict): customize, expecting keys in set(['layout'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -328,15 +469,17 @@ class PlotSpec(object):
         expect = ["layout"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def errline(self, df, title=None, x_label=None, y_label=None, fillcolor="rgba(0,100,80,0.2)", custom_design=None):
+    @_timed
+    def errline(self, df, title=None, x_label=None, y_label=None, fillcolor="rgba(0,100,80,0.2)", custom_design=None, precision=None):
         """ continuous error line
             Args:
                 df (DataFrame): df (index will be the x-axis)
                 title, x_label, y_label (str): plot labels (optional)
                 fillcolor (str): rgba value for fill, default is 'rgba(0,100,80,0.2)'
                 custom_design (dict): customize, expecting keys in set(['layout'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -348,36 +491,139 @@ class PlotSpec(object):
         expect = ["layout"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def histogram(self, df, title=None, x_label=None, y_label=None, custom_design=None):
-        """ error bar chart
+    @_timed
+    def heatmap(self, df, title=None, x_label=None, y_label=None, colorscale=None, reversescale=False, showscale=True, zmin=None, zmax=None, max_cells=None, downsample="mean", static=True, precision=None):
+        """ heat map of a matrix (e.g. a correlation matrix); the values are sent as one typed array
+            Args:
+                df (DataFrame): matrix (the index labels the rows / y axis, the columns label the x axis)
+                title, x_label, y_label (str): plot labels (optional)
+                colorscale (str or list): plotly colorscale, e.g. "Viridis" (optional)
+                reversescale (bool): True --> reverse the colorscale
+                showscale (bool): True --> show the colorbar
+                zmin, zmax (float): range of the colorscale (default: range of the values)
+                max_cells (int): average blocks of cells so the heat map has at most max_cells cells (optional)
+                downsample (str): "mean" (average of each block) or "stride" (first cell of each block),
+                                  see idealreport.downsample.downsample_matrix
+                static (bool): False --> interactive plot (zoom, hover)
+                precision (int or str): round the values, e.g. "float32" (half the size) (default: self.precision)
+            Returns:
+                plot_dict (dict): dictionary of plot specifications
+        """
+        df = idealreport.downsample.downsample_matrix(df, max_cells, downsample)
+
+        # plot specifications
+        plot_dict = {"type": "heatMap", "z": df.to_numpy(dtype="float64"), "rangeX": list(df.columns), "rangeY": list(df.index), "showscale": showscale, "staticPlot": static}
+        if colorscale is not None:
+            plot_dict["colorscale"] = colorscale
+        if reversescale:
+            plot_dict["reversescale"] = reversescale
+        if zmin is not None:
+            plot_dict["zmin"] = zmin
+        if zmax is not None:
+            plot_dict["zmax"] = zmax
+        if x_label is not None:
+            plot_dict["labelX"] = x_label
+        if y_label is not None:
+            plot_dict["labelY"] = y_label
+        plot_dict = self._add_labels(plot_dict, title)
+        return self._process_output(plot_dict, precision)
+
+    @_timed
+    def histogram(self, df, title=None, x_label=None, y_label=None, custom_design=None, bins=None, max_bins=1000, density=False, precision=None):
+        """ histogram
             Args:
                 df (DataFrame): df
                 title, x_label, y_label (str): plot labels (optional)
-                custom_design (dict): customize, expecting keys in set(['layout'])
+                custom_design (dict): customize, expecting keys in set(['layout', 'markers'])
+                bins: None --> send the samples and let plotly bin them; else bin the samples in python and plot
+                      the counts as bars (the size of the plot does not depend on the number of samples):
+                      int (number of equal bins), "fd" (Freedman-Diaconis rule) or a list of bin edges,
+                      shared by all the columns, see idealreport.downsample.histogram_counts
+                max_bins (int): maximum number of bins for bins="fd"
+                density (bool): if True (and bins), plot the probability density instead of the counts
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
 
         # plot specifications
-        plot_dict = {"data": [{"df": df, "type": "histogram"}]}
+        if bins is None:
+            plot_dict = {"data": [{"df": df, "type": "histogram"}]}
+        else:
+            (counts, edges) = idealreport.downsample.histogram_counts(df, bins, max_bins, density)
+            widths = np.diff(edges)
+            width = float(widths[0]) if np.allclose(widths, widths[0]) else widths.tolist()
+            n_columns = counts.shape[1]
+            plot_dict = {"data": [{"df": counts, "type": "bar" if n_columns == 1 else "overlayBar"}], "widths": [width] * n_columns}
+            if n_columns > 1:
+                plot_dict["opacities"] = [0.6] * n_columns
 
         # labels and customize the plot, if specified
         expect = ["layout", "markers"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
+        if bins is not None and "bargap" not in plot_dict.get("layout", {}):
+            plot_dict["layout"] = dict(plot_dict.get("layout", {}), bargap=0)  # adjacent bins
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
+
+    @_timed
+    def horizon(self, df, title=None, width=960, height=30, method="mean", extent=None, time_format=None, tick_count=10, precision=None):
+        """ horizon charts (cubism) of many time series, e.g. monitoring metrics, one chart per column
+            Each series is aggregated to one value per pixel before it is embedded
+            (e.g. a day of 1-second data becomes at most width values per series).
+            Args:
+                df (DataFrame): time series (DatetimeIndex), one column per chart
+                title (str): plot title (optional)
+                width (int): width of the charts in pixels (maximum number of values per series)
+                height (int): height of each chart in pixels
+                method (str): value of each pixel: "mean", "max", "min" or "last" of its time bucket,
+                              see idealreport.downsample.resample_pixels
+                extent (tuple): (min, max) of the color bands of every chart (default: the range of each series)
+                time_format (str): strftime format of the axis labels (default: "%H:%M", "%b %d" for more than 2 days)
+                tick_count (int): approximate number of axis labels
+                precision (int or str): round the values, e.g. "float32" (half the size) (default: self.precision)
+            Returns:
+                plot_dict (dict): dictionary of plot specifications
+        """
+        if isinstance(df, pd.Series):
+            df = df.to_frame()
+        (df, step) = idealreport.downsample.resample_pixels(df, width, method)
+        if time_format is None:
+            time_format = "%H:%M" if df.index[-1] - df.index[0] <= pd.Timedelta(days=2) else "%b %d"
+
+        # one chart per column
+        plots = []
+        for (j, col) in enumerate(df.columns):
+            values = df.iloc[:, j].to_numpy(dtype="float64")
+            (low, high) = extent if extent is not None else (np.nanmin(values), np.nanmax(values)) if np.isfinite(values).any() else (0.0, 1.0)
+            plots.append({"label": str(col), "data": values, "height": height, "min": float(low), "max": float(high)})
 
-    def line(self, df, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None):
+        # plot specifications
+        plot_dict = {"type": "cubism", "plots": plots, "startTimestamp": df.index[0], "timeStep": step.total_seconds(), "tickCount": tick_count, "timestampFormat": time_format}
+        plot_dict = self._add_labels(plot_dict, title)
+        return self._process_output(plot_dict, precision)
+
+    @_timed
+    def line(self, df, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None, max_points=None, downsample="lttb", webgl=None, precision=None, live=False, live_points=None):
         """ line plot
             Args:
                 df (DataFrame): df (index will be the x-axis)
                 title, x_label, y_label (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'markers', 'widths'])
+                max_points (int): downsample to at most max_points rows, keeping the shape of each column (optional)
+                downsample (str): downsampling method, "lttb" or "minmax" (keeps spikes)
+                webgl (bool): True / False --> draw with WebGL (scattergl) / SVG (default: WebGL above self.webgl_threshold points)
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
+                live (bool): if True, return an idealreport.live.LivePlot whose append(df) adds rows to the plot in the open pages
+                    (needs a Reporter(live=True))
+                live_points (int): with live, number of points each trace keeps (older points are dropped; None --> all)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
+        df = self._downsample(df, max_points, downsample)
+
         # plot specifications
         plot_dict = {"data": [{"df": df, "type": "line"}]}
         plot_dict = self._customize_data(plot_dict=plot_dict, custom_data=custom_data)
@@ -386,9 +632,11 @@ class PlotSpec(object):
         expect = ["layout", "lines"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        plot_dict = self._set_webgl(plot_dict, webgl)
+        return self._process_output(plot_dict, precision, live, live_points)
 
-    def multi(self, dfs, types, title=None, x_label=None, y_label=None, y2_label=None, y2_axis=None, custom_data=None, custom_design=None):
+    @_timed
+    def multi(self, dfs, types, title=None, x_label=None, y_label=None, y2_label=None, y2_axis=None, custom_data=None, custom_design=None, max_points=None, downsample="lttb", webgl=None, precision=None):
         """ multiple types (line, bar, etc) on a single plot
             Args:
                 df (DataFrame): list of DataFrames
@@ -396,9 +644,15 @@ class PlotSpec(object):
                 title, x_label, y_label, y2_label (str): plot labels (optional)
                 y2_axis (list of booleans): booleans indicating whether y values should be plotted on secondary y axis (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'lines', 'markers', 'opacities', 'widths'])
+                max_points (int): downsample each df to at most max_points rows, keeping the shape of each column (optional)
+                downsample (str): downsampling method, "lttb" or "minmax" (keeps spikes)
+                webgl (bool): True / False --> draw with WebGL (scattergl) / SVG (default: WebGL above self.webgl_threshold points)
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
+        dfs = [self._downsample(df, max_points, downsample) for df in dfs]
+
         # list of data for plot specifications
         data_static = None
         data_to_iterate = None
@@ -429,14 +683,17 @@ class PlotSpec(object):
         expect = ["layout", "lines", "markers", "opacities", "widths"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict=plot_dict, title=title, x_label=x_label, y_label=y_label, y2_label=y2_label)
-        return self._process_output(plot_dict)
+        plot_dict = self._set_webgl(plot_dict, webgl)
+        return self._process_output(plot_dict, precision)
 
-    def ohlc(self, df, title=None, x_label=None, y_label=None, custom_design=None):
+    @_timed
+    def ohlc(self, df, title=None, x_label=None, y_label=None, custom_design=None, precision=None):
         """ open high low close (OHLC) plot
             Args:
                 df (DataFrame): df with required columns ['open', 'high', 'low', 'close']
                 title, x_label, y_label, (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'lines'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -448,15 +705,17 @@ class PlotSpec(object):
         expect = ["layout", "lines"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def pie(self, df, title=None, hole=None, custom_data=None, custom_design=None):
+    @_timed
+    def pie(self, df, title=None, hole=None, custom_data=None, custom_design=None, precision=None):
         """ pie chart
             Args:
                 df (DataFrame): df
                 hole (num [0-1]): percentage of pie to cut out for donut (optional)
                 title (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'lines'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -471,14 +730,16 @@ class PlotSpec(object):
         expect = ["layout", "margin", "markers"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def sankey(self, df, title=None, horizontal=True, custom_design=None):
+    @_timed
+    def sankey(self, df, title=None, horizontal=True, custom_design=None, precision=None):
         """ sankey chart
             Args:
                 df (DataFrame): df
                 title (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout'])
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -492,14 +753,20 @@ class PlotSpec(object):
         expect = ["layout", "nodeLabels", "linkLabels", "nodeColors"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict=plot_dict, title=title)
-        return self._process_output(plot_dict)
+        return self._process_output(plot_dict, precision)
 
-    def scatter(self, df, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None):
+    @_timed
+    def scatter(self, df, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None, webgl=None, precision=None, live=False, live_points=None):
         """ scatter
             Args:
                 df (DataFrame): df (index will be the x-axis)
                 title, x_label, y_label (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'markers', 'widths'])
+                webgl (bool): True / False --> draw with WebGL (scattergl) / SVG (default: WebGL above self.webgl_threshold points)
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
+                live (bool): if True, return an idealreport.live.LivePlot whose append(df) adds rows to the plot in the open pages
+                    (needs a Reporter(live=True))
+                live_points (int): with live, number of points each trace keeps (older points are dropped; None --> all)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
@@ -511,33 +778,63 @@ class PlotSpec(object):
         expect = ["layout", "margin", "markers"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        plot_dict = self._set_webgl(plot_dict, webgl)
+        return self._process_output(plot_dict, precision, live, live_points)
 
-    def time(self, df, time_format=None, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None):
+    @_timed
+    def time(self, df, time_format=None, title=None, x_label=None, y_label=None, custom_data=None, custom_design=None, max_points=None, downsample="lttb", skip_gaps=False, max_gap=None, webgl=None, precision=None, live=False, live_points=None):
         """ time series
             Args:
                 df (DataFrame): df (index will be the x-axis)
                 time_format (str): If specified, skip gaps (e.g. weekends) and format timestamps using this str
+                    (the x axis is categorical: one label per timestamp); with skip_gaps, the format of the tick labels
                 title, x_label, y_label (str): plot labels (optional)
                 custom_design (dict): customize, expecting keys in set(['layout', 'markers', 'widths'])
+                max_points (int): downsample to at most max_points rows, keeping the shape of each column (optional)
+                downsample (str): downsampling method, "lttb" or "minmax" (keeps spikes)
+                skip_gaps (bool): if True, remove the gaps (e.g. nights and weekends) from a numeric x axis
+                    (see idealreport.timeaxis); the hover labels show the timestamps
+                max_gap (pd.Timedelta or str): with skip_gaps, longest spacing that is kept (default: 1.5x the median, see idealreport.timeaxis.GAP_FACTOR)
+                webgl (bool): True / False --> draw with WebGL (scattergl) / SVG (default: WebGL above self.webgl_threshold points)
+                precision (int or str): round the float data, e.g. 4 significant digits, ".2f" or "float32" (default: self.precision)
+                live (bool): if True, return an idealreport.live.LivePlot whose append(df) adds rows to the plot in the open pages
+                    (needs a Reporter(live=True))
+                live_points (int): with live, number of points each trace keeps (older points are dropped; None --> all)
             Returns:
                 plot_dict (dict): dictionary of plot specifications
         """
+        if live and skip_gaps:
+            raise Exception("idealreport.plot.time() live plots cannot skip_gaps")
+        df = self._downsample(df, max_points, downsample)
+
+        gap_axis = None
+        if skip_gaps:
+            # numeric x values without the gaps (a shallow copy, so the caller's df is unchanged)
+            x, segments = idealreport.timeaxis.gapless_axis(df.index, max_gap)
+            tickvals, ticktext = idealreport.timeaxis.axis_ticks(df.index, x, time_format)
+            gap_axis = {"segments": segments, "seconds": bool(len(x) > 1 and (x[1:] - x[:-1]).min() < 60), "tickvals": tickvals, "ticktext": ticktext}
+            df = df.copy(deep=False)
+            df.index = pd.Index(x, name=df.index.name)
+
         # remove nan and replace timestamps as strings to handle gaps in time
-        if time_format is not None:
+        elif time_format is not None:
             is_one_dim = (len(df.shape) == 1) or (df.shape[1] == 1)
             if is_one_dim:
                 df = df[df.notnull()]
             else:
                 df = df[df.notnull().any(axis=1)]
-            df.index = df.index.map(lambda dt: dt.strftime(time_format))
+            df = df.copy(deep=False)
+            df.index = df.index.strftime(time_format)
 
         # plot specifications
         plot_dict = {"data": [{"df": df, "type": "line"}]}
+        if gap_axis is not None:
+            plot_dict["gapAxis"] = gap_axis
         plot_dict = self._customize_data(plot_dict=plot_dict, custom_data=custom_data)
 
         # labels and customize the plot, if specified
         expect = ["layout", "lines"]
         plot_dict = self._customize_design(plot_dict=plot_dict, custom_design=custom_design, expect=expect)
         plot_dict = self._add_labels(plot_dict, title, x_label, y_label)
-        return self._process_output(plot_dict)
+        plot_dict = self._set_webgl(plot_dict, webgl)
+        return self._process_output(plot_dict, precision, live, live_points, time_format)
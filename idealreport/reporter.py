@@ -4,6 +4,10 @@
     Col to add an HTML column
 """
 
+import json
+import os
+import time
+
 import idealreport
 
 
@@ -12,27 +16,163 @@ class Reporter(object):
         Attributes:
             title (str): report title
             output_file (str): full name of the resulting HTML file
-            h (str): string of HTML
+            h (str): string of HTML (an idealreport.sink.HtmlSink if streaming)
             plot (idealreport.plot.PlotSpec): creates HTML of plots
+            context (idealreport.create_html.ReportContext): allocates this report's plot IDs
+            cache (idealreport.cache.FragmentCache): cache of the HTML of sections (or None)
+            live (idealreport.live.LiveServer): server of a live report (or None), live.close() stops it
     """
 
-    def __init__(self, title, output_file):
+    def __init__(self, title, output_file, stream=False, buffer_size=1 << 20, binary=False, max_points=None, lazy=False, purge=False, lib_dir=None, asset_mode="copy", cache=None, share_data=False, profile=False, on_element=None, json_engine=None, precision=None, compression=None, keep_html=True, compression_level=None, compress_libs=None, webgl_threshold=idealreport.plot.WEBGL_THRESHOLD, live=False):
+        """ Args:
+                title (str): report title
+                output_file (str): full name of the resulting HTML file
+                stream (bool or file-like): if True, write HTML to output_file as it is generated
+                    instead of keeping it in memory; if a file-like object, write to it instead
+                    (uncompressed: compression and keep_html=False need stream=True)
+                buffer_size (int): maximum number of characters held in memory when streaming
+                binary (bool): if True, plots embed numeric data as base64 typed arrays
+                max_points (int): default number of points (rows) for line, multi and time plots
+                    (larger data is downsampled before it is embedded)
+                lazy (bool): if True, plots are rendered when they scroll into view (faster to open);
+                    if False, all plots are rendered when the report opens (e.g. for printing to pdf)
+                purge (bool): if True (and lazy), plots far off-screen are removed until they scroll back
+                lib_dir (str): directory for the css/js files shared by many reports
+                    (default: the directory of output_file); the report refers to it by a relative path
+                asset_mode (str): "copy" the css/js files, or "hardlink" / "symlink" them to the installed files
+                cache (idealreport.cache.FragmentCache or str): cache (or cache directory) for the HTML of section()
+                share_data (bool): if True, columns used by several plots (e.g. the same DataFrame) are embedded once,
+                    by the first plot using them: the HTML of the plots must then be added to the report in the order created
+                profile (bool): if True, record the time, size and number of points/cells of each element
+                    (plot, table, text, section) in context.profile, see generate(manifest=...)
+                on_element (callable): called with the record (dict) of each element as it is added (implies profile)
+                json_engine (str): JSON library for the plots: "json", "orjson" or "rapidjson"
+                    (default: idealreport.serialize.JSON_ENGINE, see idealreport.serialize.set_json_engine());
+                    it encodes the plot specifications and the numeric columns of the plots' DataFrames
+                    (under "json" these are encoded by pandas to_json, to 10 decimal places; orjson and rapidjson
+                    write every digit), see idealreport.serialize.dataframe_to_json
+                precision (int or str): default precision of the float data of the plots: significant digits (e.g. 4),
+                    decimal places (e.g. ".2f") or "float32" (default: full precision), see idealreport.serialize.quantize
+                compression (str or list): "gzip" and/or "brotli" --> also write output_file + ".gz" / ".br"
+                    (compressed as the HTML is written, see idealreport.compress)
+                keep_html (bool): if False, only write the compressed files
+                compression_level (int): gzip 1 to 9, brotli 0 to 11 (default: idealreport.compress.DEFAULT_LEVELS)
+                compress_libs (str or list): "gzip" and/or "brotli" --> also deploy precompressed copies of the css/js files
+                webgl_threshold (int): scatter, line, time and multi traces of more points are drawn with WebGL
+                    (faster to pan and zoom); None --> SVG unless a plot asks for webgl=True
+                live (bool or int): if True (or a port number), serve the report from a local HTTP server and push the
+                    rows appended to plots created with live=True to the open pages (see idealreport.live)
+        """
         self.title = title
         self.output_file = output_file
-        # html string
-        self.h = ""
+        self.lib_dir = lib_dir
+        self.asset_mode = asset_mode
+        self.compression = compression
+        self.keep_html = keep_html
+        self.compression_level = compression_level
+        self.compress_libs = compress_libs
+        idealreport.compress.output_files(output_file, compression, keep_html)  # check the options before writing anything
+        # html string, or a sink which writes the html to the output file (the css/js files are deployed by generate())
+        if stream is False or stream is None:
+            self._h = ""
+            self._sink = None
+        elif stream is True:
+            self._sink = idealreport.sink.HtmlSink.open(title, output_file=output_file, buffer_size=buffer_size, lib_dir=lib_dir, asset_mode=asset_mode, compression=compression, keep_html=keep_html, compression_level=compression_level, compress_libs=compress_libs, copy_libs=False)
+        else:
+            self._sink = idealreport.sink.HtmlSink.open(title, output_file=output_file, fileobj=stream, buffer_size=buffer_size, lib_dir=lib_dir, asset_mode=asset_mode, compression=compression, keep_html=keep_html, compress_libs=compress_libs, copy_libs=False)
+        # local server of the report and its css/js files, for live plots
+        self.live = None
+        if live is not False and live is not None:
+            root = os.path.dirname(os.path.abspath(output_file))
+            if lib_dir is not None:
+                root = os.path.commonpath([root, os.path.abspath(lib_dir)])
+            self.live = idealreport.live.LiveServer(root, port=0 if live is True else live)
+        # plot IDs are allocated per report, so reports can be built in parallel threads
+        self.context = idealreport.create_html.ReportContext(share_data=share_data, json_engine=json_engine)
         # wrapper for plots, specifying to return HTML (instead of plot_spec dict)
-        self.plot = idealreport.plot.PlotSpec(return_html=True)
+        self.plot = idealreport.plot.PlotSpec(return_html=True, binary=binary, max_points=max_points, lazy=lazy, purge=purge, context=self.context, precision=precision, webgl_threshold=webgl_threshold, live=self.live)
+        if isinstance(cache, str):
+            cache = idealreport.cache.FragmentCache(cache)
+        self.cache = cache
+        if profile or on_element is not None:
+            self.context.start_profile(on_element)
+
+    @property
+    def h(self):
+        """ HTML of the report so far (or the sink it is streamed to) """
+        if self._sink is not None:
+            return self._sink
+        return self._h
+
+    @h.setter
+    def h(self, value):
+        if self._sink is not None:
+            # r.h += html has already been written by HtmlSink.__iadd__
+            if value is not self._sink:
+                raise Exception("idealreport.Reporter.h cannot be assigned when streaming; use r.h += html")
+            return
+        self._h = value
 
     def col(self, size):
         """ add a column to the report (using the CSS grid)
             size should be between 1 and 11 (the grid system uses 12 columns) """
         return Column(self, size)
 
-    def generate(self):
-        """ generate and save the report HTML """
-        idealreport.create_html.save(self.h, self.title, self.output_file)
-        print("saved report to %s" % self.output_file)
+    def generate(self, manifest=None, copy_libs=True):
+        """ generate and save the report HTML
+            Args:
+                manifest (bool or str): if True, also save a JSON manifest of the report elements next to the
+                    output file (output_file with .manifest.json instead of .html), or to this file name
+                    (the elements are only recorded if the Reporter was created with profile=True)
+                copy_libs (bool): if False, do not deploy the css/js files (e.g. the caller deploys them once
+                    for many reports, as idealreport.batch.generate_many() does)
+        """
+        start = time.perf_counter()
+        if self._sink is not None:
+            self._sink.close()
+            idealreport.create_html.reset_plot_index()
+            if copy_libs:
+                idealreport.create_html.deploy_libs(self.output_file, self.lib_dir, self.asset_mode, self.compress_libs)
+        else:
+            idealreport.create_html.save(self.h, self.title, self.output_file, lib_dir=self.lib_dir, asset_mode=self.asset_mode, compression=self.compression, keep_html=self.keep_html, compression_level=self.compression_level, compress_libs=self.compress_libs, copy_libs=copy_libs)
+        if manifest:
+            if not isinstance(manifest, str):
+                manifest = os.path.splitext(self.output_file)[0] + ".manifest.json"
+            self.write_manifest(manifest, save_seconds=time.perf_counter() - start)
+        print("saved report to %s" % ", ".join(idealreport.compress.output_files(self.output_file, self.compression, self.keep_html)))
+        if self.live is not None:
+            print("serving report at %s" % self.live.url_for(self.output_file))
+
+    def manifest(self):
+        """ summary of the report and its recorded elements (see profile in __init__)
+            Returns:
+                dict with title, output_file, elements (list of records) and totals (per kind of element)
+        """
+        elements = self.context.profile if self.context.profile is not None else []
+        totals = {}
+        for record in elements:
+            total = totals.setdefault(record["kind"], {"count": 0, "seconds": 0.0, "bytes": 0})
+            total["count"] += 1
+            for key in ("seconds", "bytes", "points", "cells"):
+                if record.get(key) is not None:
+                    total[key] = total.get(key, 0) + record[key]
+        return {
+            "title": self.title,
+            "output_file": self.output_file,
+            "idealreport": idealreport.__version__,
+            "profile": self.context.profile is not None,
+            "elements": elements,
+            "totals": totals,
+        }
+
+    def write_manifest(self, manifest_file, save_seconds=None):
+        """ save manifest() (and the size of the output file and the time spent saving it) as JSON """
+        manifest = self.manifest()
+        manifest["save_seconds"] = save_seconds
+        if self.output_file is not None and os.path.exists(self.output_file):
+            manifest["output_bytes"] = os.path.getsize(self.output_file)
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f, indent=1, default=str)
 
     def pagebreak(self):
         """ add a page break to the html """
@@ -42,9 +182,78 @@ class Reporter(object):
         """ add a row to the report (using the CSS grid) """
         return Row(self)
 
+    def section(self, name, func, *args, **kwargs):
+        """ append the HTML returned by func(*args, **kwargs), reusing the cached HTML when the inputs are unchanged
+            The cache key combines name, func, the arguments (DataFrames are hashed by value),
+            the plot options of the report and the idealreport version, so func must not depend
+            on anything else (e.g. variables of a lambda). Plots must be created with r.plot.
+            Example:
+                r.section('pnl', r.plot.line, df=df_pnl, title='P+L')
+            Args:
+                name (str): name of the section
+                func (callable): returns the HTML of the section
+        """
+        profiling = self.context.profile is not None
+        if profiling:
+            start = time.perf_counter()
+        if self.cache is None:
+            html = func(*args, **kwargs)
+            self.h += html
+            if profiling:
+                self.context.record("section", html, name=name, cached=False, seconds=time.perf_counter() - start)
+            return
+        options = (self.plot.binary, self.plot.max_points, self.plot.lazy, self.plot.purge, self.context.data is not None, self.context.json_engine or idealreport.serialize.JSON_ENGINE, self.plot.precision, self.plot.webgl_threshold)
+        func_name = "%s.%s" % (getattr(func, "__module__", None), getattr(func, "__qualname__", type(func).__name__))
+        key = idealreport.cache.hash_key(name, func_name, options, args, kwargs)
+        html = self.cache.get(key, self.context)
+        cached = html is not None
+        if not cached:
+            first_plot_index = self.context.next_plot_index
+            with self.context.separate_data():  # the cached HTML must define all its data
+                html = func(*args, **kwargs)
+            self.cache.put(key, html, self.context, first_plot_index)
+        self.h += html
+        if profiling:
+            self.context.record("section", html, name=name, cached=cached, seconds=time.perf_counter() - start)
+
+    def table(self, df, sortable=False, last_row_is_footer=False, col_format=None):
+        """ append an HTML table of a DataFrame (see idealreport.create_html.table()) """
+        profiling = self.context.profile is not None
+        if profiling:
+            start = time.perf_counter()
+        html = idealreport.create_html.table(df, sortable=sortable, last_row_is_footer=last_row_is_footer, col_format=col_format)
+        self.h += html
+        if profiling:
+            self.context.record("table", html, rows=len(df), cells=df.size, seconds=time.perf_counter() - start)
+
+    def table_chunks(self, chunks, sortable=False, last_row_is_footer=False, col_format=None):
+        """ append an HTML table of DataFrame chunks e.g. pd.read_csv(..., chunksize=...)
+            (see idealreport.create_html.table_chunks(); streamed to the output file if the report streams)
+            with last_row_is_footer, only the final row of the last chunk can be the footer (unlike table())
+        """
+        profiling = self.context.profile is not None
+        if profiling:
+            start = time.perf_counter()
+        counts = {"rows": 0, "cells": 0, "bytes": 0}
+
+        def counted(chunks):
+            """ helper function to count the rows and cells of the chunks as they are read """
+            for df in chunks:
+                counts["rows"] += len(df)
+                counts["cells"] += df.size
+                yield df
+
+        for html in idealreport.create_html.table_chunks(counted(chunks), sortable=sortable, last_row_is_footer=last_row_is_footer, col_format=col_format):
+            self.h += html
+            counts["bytes"] += len(html)
+        if profiling:
+            self.context.record("table", "", seconds=time.perf_counter() - start, **counts)
+
     def text(self, text):
         """ append the specified text as html """
-        self.h += idealreport.create_html.paragraph(text)
+        html = idealreport.create_html.paragraph(text)
+        self.h += html
+        self.context.record("text", html)
 
 
 class Row(object):
@@ -0,0 +1,423 @@
+""" The serialize module contains functions to convert plot specifications
+    (including pandas DataFrames) to JSON text:
+        JsonFragment: a string of JSON that is inserted verbatim by dumps()
+        set_json_engine(): choose the JSON library used by dumps(), loads() and dataframe_to_json() ("json", "orjson" or "rapidjson")
+        dumps(): convert a plot specification to JSON
+        loads(): parse JSON
+        dataframe_to_json(): convert a DataFrame (or Series) to a list of columns in JSON
+        typed_array_json(): convert a numeric array to a base64 typed array (decoded by plotting.js)
+        quantize(): round numeric values to the precision needed on screen (fewer characters to embed)
+        typed_matrix_json(): convert a 2-d numeric array to one row-major base64 typed array with its shape
+        typed_float_json(): convert numeric values to a base64 float typed array (optionally rounded)
+        DataStore: the columns shared by the plots of a report (each distinct column is embedded once)
+"""
+
+import base64
+import datetime
+import hashlib
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# JSON libraries that can be used, and the one used when no engine is specified (see set_json_engine())
+ENGINES = ["json", "orjson", "rapidjson"]
+JSON_ENGINE = "json"
+
+# python types which json libraries encode without conversion (floats are checked for NaN/Infinity)
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+# numpy (little-endian) dtypes of the typed arrays decoded by plotting.js
+_TYPED_ARRAY_DTYPES = {"float64": "<f8", "float32": "<f4", "int32": "<i4"}
+
+
+class JsonFragment(str):
+    """ a string of already encoded JSON, which dumps() inserts without re-encoding
+        note: json.dumps() would treat a JsonFragment as an ordinary string
+    """
+
+    pass
+
+
+class DataStore(object):
+    """ the columns embedded in a report so far, so a column used by several plots is embedded once
+        dataframe_to_json(df, store=...) replaces the values of each column by a "ref" key, which
+        is a hash of the column's content; the values of new keys are collected until pop_definitions()
+        returns them as javascript (g_data[key] = values;) to put before the plot that uses them.
+        Attributes:
+            keys (set): keys of the columns defined so far
+    """
+
+    def __init__(self):
+        self.keys = set()
+        self._definitions = []
+
+    def pop_definitions(self):
+        """ javascript (str) defining the columns added since the last call ("" if none) """
+        script = "".join('g_data["%s"] = %s;\n' % (key, values) for (key, values) in self._definitions)
+        self._definitions = []
+        return script
+
+    def ref(self, role, values, encode):
+        """ key of a column, defining the column first if it is new
+            Args:
+                role (str): how the values are encoded (e.g. "index" or "values", and whether binary)
+                values (np.ndarray or pd.Index): values of the column (hashed if numeric or datetime)
+                encode (callable): returns the JSON of the values
+            Returns:
+                key (str)
+        """
+        h = hashlib.blake2b(role.encode("utf-8"), digest_size=8)
+        values = np.asarray(values)
+        data = None
+        if values.dtype.kind in "biufcmM":
+            h.update(values.dtype.str.encode("utf-8"))
+            h.update(np.ascontiguousarray(values).tobytes())
+        else:  # e.g. strings: hash the JSON itself
+            data = encode()
+            h.update(data.encode("utf-8"))
+        key = h.hexdigest()
+        if key not in self.keys:
+            self.keys.add(key)
+            self._definitions.append((key, data if data is not None else encode()))
+        return key
+
+
+def set_json_engine(engine):
+    """ set the JSON library used by default (by every report that does not specify one)
+        Args:
+            engine (str): "json" (standard library), "orjson" or "rapidjson" (must be installed)
+    """
+    global JSON_ENGINE
+    _engine_module(engine)  # check it is available
+    JSON_ENGINE = engine
+
+
+def dumps(obj, engine=None):
+    """ convert obj to JSON text, inserting any JsonFragment values as-is
+        The text is the same as json.dumps (", " and ": " separators between items) under the "json" engine.
+        Under every engine NaN, Infinity and NaT become null, numpy values and arrays become numbers/lists
+        (float32 values as the float64 values they equal), and datetimes become ISO strings, so every engine
+        encodes the same values (the text may differ e.g. in spacing and exponents: 1e-07 / 1e-7).
+        Args:
+            obj: dict/list/tuple/str/number/bool/None/np.ndarray/datetime, possibly containing JsonFragment values
+            engine (str): "json", "orjson" or "rapidjson" (default: JSON_ENGINE)
+        Returns:
+            JSON (str)
+    """
+    if isinstance(obj, JsonFragment):
+        return str(obj)
+    if isinstance(obj, dict):
+        items = [json.dumps(_json_key(k)) + ": " + dumps(v, engine) for (k, v) in obj.items()]
+        return "{" + ", ".join(items) + "}"
+    if isinstance(obj, (list, tuple)):
+        if not any(isinstance(v, (dict, list, tuple, JsonFragment)) for v in obj):
+            return _dumps_value(obj, engine)  # nothing nested: let the engine do the whole list at once
+        return "[" + ", ".join(dumps(v, engine) for v in obj) + "]"
+    return _dumps_value(obj, engine)
+
+
+def loads(text, engine=None):
+    """ parse JSON text with an engine ("json", "orjson" or "rapidjson", default: JSON_ENGINE) """
+    engine = engine or JSON_ENGINE
+    if engine == "json":
+        return json.loads(text)
+    return _engine_module(engine).loads(str(text))
+
+
+def dataframe_to_json(df, binary=False, store=None, precision=None, engine=None):
+    """ convert a pandas DataFrame (or series) to a list of columns in JSON:
+            [{"name": index name, "values": [...]}, {"name": column name, "values": [...]}, ...]
+        Each column is encoded directly from its array, so no python lists are created: numeric columns
+        by the engine if it is "orjson" or "rapidjson" (floats with all their digits, so the values are exact),
+        everything else (and numeric columns under "json") by pandas to_json (floats to 10 decimal places).
+        NaN values become null and timestamps become ISO strings.
+        Args:
+            df: pandas DataFrame or Series (the index is the first column)
+            binary (bool): if True, numeric columns are encoded by typed_array_json() instead of
+                           as lists of numbers (NaN values are kept as NaN)
+            store (DataStore): if given, each column is {"name": ..., "ref": key} instead and its values
+                               are defined once per report by the store
+            precision (int or str): precision of the float columns (not the index), see quantize()
+                                    (rounded columns are written by pandas with the decimals they need)
+            engine (str): "json", "orjson" or "rapidjson" (default: JSON_ENGINE)
+        Returns:
+            JsonFragment
+    """
+    engine = engine or JSON_ENGINE
+    # assume df is a pd.DataFrame if it contains "columns", else it is a pd.Series
+    columns = [_column_json(df.index.name, df.index, binary, store, role="index", engine=engine)]  # index
+    if hasattr(df, "columns"):  # data frame
+        for (j, col) in enumerate(df.columns):
+            columns.append(_column_json(col, df.iloc[:, j], binary, store, precision=precision, engine=engine))
+    else:  # series
+        columns.append(_column_json(df.name, df, binary, store, precision=precision, engine=engine))
+    return JsonFragment("[" + ", ".join(columns) + "]")
+
+
+def quantize(values, precision):
+    """ round float values to a precision
+        Args:
+            values (np.ndarray): values (only floats are rounded)
+            precision (int or str): one of
+                int or "Ng": N significant digits (e.g. 4: 0.12345678 --> 0.1235, 12345.678 --> 12350.0)
+                ".Nf": N decimal places (e.g. ".2f": 0.12345678 --> 0.12)
+                "float32": float32 precision (about 7 significant digits; typed arrays are float32)
+                (an exception is raised for anything else, fewer than 1 significant digit or more than 15 decimal places)
+        Returns:
+            (values, decimals) tuple: the rounded values (np.ndarray) and the number of decimal places
+            (int, at most 15) to write them with (values much smaller than the largest value of the column
+            may be written as 0)
+    """
+    (mode, digits) = _parse_precision(precision)
+    if values.dtype.kind != "f":
+        return values, 10
+    if mode == "fixed":
+        return np.round(values, digits), digits
+    if mode == "float32":
+        digits = 7
+    values = values.astype("float64")
+    finite = np.isfinite(values) & (values != 0)
+    if not finite.any():
+        return values, 1
+    magnitude = np.zeros(len(values))
+    magnitude[finite] = np.floor(np.log10(np.abs(values[finite])))
+    shift = (digits - 1 - magnitude).astype(np.int64)  # decimal places to keep for each value
+    rounded = values.copy()
+    up = finite & (shift >= 0) & (shift <= 300)  # multiply by 10**shift (exact) and divide back
+    rounded[up] = np.round(values[up] * 10.0 ** shift[up]) / 10.0 ** shift[up]
+    tiny = finite & (shift > 300)  # e.g. subnormal values: 10**shift would overflow, so scale in two steps
+    half = shift[tiny] // 2
+    rounded[tiny] = np.round(values[tiny] * 10.0 ** half * 10.0 ** (shift[tiny] - half)) / 10.0 ** half / 10.0 ** (shift[tiny] - half)
+    down = finite & (shift < 0)  # e.g. 12345.678 to 4 digits: round to tens
+    rounded[down] = np.round(values[down] / 10.0 ** -shift[down]) * 10.0 ** -shift[down]
+    # enough decimal places for the smallest values, but at most 15 significant digits for the largest
+    # (beyond them the float64 representation error would be written out)
+    decimals = min(shift[finite].max(), 14 - magnitude[finite].max(), 15)
+    return rounded, int(max(decimals, 1))
+
+
+def typed_array_json(values):
+    """ convert a numeric array to a base64 encoded little-endian typed array:
+            {"dtype": "float64" | "float32" | "int32", "data": base64 str}
+        plotting.js decodes these into Float64Array / Float32Array / Int32Array.
+        Integers outside the int32 range are sent as float64 if they are exact as float64 (up to 2**53),
+        so the decoded values always equal the values encoded.
+        Args:
+            values (np.ndarray): 1-d array
+        Returns:
+            JsonFragment, or None if the values are not numeric (e.g. strings, timestamps, booleans)
+            or are integers beyond 2**53 (to be encoded as JSON numbers instead)
+    """
+    kind = values.dtype.kind
+    if kind == "f":
+        dtype = "float32" if values.dtype.itemsize <= 4 else "float64"
+    elif kind in "iu":
+        if values.dtype.itemsize < 4 or values.dtype == np.int32:
+            dtype = "int32"
+        elif len(values) == 0 or (values.min() >= -(2 ** 31) and values.max() < 2 ** 31):
+            dtype = "int32"
+        elif values.min() >= -(2 ** 53) and values.max() <= 2 ** 53:
+            dtype = "float64"
+        else:
+            return None
+    else:
+        return None
+    data = values.astype(_TYPED_ARRAY_DTYPES[dtype], copy=False).tobytes()
+    return JsonFragment('{"dtype": "%s", "data": "%s"}' % (dtype, base64.b64encode(data).decode("ascii")))
+
+
+def typed_matrix_json(values, precision=None):
+    """ convert a 2-d numeric array (e.g. heat map z values) to a base64 typed array of its rows:
+            {"dtype": "float64" | "float32", "data": base64 str, "shape": [rows, cols]}
+        plotting.js decodes these into one typed array and a view of each row (no nested arrays are built).
+        Args:
+            values (np.ndarray): 2-d array
+            precision (int or str): see quantize(); "float32" halves the size
+        Returns:
+            JsonFragment
+    """
+    if np.ndim(values) != 2:
+        raise Exception("idealreport.serialize.typed_matrix_json() values must be a 2-d array")
+    return typed_float_json(values, precision)
+
+
+def typed_float_json(values, precision=None):
+    """ convert numeric values to a base64 float typed array (NaN is kept, e.g. for gaps):
+            {"dtype": "float64" | "float32", "data": base64 str} (and "shape": [rows, cols] if values is 2-d)
+        Args:
+            values (np.ndarray): 1-d or 2-d array
+            precision (int or str): see quantize(); "float32" halves the size
+        Returns:
+            JsonFragment
+    """
+    values = np.asarray(values, dtype="float64")
+    dtype = "float64"
+    if precision is not None:
+        values = quantize(values.ravel(), precision)[0].reshape(values.shape)
+        if _parse_precision(precision)[0] == "float32":
+            dtype = "float32"
+    data = base64.b64encode(np.ascontiguousarray(values, dtype=_TYPED_ARRAY_DTYPES[dtype]).tobytes()).decode("ascii")
+    if values.ndim == 2:
+        return JsonFragment('{"dtype": "%s", "data": "%s", "shape": [%d, %d]}' % (dtype, data, values.shape[0], values.shape[1]))
+    return JsonFragment('{"dtype": "%s", "data": "%s"}' % (dtype, data))
+
+
+def _column_json(name, series, binary=False, store=None, role="values", precision=None, engine="json"):
+    """ helper function to encode one column (or the index) as {"name": ..., "values": [...]}
+        (or {"name": ..., "ref": key} if there is a store)
+    """
+    if precision is not None and series.dtype.kind == "f":
+        return _quantized_column_json(name, series.to_numpy(), binary, store, precision)
+    by_engine = engine != "json" and isinstance(series.dtype, np.dtype) and series.dtype.kind in "biuf"  # numeric values encoded by orjson / rapidjson (not nullable pandas dtypes)
+
+    def encode():
+        values = typed_array_json(series.to_numpy()) if binary else None
+        if values is None and by_engine:
+            values = _dumps_value(series.to_numpy(), engine)
+        elif values is None:
+            values = _index_json(series) if role == "index" else series.to_json(orient="values", date_format="iso")
+        return values
+
+    if store is not None:
+        key = store.ref(role + (" binary" if binary else "") + (" " + engine if by_engine else ""), series, encode)
+        return '{"name": %s, "ref": "%s"}' % (json.dumps(name), key)
+    return '{"name": %s, "values": %s}' % (json.dumps(name), encode())
+
+
+def _quantized_column_json(name, values, binary, store, precision):
+    """ helper function to encode a float column rounded to a precision (see quantize()) """
+    (values, decimals) = quantize(values, precision)
+
+    def encode():
+        if binary:
+            return typed_array_json(values.astype("float32") if _parse_precision(precision)[0] == "float32" else values)
+        return pd.Series(values).to_json(orient="values", double_precision=decimals)
+
+    if store is not None:
+        key = store.ref("values %r%s" % (precision, " binary" if binary else ""), values, encode)
+        return '{"name": %s, "ref": "%s"}' % (json.dumps(name), key)
+    return '{"name": %s, "values": %s}' % (json.dumps(name), encode())
+
+
+def _index_json(index):
+    """ helper function to encode the values of an index
+        (orient="split" is used so timestamps are encoded the same way as DataFrame.to_json())
+    """
+    text = pd.DataFrame(index=index).to_json(orient="split", date_format="iso")
+    return text[text.index('"index":') + len('"index":') : text.rindex(',"data":')]
+
+
+def _clean(value):
+    """ helper function to convert a value to types every json library encodes the same way:
+        NaN, Infinity and NaT become None, numpy values become python values and datetimes ISO strings
+        (returns value itself if nothing needs converting)
+    """
+    if type(value) in (list, tuple):
+        # x - x is 0 for finite floats and NaN for NaN/Infinity
+        if all(type(v) in _PLAIN_TYPES and (type(v) is not float or v - v == 0) for v in value):
+            return value
+        return [_clean(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clean(v) for (k, v) in value.items()}
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            values = value.astype(object)
+            values[~np.isfinite(value)] = None
+            return values.tolist()
+        if value.dtype.kind in "biu":
+            return value.tolist()
+        if value.dtype.kind == "M":
+            return [_clean(v) for v in pd.DatetimeIndex(value.ravel())]
+        return [_clean(v) for v in value.tolist()]
+    if value is pd.NaT or value is None:
+        return None
+    if isinstance(value, np.datetime64):
+        return _clean(pd.Timestamp(value))
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    if isinstance(value, float):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _default(value):
+    """ helper function for values the json library cannot encode itself """
+    cleaned = _clean(value)
+    if cleaned is value:
+        raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+    return cleaned
+
+
+def _dumps_value(obj, engine=None):
+    """ helper function to encode a value without JsonFragments with an engine """
+    engine = engine or JSON_ENGINE
+    if engine == "json":
+        return json.dumps(_clean(obj), default=_default)
+    module = _engine_module(engine)
+    if engine == "orjson":
+        # numeric arrays are encoded natively (NaN/Infinity as null); everything else is converted first
+        # (orjson writes float32 values rounded to float32 precision, e.g. 0.1 for 0.10000000149011612)
+        if not isinstance(obj, np.ndarray) or obj.dtype.kind not in "biuf":
+            obj = _clean(obj)
+        elif obj.dtype.kind == "f" and obj.dtype.itemsize < 8:
+            obj = obj.astype("float64")
+        try:
+            return module.dumps(obj, default=_default, option=module.OPT_SERIALIZE_NUMPY | module.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:  # e.g. arrays of objects inside lists
+            return module.dumps(_clean(obj), default=_default, option=module.OPT_NON_STR_KEYS).decode("utf-8")
+    return module.dumps(_clean(obj), default=_default)
+
+
+def _engine_module(engine):
+    """ helper function to import the library of an engine """
+    if engine not in ENGINES:
+        raise Exception("idealreport.serialize json engine must be in %s" % ENGINES)
+    if engine == "orjson":
+        import orjson
+
+        return orjson
+    if engine == "rapidjson":
+        import rapidjson
+
+        return rapidjson
+    return json
+
+
+def _parse_precision(precision):
+    """ helper function to parse a precision (see quantize()) into (mode, digits) """
+    if precision == "float32":
+        return ("float32", None)
+    message = 'idealreport.serialize.quantize() precision must be an int, ".Nf", ".Ng" or "float32", not %r' % (precision,)
+    if isinstance(precision, bool) or not isinstance(precision, (int, np.integer, str)):
+        raise Exception(message)
+    text = str(precision)
+    mode = "fixed" if text.endswith("f") else "significant"
+    if text.endswith(("f", "g")):
+        text = text[:-1]
+    if text.startswith("."):
+        text = text[1:]
+    try:
+        digits = int(text)
+    except ValueError:
+        raise Exception(message)
+    if mode == "significant" and digits < 1:
+        raise Exception("idealreport.serialize.quantize() precision must be at least 1 significant digit, not %r" % (precision,))
+    if mode == "fixed" and not 0 <= digits <= 15:
+        raise Exception("idealreport.serialize.quantize() precision must be 0 to 15 decimal places, not %r" % (precision,))
+    return (mode, digits)
+
+
+def _json_key(key):
+    """ helper function to convert a dict key to a str the way json.dumps does """
+    if isinstance(key, np.generic):
+        key = key.item()
+    if isinstance(key, str):
+        return key
+    if key is None or isinstance(key, (bool, int, float)):
+        return json.dumps(key)
+    raise TypeError("keys must be str, int, float, bool or None, not %s" % type(key).__name__)
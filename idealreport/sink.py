@@ -0,0 +1,122 @@
+""" The sink module contains:
+    HtmlSink class to stream report HTML to a file (or any file-like object)
+        instead of accumulating the whole document in a string
+"""
+
+import idealreport
+
+
+class HtmlSink(object):
+    """ class to write report HTML fragments to a file as they are generated
+        Fragments are collected in a small buffer that is flushed to the file
+        whenever it would exceed buffer_size characters, so the memory used by
+        the sink never grows with the size of the report.
+
+        The sink supports "+=" so the Reporter idiom r.h += html keeps working:
+            r.h += htmltag.h4('title')  # written to the sink, not kept in memory
+
+        Attributes:
+            buffer_size (int): maximum number of characters held before flushing
+            pending_size (int): number of characters currently buffered
+            peak_pending_size (int): largest pending_size seen (never exceeds buffer_size)
+            bytes_written (int): number of characters passed to the file so far
+    """
+
+    def __init__(self, fileobj, buffer_size=1 << 20, close_file=False):
+        """ Args:
+                fileobj: file-like object with a write(str) method
+                buffer_size (int): maximum number of characters held before flushing
+                close_file (bool): if True, close fileobj when the sink is closed
+        """
+        if buffer_size < 1:
+            raise Exception("idealreport.sink.HtmlSink() buffer_size must be positive")
+        self.buffer_size = buffer_size
+        self.pending_size = 0
+        self.peak_pending_size = 0
+        self.bytes_written = 0
+        self.closed = False
+        self._fileobj = fileobj
+        self._close_file = close_file
+        self._pending = []
+        self._footer = ""
+
+    @classmethod
+    def open(cls, title, output_file=None, fileobj=None, buffer_size=1 << 20, lib_dir=None, asset_mode="copy", compression=None, keep_html=True, compression_level=None, compress_libs=None, copy_libs=True):
+        """ open a sink for a report and write the template header
+            Args:
+                title (str): report title
+                output_file (str): full name of the resulting HTML file;
+                    the supporting css/js files are deployed into its directory (or lib_dir)
+                fileobj: file-like object to write to instead of opening output_file
+                    (written as is: not with compression or keep_html=False)
+                buffer_size (int): maximum number of characters held before flushing
+                lib_dir (str): shared directory for the css/js files (see idealreport.create_html.save())
+                asset_mode (str): "copy", "hardlink" or "symlink" (see idealreport.create_html.copy_libs())
+                compression (str or list): "gzip" and/or "brotli" --> also write output_file + ".gz" / ".br",
+                    compressing the HTML as it is flushed (see idealreport.compress.ReportWriter)
+                keep_html (bool): if False, only write the compressed files
+                compression_level (int): see idealreport.compress.DEFAULT_LEVELS
+                compress_libs (str or list): also deploy compressed copies of the css/js files
+                copy_libs (bool): if False, do not deploy the css/js files (see idealreport.create_html.deploy_libs())
+            Returns:
+                HtmlSink positioned after the template header
+        """
+        if fileobj is not None and (compression or not keep_html):
+            raise Exception("idealreport.sink.HtmlSink.open() compression and keep_html=False need output_file instead of fileobj")
+        lib_prefix = ""
+        if output_file is not None:
+            lib_prefix = idealreport.create_html.deploy_libs(output_file, lib_dir, asset_mode, compress_libs, copy_libs)
+        if fileobj is None:
+            fileobj = idealreport.compress.ReportWriter(output_file, compression, keep_html, compression_level)
+            sink = cls(fileobj, buffer_size=buffer_size, close_file=True)
+        else:
+            sink = cls(fileobj, buffer_size=buffer_size)
+        header, sink._footer = idealreport.create_html.template_parts(title, lib_prefix)
+        sink.write(header)
+        return sink
+
+    def __iadd__(self, html):
+        self.write(html)
+        return self
+
+    def __str__(self):
+        raise Exception("idealreport.sink.HtmlSink() streamed HTML is not kept in memory")
+
+    def close(self):
+        """ write the template footer, flush and (if owned) close the file """
+        if self.closed:
+            return
+        self.write(self._footer)
+        self.flush()
+        if self._close_file:
+            self._fileobj.close()
+        self.closed = True
+
+    def flush(self):
+        """ write any buffered fragments to the file """
+        if self._pending:
+            self._write_through("".join(self._pending))
+            self._pending = []
+            self.pending_size = 0
+
+    def write(self, html):
+        """ append a fragment of HTML to the report """
+        if self.closed:
+            raise Exception("idealreport.sink.HtmlSink() write after close")
+        html = str(html)
+        size = len(html)
+        if self.pending_size + size > self.buffer_size:
+            self.flush()
+        if size >= self.buffer_size:
+            # large fragments bypass the buffer so they are never copied
+            self._write_through(html)
+            return
+        self._pending.append(html)
+        self.pending_size += size
+        if self.pending_size > self.peak_pending_size:
+            self.peak_pending_size = self.pending_size
+
+    def _write_through(self, html):
+        """ write a string directly to the file """
+        self._fileobj.write(html)
+        self.bytes_written += len(html)
@@ -0,0 +1,101 @@
+""" The timeaxis module contains functions for time series plots whose x axis skips the gaps
+    in the data (e.g. nights and weekends of intraday prices):
+        gapless_axis(): x values (seconds) with the gaps of a DatetimeIndex removed
+        axis_ticks(): tick positions and labels for such an axis
+    All the computations are vectorized; only the tick labels are formatted as strings.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# tick levels from coarsest to finest: (name, default label format)
+TICK_LEVELS = [("year", "%Y"), ("month", "%b %Y"), ("week", "%b %d"), ("day", "%b %d"), ("hour", "%H:%M"), ("minute", "%H:%M")]
+
+# by default, spacings longer than GAP_FACTOR times the median spacing are gaps
+# (e.g. the 3 days from Friday to Monday of daily data)
+GAP_FACTOR = 1.5
+
+_NS_PER_SECOND = 10 ** 9
+_NS_PER_DAY = 86400 * _NS_PER_SECOND
+
+
+def gapless_axis(index, max_gap=None):
+    """ x values of a DatetimeIndex with the gaps removed
+        Each gap longer than max_gap is shortened to the median spacing of the index, so the
+        x values are the elapsed time of the series (in seconds, starting at 0) without its gaps.
+        Args:
+            index (pd.DatetimeIndex): sorted timestamps
+            max_gap (pd.Timedelta or str): longest spacing that is kept (default: GAP_FACTOR times the median spacing)
+        Returns:
+            (x, segments) tuple:
+                x (np.ndarray): float64 seconds
+                segments (list): [x, epoch milliseconds] of the first timestamp after each gap (and the first timestamp),
+                                 i.e. the timestamp of x is segment milliseconds + (x - segment x) * 1000
+    """
+    if not isinstance(index, pd.DatetimeIndex):
+        raise Exception("idealreport.timeaxis.gapless_axis() index must be a DatetimeIndex")
+    if len(index) == 0:
+        return np.zeros(0), []
+    t = _wall_ns(index)
+    spacing = np.diff(t)
+    if len(spacing) and (spacing < 0).any():
+        raise Exception("idealreport.timeaxis.gapless_axis() index must be sorted")
+    step = np.median(spacing) if len(spacing) else 0
+    limit = GAP_FACTOR * step if max_gap is None else pd.Timedelta(max_gap).value
+    gaps = spacing > limit
+    x_ns = np.concatenate([[0], np.cumsum(np.where(gaps, step, spacing))])
+    x = x_ns / float(_NS_PER_SECOND)
+    starts = np.concatenate([[0], np.flatnonzero(gaps) + 1])
+    segments = [[float(x[i]), int(t[i] // 10 ** 6)] for i in starts]
+    return x, segments
+
+
+def axis_ticks(index, x, time_format=None, max_ticks=10):
+    """ ticks at the first timestamp of each year, month, week (starting on Monday), day, hour or minute
+        The coarsest level with at least max_ticks / 2 ticks is used (e.g. months for a few years of data),
+        keeping every k-th tick so there are at most max_ticks.
+        Args:
+            index (pd.DatetimeIndex): sorted timestamps
+            x (np.ndarray): x values of the timestamps (see gapless_axis())
+            time_format (str): strftime format of the labels (default: depends on the level)
+            max_ticks (int): maximum number of ticks
+        Returns:
+            (tickvals, ticktext) tuple of lists
+    """
+    if len(index) == 0:
+        return [], []
+    t = _wall_ns(index)
+    for (level, level_format) in TICK_LEVELS:
+        codes = _period_codes(index, t, level)
+        positions = np.concatenate([[0], np.flatnonzero(codes[1:] != codes[:-1]) + 1])
+        if len(positions) >= max(max_ticks // 2, 2):
+            break
+    stride = -(-len(positions) // max_ticks)  # ceiling division
+    positions = positions[::stride]
+    if level in ("hour", "minute") and t[-1] // _NS_PER_DAY != t[0] // _NS_PER_DAY:
+        level_format = "%b %d " + level_format  # the ticks are on different days
+    labels = index[positions].strftime(time_format if time_format is not None else level_format)
+    return [float(v) for v in x[positions]], list(labels)
+
+
+def _period_codes(index, t, level):
+    """ helper function to number the periods (e.g. months) containing each timestamp """
+    if level == "year":
+        return np.asarray(index.year)
+    if level == "month":
+        return np.asarray(index.year) * 12 + np.asarray(index.month)
+    if level == "week":
+        return (t // _NS_PER_DAY + 3) // 7  # 1970-01-01 was a Thursday: weeks start on Mondays
+    if level == "day":
+        return t // _NS_PER_DAY
+    if level == "hour":
+        return t // (3600 * _NS_PER_SECOND)
+    return t // (60 * _NS_PER_SECOND)
+
+
+def _wall_ns(index):
+    """ helper function for the wall clock times of an index as int64 nanoseconds (time zones removed) """
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.asi8
@@ -0,0 +1,70 @@
+""" tests of the deployment of the library files (css/js) of reports """
+
+import json
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def run_threads(count, target):
+    """ run target(i) in count threads started together, re-raising the first error """
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+def lib_files():
+    source_path = os.path.join(os.path.dirname(os.path.abspath(idealreport.create_html.__file__)), "htmlLibs")
+    return sorted(os.listdir(source_path))
+
+
+@pytest.mark.parametrize("asset_mode", idealreport.create_html.ASSET_MODES)
+def test_concurrent_copy_libs(tmp_path, asset_mode):
+    for trial in range(5):
+        output_path = str(tmp_path / ("trial%d" % trial))
+        run_threads(8, lambda i: idealreport.create_html.copy_libs(output_path, asset_mode))
+        assert sorted(fn for fn in os.listdir(output_path) if not fn.startswith(".")) == lib_files()
+        manifest = json.load(open(os.path.join(output_path, idealreport.create_html.ASSET_MANIFEST)))
+        assert sorted(manifest) == lib_files()
+
+
+def test_concurrent_forced_redeploy(tmp_path):
+    output_path = str(tmp_path)
+    manifest_file = os.path.join(output_path, idealreport.create_html.ASSET_MANIFEST)
+    idealreport.create_html.copy_libs(output_path, "hardlink")
+    for trial in range(5):
+        os.remove(manifest_file)  # every thread deploys the files again
+        run_threads(8, lambda i: idealreport.create_html.copy_libs(output_path, ["hardlink", "copy"][i % 2]))
+        assert not [fn for fn in os.listdir(output_path) if fn.endswith(".tmp")]
+
+
+def test_concurrent_reports_into_one_directory(tmp_path):
+    def generate(i):
+        r = idealreport.Reporter("report %d" % i, str(tmp_path / ("report%d.html" % i)))
+        r.h += r.plot.line(pd.DataFrame({"a": [1.0, 2.0, 3.0]}))
+        r.generate()
+
+    for trial in range(3):
+        for fn in os.listdir(str(tmp_path)):
+            os.remove(str(tmp_path / fn))
+        run_threads(8, generate)
+        for i in range(8):
+            assert open(str(tmp_path / ("report%d.html" % i))).read().rstrip().endswith("</html>")
@@ -0,0 +1,51 @@
+""" tests of idealreport.batch """
+
+import os
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+from .test_assets import lib_files, run_threads
+
+
+def build(output_file, stream=False):
+    r = idealreport.Reporter("batch", output_file, stream=stream)
+    r.h += r.plot.line(pd.DataFrame({"a": [1.0, 2.0, 3.0]}))
+    return r
+
+
+def deployed(path):
+    return sorted(fn for fn in os.listdir(path) if not fn.startswith(".") and not fn.endswith(".html"))
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_generate_many(tmp_path, max_workers):
+    jobs = [(build, (str(tmp_path / ("report%d.html" % i)), i % 2 == 1)) for i in range(4)]
+    results = idealreport.batch.generate_many(jobs, max_workers=max_workers)
+    assert all(result.ok for result in results)
+    assert deployed(str(tmp_path)) == lib_files()
+    for i in range(4):
+        assert open(str(tmp_path / ("report%d.html" % i))).read().rstrip().endswith("</html>")
+
+
+def test_reports_saved_during_generate_many_get_their_files(tmp_path):
+    def run(i):
+        if i == 0:
+            jobs = [(build, (str(tmp_path / "batch" / ("report%d.html" % j)),)) for j in range(20)]
+            assert all(result.ok for result in idealreport.batch.generate_many(jobs, max_workers=1))
+        else:
+            for j in range(5):
+                path = tmp_path / ("thread%d-%d" % (i, j))
+                build(str(path / "report.html"), stream=j % 2 == 1).generate()
+                assert deployed(str(path)) == lib_files()
+
+    run_threads(4, run)
+
+
+def test_generate_without_copying_libs(tmp_path):
+    for stream in [False, True]:
+        path = tmp_path / ("stream%d" % stream)
+        build(str(path / "report.html"), stream=stream).generate(copy_libs=False)
+        assert os.listdir(str(path)) == ["report.html"]
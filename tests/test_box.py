@@ -0,0 +1,112 @@
+""" tests of box plot summaries: idealreport.downsample.box_summary and plotting.js boxSummarySample """
+
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+PLOTTING_JS = os.path.join(os.path.dirname(os.path.abspath(idealreport.__file__)), "htmlLibs", "plotting.js")
+
+
+def grouped_samples(seed=0):
+    rng = np.random.default_rng(seed)
+    groups = np.array(["a"] * 500 + ["b"] * 300 + ["single"] + ["empty"] * 3 + ["c"] * 200)
+    a = np.concatenate([rng.standard_normal(500), rng.standard_normal(300) * 3 + 5, [7.5], [np.nan] * 3, rng.standard_cauchy(200)])
+    df = pd.DataFrame({"a": a, "b": a * 2 - 1})
+    return df, groups
+
+
+def expected_box(values):
+    """ quartiles, fences and outliers of one box, computed directly """
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    (q1, median, q3) = np.percentile(values, [25, 50, 75])
+    inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+    return {"q1": q1, "median": median, "q3": q3, "lowerfence": inside.min(), "upperfence": inside.max(), "count": len(values), "outliers": np.sort(values[(values < inside.min()) | (values > inside.max())]).tolist()}
+
+
+def box(summary, k):
+    return {key: summary[key][k] for key in ["q1", "median", "q3", "lowerfence", "upperfence", "count", "outliers"]}
+
+
+def test_grouped_summary_matches_pandas():
+    (df, groups) = grouped_samples()
+    summaries = idealreport.downsample.box_summary(df, groups, max_outliers=10 ** 6)
+    assert [s["name"] for s in summaries] == ["a", "b"]
+    for (summary, col) in zip(summaries, df.columns):
+        assert summary["groups"] == ["a", "b", "single", "empty", "c"]
+        quantiles = df[col].groupby(groups, sort=False).quantile([0.25, 0.5, 0.75]).unstack()
+        for (k, group) in enumerate(summary["groups"]):
+            expected = expected_box(df[col].to_numpy()[groups == group])
+            if expected is None:  # all NaN
+                assert box(summary, k) == {"q1": None, "median": None, "q3": None, "lowerfence": None, "upperfence": None, "count": 0, "outliers": []}
+                continue
+            assert np.allclose([summary["q1"][k], summary["median"][k], summary["q3"][k]], quantiles.loc[group].to_numpy())
+            result = box(summary, k)
+            assert np.allclose([result[key] for key in ["q1", "median", "q3", "lowerfence", "upperfence"]], [expected[key] for key in ["q1", "median", "q3", "lowerfence", "upperfence"]])
+            assert result["count"] == expected["count"]
+            assert result["outliers"] == expected["outliers"]
+    single = box(summaries[0], 2)
+    assert single == {"q1": 7.5, "median": 7.5, "q3": 7.5, "lowerfence": 7.5, "upperfence": 7.5, "count": 1, "outliers": []}
+
+
+def test_summary_without_groups_and_max_outliers():
+    values = pd.Series(np.concatenate([np.zeros(100), np.arange(1.0, 51.0) * 100]), name="s")
+    (summary,) = idealreport.downsample.box_summary(values, max_outliers=5)
+    assert summary["groups"] is None and summary["name"] == "s"
+    assert summary["count"] == [150]
+    assert len(summary["outliers"][0]) == 5
+    assert summary["outliers"][0][-1] == 5000.0  # the most extreme values are kept
+    expected = expected_box(values.to_numpy())
+    assert summary["outliers"][0][0] == expected["outliers"][0]
+    with pytest.raises(Exception, match="one item per row"):
+        idealreport.downsample.box_summary(values, groups=["a"])
+
+
+def test_box_plot_embeds_the_summary():
+    (df, groups) = grouped_samples()
+    plot_dict = idealreport.plot.PlotSpec().box(df, groups=groups, summary=True, max_outliers=3)
+    data = plot_dict["data"][0]
+    assert "df" not in data and "groups" not in data
+    assert data["summary"] == idealreport.downsample.box_summary(df, groups, max_outliers=3)
+    html = idealreport.plot.PlotSpec(return_html=True).box(df, groups=groups, summary=True, max_outliers=3)
+    raw = idealreport.plot.PlotSpec(return_html=True).box(df, groups=groups)
+    assert '"summary": [{"name": "a", "groups": ["a", "b", "single", "empty", "c"]' in html
+    assert len(html) < len(raw) / 10
+    assert '"groups": ["a", "a",' in raw  # without summary, the rows are embedded
+
+
+def js_function(name):
+    """ source of a top-level function of plotting.js """
+    source = open(PLOTTING_JS).read()
+    match = re.search(r"^function %s\(.*?^}" % name, source, re.S | re.M)
+    return match.group(0)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_sample_has_the_same_box():
+    """ the sample plotting.js rebuilds from a summary has the quartiles, fences and outliers of the summary """
+    (df, groups) = grouped_samples()
+    summaries = idealreport.downsample.box_summary(df, groups, max_outliers=20)
+    script = js_function("boxSummarySample") + "\nconsole.log(JSON.stringify(%s.map(boxSummarySample)));" % idealreport.serialize.dumps(summaries)
+    samples = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)
+    for (summary, sample) in zip(summaries, samples):
+        values = np.array(sample["values"])
+        sample_groups = np.array(sample["groups"])
+        assert "empty" not in sample_groups
+        for (k, group) in enumerate(summary["groups"]):
+            if summary["count"][k] == 0:
+                continue
+            expected = box(summary, k)
+            rebuilt = expected_box(values[sample_groups == group])
+            for key in ["q1", "median", "q3", "lowerfence", "upperfence"]:
+                assert np.isclose(rebuilt[key], expected[key])
+            assert rebuilt["outliers"] == expected["outliers"]
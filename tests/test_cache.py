@@ -0,0 +1,79 @@
+""" tests of idealreport.cache """
+
+import re
+
+import pandas as pd
+
+import idealreport
+
+
+def plot_ids(html):
+    return re.findall(r'<div id="([^"]+)"', html)
+
+
+def test_hash_key_depends_on_values():
+    df = pd.DataFrame({"a": [1.0, 2.0]})
+    key = idealreport.cache.hash_key("name", df)
+    assert key == idealreport.cache.hash_key("name", df.copy())
+    assert key != idealreport.cache.hash_key("name", df + 1)
+    assert key != idealreport.cache.hash_key("other", df)
+
+
+def test_cached_section_plot_ids_are_renumbered(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    cache_dir = str(tmp_path / "cache")
+
+    r1 = idealreport.Reporter("t", str(tmp_path / "r1.html"), cache=cache_dir)
+    r1.section("plot", r1.plot.line, df, title="cached")
+    r1.h += r1.plot.line(df)
+    assert r1.cache.misses == 1
+    assert plot_ids(r1.h) == ["rplot1", "rplot2"]
+
+    # the same section after two other plots: the cached plots get the next IDs of the report
+    r2 = idealreport.Reporter("t", str(tmp_path / "r2.html"), cache=cache_dir)
+    r2.h += r2.plot.line(df)
+    r2.h += r2.plot.line(df)
+    r2.section("plot", r2.plot.line, df, title="cached")
+    r2.h += r2.plot.line(df)
+    assert r2.cache.hits == 1
+    ids = plot_ids(r2.h)
+    assert ids == ["rplot1", "rplot2", "rplot3", "rplot4"]
+    assert r2.h.count('"title": "cached"') == 1 and r2.h.index('id="rplot3"') < r2.h.index('"title": "cached"') < r2.h.index('id="rplot4"')
+    for plot_id in ids:
+        # every reference to a plot ID (div, variable, generatePlot call) was moved together
+        assert r2.h.count('"%s"' % plot_id) == r2.h.count('id="%s"' % plot_id) + 1
+        assert "g_%s " % plot_id in r2.h
+
+
+def test_renumber_only_moves_the_fragment_ids():
+    html = '<div id="rplot1"></div><script>var g_rplot2 = ...;\ngeneratePlot("rplot2", g_rplot2); registerPlot("rplot1", g_rplot1, true); registerPlotly("rplot2", [], {}, {}, false); Plotly.newPlot("rplot1", [], {});</script><div id="rplot12"></div><div id="rplot3"></div>'
+    expected = '<div id="rplot10"></div><script>var g_rplot11 = ...;\ngeneratePlot("rplot11", g_rplot11); registerPlot("rplot10", g_rplot10, true); registerPlotly("rplot11", [], {}, {}, false); Plotly.newPlot("rplot10", [], {});</script><div id="rplot12"></div><div id="rplot3"></div>'
+    assert idealreport.cache._renumber(html, "rplot", 1, 2, 10, "rplot") == expected
+
+
+def test_renumber_keeps_text_that_looks_like_plot_ids():
+    html = '<p>see rplot1 and "rplot2"</p><td>rplot1</td><td>g_rplot1x</td><td>my_g_rplot2</td><p>id="rplot1" generatePlot("rplot3")</p>'
+    assert idealreport.cache._renumber(html, "rplot", 1, 2, 10, "rplot") == html
+
+
+def test_cached_section_text_is_unchanged(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0], "rplot1": ["rplot1", "rplot2", "g_rplot1"]})
+    cache_dir = str(tmp_path / "cache")
+
+    def section(df):
+        return r.plot.line(df[["a"]], title="rplot1") + idealreport.create_html.paragraph("rplot1 is the plot above") + idealreport.create_html.table(df)
+
+    r = r1 = idealreport.Reporter("t", str(tmp_path / "r1.html"), cache=cache_dir)
+    r1.section("s", section, df)
+    r = r2 = idealreport.Reporter("t", str(tmp_path / "r2.html"), cache=cache_dir)
+    r2.h += r2.plot.line(df[["a"]])
+    r2.section("s", section, df)
+    assert r2.cache.hits == 1
+    cached = r2.h[r2.h.index('<div id="rplot2">'):]
+    moved = [('id="rplot1"', 'id="rplot2"'), ("g_rplot1 =", "g_rplot2 ="), ('generatePlot("rplot1", g_rplot1)', 'generatePlot("rplot2", g_rplot2)')]
+    expected = r1.h
+    for (old, new) in moved:
+        assert expected.count(old) == 1
+        expected = expected.replace(old, new)
+    assert cached == expected
+    assert '"title": "rplot1"' in cached and "rplot1 is the plot above" in cached and ">g_rplot1<" in cached
@@ -0,0 +1,93 @@
+""" tests of idealreport.compress """
+
+import gzip
+import importlib.util
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+ENCODINGS = ["gzip", pytest.param("brotli", marks=pytest.mark.skipif(importlib.util.find_spec("brotli") is None, reason="brotli is not installed"))]
+
+
+def decompress(path, encoding):
+    data = open(path, "rb").read()
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    import brotli
+
+    return brotli.decompress(data)
+
+
+def report_html(r):
+    """ build a report with a table and plots (about 1 MB of HTML) """
+    df = pd.DataFrame({"a": range(20000), "b": [i * 0.5 for i in range(20000)], "s": ["x<&>%d" % i for i in range(20000)]})
+    r.table(df.head(2000))
+    r.h += r.plot.line(df[["a", "b"]], title="line")
+    r.text("café ☃")  # non-ascii text
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+@pytest.mark.parametrize("stream", [False, True])
+def test_report_round_trip(tmp_path, encoding, stream):
+    plain = str(tmp_path / "plain" / "report.html")
+    r = idealreport.Reporter("t", plain, stream=stream)
+    report_html(r)
+    r.generate()
+
+    compressed = str(tmp_path / "compressed" / "report.html")
+    r = idealreport.Reporter("t", compressed, stream=stream, compression=encoding, keep_html=False)
+    report_html(r)
+    r.generate()
+    assert not os.path.exists(compressed)
+    assert decompress(compressed + idealreport.compress.ENCODINGS[encoding], encoding) == open(plain, "rb").read()
+
+
+@pytest.mark.parametrize("encoding", ENCODINGS)
+def test_report_writer_writes_every_file(tmp_path, encoding):
+    output_file = str(tmp_path / "report.html")
+    writer = idealreport.compress.ReportWriter(output_file, compression=encoding, level=1)
+    parts = ["<p>%d é</p>\n" % i for i in range(10000)]
+    for part in parts:
+        writer.write(part)
+    writer.close()
+    expected = "".join(parts).encode("utf-8")
+    assert writer.paths == [output_file, output_file + idealreport.compress.ENCODINGS[encoding]]
+    assert open(output_file, "rb").read() == expected
+    assert decompress(writer.paths[1], encoding) == expected
+
+
+def test_gzip_output_is_reproducible(tmp_path):
+    paths = []
+    for name in ["a.html", "b.html"]:
+        writer = idealreport.compress.ReportWriter(str(tmp_path / name), compression="gzip", keep_html=False)
+        writer.write("<p>same</p>" * 1000)
+        writer.close()
+        paths.append(writer.paths[0])
+    assert open(paths[0], "rb").read() == open(paths[1], "rb").read()
+
+
+def test_concurrent_compress_file(tmp_path):
+    source = str(tmp_path / "lib.js")
+    with open(source, "w") as f:
+        f.write("var x = 1;\n" * 100000)
+    errors = []
+
+    def run():
+        try:
+            idealreport.compress.compress_file(source)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert gzip.decompress(open(source + ".gz", "rb").read()) == open(source, "rb").read()
+    assert sorted(os.listdir(str(tmp_path))) == ["lib.js", "lib.js.gz"]
@@ -0,0 +1,79 @@
+""" tests of idealreport.create_html.ReportContext (plot IDs of reports built in parallel threads) """
+
+import re
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+from .test_assets import run_threads
+
+THREADS = 8
+PLOTS = 6
+
+
+def plot_ids(html):
+    return re.findall(r'<div id="([^"]+)"', html)
+
+
+def build(r, i):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0 + i], "b": [3.0, 2.0, 1.0]})
+    for j in range(PLOTS // 2):
+        r.h += r.plot.line(df, title="line %d" % j)
+        r.h += r.plot.bar(df, title="bar %d" % j)
+
+
+def report_file(tmp_path, i):
+    return str(tmp_path / ("report%d.html" % i))
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_parallel_reports_into_one_directory(tmp_path, stream):
+    def generate(i):
+        r = idealreport.Reporter("report %d" % i, report_file(tmp_path, i), stream=stream, buffer_size=64)
+        build(r, i)
+        r.generate()
+
+    for trial in range(3):
+        run_threads(THREADS, generate)
+        for i in range(THREADS):
+            html = open(report_file(tmp_path, i)).read()
+            assert html.rstrip().endswith("</html>")
+            assert html.count("<html") == 1
+            ids = plot_ids(html)
+            assert ids == ["rplot%d" % k for k in range(1, PLOTS + 1)]
+
+    # the same report built alone is identical
+    r = idealreport.Reporter("report 0", str(tmp_path / "alone.html"), stream=stream)
+    build(r, 0)
+    r.generate()
+    assert open(str(tmp_path / "alone.html")).read() == open(report_file(tmp_path, 0)).read()
+
+
+def test_threads_sharing_one_context():
+    context = idealreport.create_html.ReportContext()
+    ids = []
+
+    def allocate(i):
+        for k in range(1000):
+            if k % 10 == 0:
+                index = context.reserve_plot_ids(5)
+                ids.extend("rplot%d" % n for n in range(index, index + 5))
+            else:
+                ids.append(context.next_plot_id())
+
+    run_threads(THREADS, allocate)
+    assert len(ids) == len(set(ids)) == THREADS * 1400
+    assert context.next_plot_index == THREADS * 1400 + 1
+
+
+def test_reporter_and_plots_without_context_do_not_clash(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    idealreport.create_html.reset_plot_index()
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"))
+    r.h += r.plot.line(df)
+    r.h += idealreport.create_html.plotly([{"x": [1, 2], "y": [3, 4]}], {})
+    r.h += idealreport.plot.PlotSpec(return_html=True).bar(df)
+    r.h += idealreport.create_html.plotly([{"x": [1, 2], "y": [3, 4]}], {}, context=r.context)
+    assert plot_ids(r.h) == ["rplot1", "plot1", "plot2", "rplot2"]
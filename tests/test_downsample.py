@@ -0,0 +1,123 @@
+""" tests of idealreport.downsample """
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def random_frame(rows, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.standard_normal((rows, columns)).cumsum(axis=0), columns=["c%d" % j for j in range(columns)])
+
+
+@pytest.mark.parametrize("method", idealreport.downsample.METHODS)
+@pytest.mark.parametrize("columns", [1, 2, 5, 20])
+@pytest.mark.parametrize("max_points", [1, 2, 3, 10, 100, 1000])
+def test_rows_are_bounded(method, columns, max_points):
+    df = random_frame(5000, columns)
+    result = idealreport.downsample.downsample(df, max_points, method)
+    assert 0 < len(result) <= max_points
+    assert result.index.is_monotonic_increasing and result.index.is_unique
+
+
+@pytest.mark.parametrize("method", idealreport.downsample.METHODS)
+def test_one_column_keeps_all_its_points(method):
+    df = random_frame(5000, 1)
+    y = df.iloc[:, 0].to_numpy()
+    x = np.arange(len(y), dtype="float64")
+    expected = idealreport.downsample.lttb(x, y, 500) if method == "lttb" else idealreport.downsample.minmax(y, 500)
+    assert idealreport.downsample.downsample(df, 500, method).index.tolist() == expected.tolist()
+
+
+def test_small_frame_is_unchanged():
+    df = random_frame(100, 3)
+    assert idealreport.downsample.downsample(df, 100) is df
+    assert idealreport.downsample.downsample(df, None) is df
+
+
+@pytest.mark.parametrize("max_points", [0, -1, -100])
+def test_max_points_must_be_positive(max_points):
+    with pytest.raises(ValueError, match="max_points must be at least 1"):
+        idealreport.downsample.downsample(random_frame(100, 2), max_points)
+    with pytest.raises(ValueError, match="max_points must be at least 1"):
+        idealreport.downsample.downsample(random_frame(0, 2), max_points)
+
+
+def test_non_numeric_columns():
+    df = pd.DataFrame({"s": ["x%d" % i for i in range(1000)]})
+    assert len(idealreport.downsample.downsample(df, 50)) == 50
+
+
+def test_plot_max_points_bounds_rows():
+    spec = idealreport.plot.PlotSpec(max_points=200)
+    plot_dict = spec.line(random_frame(10000, 8))
+    assert len(plot_dict["data"][0]["df"]) <= 200
+
+
+def samples(seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"a": rng.standard_normal(10000), "b": rng.standard_normal(10000) * 2 + 1})
+
+
+def test_histogram_int_bins():
+    df = samples()
+    counts, edges = idealreport.downsample.histogram_counts(df, bins=20)
+    low, high = df.min().min(), df.max().max()
+    assert np.allclose(edges, np.linspace(low, high, 21))
+    for col in df.columns:
+        assert counts[col].tolist() == np.histogram(df[col], bins=edges)[0].tolist()
+    assert counts.index.tolist() == ((edges[:-1] + edges[1:]) / 2).tolist()
+
+
+def test_histogram_explicit_edges_and_density():
+    df = samples()
+    edges = [-10.0, -1.0, 0.0, 0.5, 1.0, 10.0]
+    counts, result_edges = idealreport.downsample.histogram_counts(df, bins=edges)
+    assert result_edges.tolist() == edges
+    assert counts["a"].tolist() == np.histogram(df["a"], bins=edges)[0].tolist()
+    density = idealreport.downsample.histogram_counts(df, bins=edges, density=True)[0]
+    for col in df.columns:
+        assert np.allclose((density[col] * np.diff(edges)).sum(), 1.0)
+    with pytest.raises(Exception, match="increasing"):
+        idealreport.downsample.histogram_counts(df, bins=[1.0, 0.0])
+
+
+def test_histogram_fd():
+    series = samples()["a"]
+    counts, edges = idealreport.downsample.histogram_counts(series, bins="fd")
+    q1, q3 = np.percentile(series, [25, 75])
+    expected = int(np.ceil((series.max() - series.min()) / (2 * (q3 - q1) / len(series) ** (1.0 / 3))))
+    assert len(counts) == expected and len(edges) == expected + 1
+    assert counts.iloc[:, 0].sum() == len(series)
+    assert len(idealreport.downsample.histogram_counts(series, bins="fd", max_bins=7)[0]) == 7
+
+
+@pytest.mark.parametrize("bins", ["fd", 5, [0.0, 1.0, 2.0]])
+@pytest.mark.parametrize("density", [False, True])
+def test_histogram_without_values(bins, density):
+    df = pd.DataFrame({"a": [np.nan, np.nan], "b": [np.nan, np.inf]})
+    counts, edges = idealreport.downsample.histogram_counts(df, bins=bins, density=density)
+    assert (counts.to_numpy() == 0).all()
+    assert len(edges) == len(counts) + 1
+    if bins == "fd":
+        assert len(counts) == 1
+    empty = idealreport.downsample.histogram_counts(pd.Series([], dtype="float64", name="x"), bins=bins, density=density)[0]
+    assert (empty.to_numpy() == 0).all()
+
+
+def test_histogram_constant_column():
+    counts, edges = idealreport.downsample.histogram_counts(pd.Series([2.0] * 5), bins="fd")
+    assert counts.iloc[:, 0].tolist() == [5] and edges.tolist() == [1.5, 2.5]
+
+
+def test_histogram_plot_sends_counts():
+    df = samples()
+    plot_dict = idealreport.plot.PlotSpec().histogram(df, bins=10)
+    data = plot_dict["data"][0]
+    assert data["type"] == "overlayBar" and data["df"].shape == (10, 2)
+    assert plot_dict["opacities"] == [0.6, 0.6] and len(plot_dict["widths"]) == 2
+    single = idealreport.plot.PlotSpec().histogram(df[["a"]], bins=[-5.0, 0.0, 1.0, 5.0])
+    assert single["data"][0]["type"] == "bar" and single["widths"] == [[5.0, 1.0, 4.0]]
+    assert idealreport.plot.PlotSpec().histogram(df)["data"][0]["df"] is df  # bins=None: plotly bins the samples
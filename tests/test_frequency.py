@@ -0,0 +1,94 @@
+""" tests of idealreport.frequency """
+
+import re
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def stream(seed=0, size=20000):
+    """ a few frequent items among many rare ones """
+    rng = np.random.default_rng(seed)
+    frequent = rng.choice(["a", "b", "c"], size=size // 2, p=[0.5, 0.3, 0.2])
+    rare = np.array(["x%d" % i for i in rng.integers(0, 5000, size=size // 2)])
+    values = np.concatenate([frequent, rare])
+    rng.shuffle(values)
+    return values
+
+
+def chunks(values, size=1000):
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+def rows(html):
+    return [re.findall(r"<t[hd]>(.*?)</t[hd]>", row) for row in re.findall(r"<tr>(.*?)</tr>", html)]
+
+
+@pytest.mark.parametrize("as_series", [False, True])
+def test_exact_counts(as_series):
+    values = stream()
+    counter = idealreport.frequency.FrequencyCounter()
+    for chunk in chunks(values):
+        counter.update(pd.Series(chunk) if as_series else chunk.tolist())
+    assert counter.counts == Counter(values.tolist())
+    assert counter.total == len(values) and counter.error == 0
+    assert counter.top(3) == [(count, key) for (key, count) in Counter(values.tolist()).most_common(3)]
+
+
+def test_update_counts_and_nan():
+    counter = idealreport.frequency.FrequencyCounter()
+    counter.update(pd.Series(["a", None, "b", "a", np.nan]))
+    counter.update_counts({"b": 2})
+    counter.update_counts(pd.Series(["a", "c"]).value_counts())
+    assert counter.counts == Counter({"a": 3, "b": 3, "c": 1})
+    assert counter.total == 7
+
+
+def test_misra_gries_bounds():
+    values = stream()
+    exact = Counter(values.tolist())
+    counter = idealreport.frequency.FrequencyCounter(max_keys=50)
+    for chunk in chunks(values):
+        counter.update(pd.Series(chunk))
+    assert len(counter.counts) <= 50 and counter.error > 0
+    assert counter.error <= len(values) / 51
+    for (key, count) in counter.counts.items():
+        assert count <= exact[key] <= count + counter.error
+    for key in ["a", "b", "c"]:  # more than total / (max_keys + 1) times
+        assert key in counter.counts
+    assert [key for (count, key) in counter.top(3)] == ["a", "b", "c"]
+
+
+def test_approximate_table_shows_the_bounds():
+    counter = idealreport.frequency.FrequencyCounter(max_keys=1)
+    counter.update(["a", "a", "a", "a", "b", "c"])
+    assert counter.error > 0
+    table = rows(counter.table("item"))
+    assert table[0] == ["item", "Count (at least)", "Count (at most)"]
+    (count, key) = counter.top(1)[0]
+    assert table[1] == [key, str(count), str(count + counter.error)]
+    assert int(table[1][1]) <= 4 <= int(table[1][2])
+
+    exact = idealreport.frequency.FrequencyCounter()
+    exact.update(["a", "a", "b"])
+    assert rows(exact.table("item")) == [["item", "Count"], ["a", "2"], ["b", "1"]]
+    assert exact.table("item") == idealreport.create_html.frequency_table({"a": 2, "b": 1}, "item")
+
+
+def test_update_rejects_a_string():
+    counter = idealreport.frequency.FrequencyCounter()
+    with pytest.raises(Exception, match="not a str"):
+        counter.update("abc")
+    with pytest.raises(Exception, match="not a bytes"):
+        counter.update(b"abc")
+    counter.update(["abc"])
+    assert counter.counts == Counter({"abc": 1})
+
+
+def test_max_keys_must_be_positive():
+    with pytest.raises(Exception, match="positive"):
+        idealreport.frequency.FrequencyCounter(max_keys=0)
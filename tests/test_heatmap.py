@@ -0,0 +1,135 @@
+""" tests of heat maps: idealreport.downsample.downsample_matrix and PlotSpec.heatmap """
+
+import base64
+import json
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+from .test_box import js_function
+
+
+def matrix(rows, cols, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.standard_normal((rows, cols)), index=["r%d" % i for i in range(rows)], columns=["c%d" % j for j in range(cols)])
+
+
+def block_means(df, row_k, col_k):
+    """ mean of the numbers of each block of row_k x col_k cells, computed block by block """
+    values = df.to_numpy(dtype="float64")
+    means = []
+    for i in range(0, df.shape[0], row_k):
+        row = []
+        for j in range(0, df.shape[1], col_k):
+            block = values[i:i + row_k, j:j + col_k]
+            block = block[~np.isnan(block)]
+            row.append(block.mean() if len(block) else np.nan)
+        means.append(row)
+    return np.array(means)
+
+
+def plot_spec(html):
+    """ the plot spec embedded in the HTML of a plot """
+    return json.loads(re.search(r"var g_\w+ = (.*);\n", html).group(1))
+
+
+def decode_matrix(spec):
+    """ decode {"dtype": ..., "data": base64, "shape": [rows, cols]} the way plotting.js decodeArray() does """
+    values = np.frombuffer(base64.b64decode(spec["data"]), dtype=idealreport.serialize._TYPED_ARRAY_DTYPES[spec["dtype"]])
+    return values.reshape(spec["shape"])
+
+
+def test_blocks_are_averaged():
+    df = pd.DataFrame(np.arange(35, dtype="float64").reshape(5, 7))
+    df.iloc[0, 0] = np.nan  # ignored in the mean of its block
+    df.iloc[3:5, 6] = np.nan  # a block without numbers
+    result = idealreport.downsample.downsample_matrix(df, 9)
+    assert result.shape == (2, 3)
+    np.testing.assert_array_equal(result.to_numpy(), block_means(df, 3, 3))
+    assert np.isnan(result.iloc[1, 2])
+    assert result.iloc[0, 0] == np.mean([1, 2, 7, 8, 9, 14, 15, 16])
+    assert result.index.tolist() == [0, 3] and result.columns.tolist() == [0, 3, 6]
+
+
+def test_text_labels_name_the_block():
+    result = idealreport.downsample.downsample_matrix(matrix(5, 4), 4)
+    assert result.index.tolist() == ["r0 - r2", "r3 - r4"]
+    assert result.columns.tolist() == ["c0 - c2", "c3"]
+    stride = idealreport.downsample.downsample_matrix(matrix(5, 4), 4, "stride")
+    assert stride.index.tolist() == ["r0", "r3"] and stride.columns.tolist() == ["c0", "c3"]
+    np.testing.assert_array_equal(stride.to_numpy(), matrix(5, 4).to_numpy()[::3, ::3])
+
+
+@pytest.mark.parametrize("shape", [(100, 100), (1000, 10), (3, 500), (1, 2000), (257, 131)])
+@pytest.mark.parametrize("max_cells", [1, 2, 10, 100, 2500])
+def test_max_cells_bounds_the_cells(shape, max_cells):
+    df = pd.DataFrame(matrix(*shape).to_numpy())
+    result = idealreport.downsample.downsample_matrix(df, max_cells)
+    assert result.size <= max_cells
+    if df.size > max_cells:
+        # blocks are labelled by their first row / column
+        row_k = result.index[1] - result.index[0] if len(result.index) > 1 else shape[0]
+        col_k = result.columns[1] - result.columns[0] if len(result.columns) > 1 else shape[1]
+        np.testing.assert_allclose(result.to_numpy(), block_means(df, row_k, col_k))
+    else:
+        assert result is df
+
+
+def test_small_matrix_is_unchanged():
+    df = matrix(10, 10)
+    assert idealreport.downsample.downsample_matrix(df, 100) is df
+    assert idealreport.downsample.downsample_matrix(df, None) is df
+    with pytest.raises(Exception, match="max_cells must be positive"):
+        idealreport.downsample.downsample_matrix(df, 0)
+
+
+@pytest.mark.parametrize("precision, dtype", [(None, "float64"), ("float32", "float32"), (3, "float64")])
+def test_heatmap_sends_one_typed_matrix(precision, dtype):
+    df = matrix(3, 5)
+    df.iloc[1, 2] = np.nan
+    spec = plot_spec(idealreport.plot.PlotSpec(return_html=True).heatmap(df, precision=precision))
+    assert spec["type"] == "heatMap"
+    assert spec["z"]["dtype"] == dtype and spec["z"]["shape"] == [3, 5]
+    z = decode_matrix(spec["z"])
+    expected = df.to_numpy() if precision is None else idealreport.serialize.quantize(df.to_numpy().ravel(), precision)[0].reshape(3, 5)
+    np.testing.assert_array_equal(z, expected.astype(dtype))  # row-major, NaN kept
+    assert spec["rangeX"] == list(df.columns) and spec["rangeY"] == list(df.index)
+
+
+def test_heatmap_max_cells():
+    df = matrix(300, 200)
+    spec = plot_spec(idealreport.plot.PlotSpec(return_html=True).heatmap(df, max_cells=600))
+    expected = idealreport.downsample.downsample_matrix(df, 600)
+    assert spec["z"]["shape"] == list(expected.shape)
+    np.testing.assert_array_equal(decode_matrix(spec["z"]), expected.to_numpy())
+    assert spec["rangeY"] == list(expected.index) and spec["rangeX"] == list(expected.columns)
+
+
+def test_heatmap_options_are_passed_through():
+    df = matrix(2, 2)
+    plot_dict = idealreport.plot.PlotSpec().heatmap(df, colorscale="Viridis", reversescale=True, showscale=False, zmin=-1, zmax=1, x_label="x", y_label="y")
+    assert {k: plot_dict[k] for k in ["colorscale", "reversescale", "showscale", "zmin", "zmax", "labelX", "labelY"]} == {"colorscale": "Viridis", "reversescale": True, "showscale": False, "zmin": -1, "zmax": 1, "labelX": "x", "labelY": "y"}
+    defaults = idealreport.plot.PlotSpec().heatmap(df)
+    assert defaults["showscale"] is True
+    assert not {"colorscale", "reversescale", "zmin", "zmax"} & set(defaults)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_heatmap_trace():
+    """ plotting.js decodes z into rows and passes showscale, zmin and zmax to the plotly trace """
+    df = matrix(3, 4)
+    html = idealreport.plot.PlotSpec(return_html=True).heatmap(df, showscale=False, zmin=-2, zmax=0.5, precision="float32")
+    functions = "\n".join(js_function(name) for name in ["decodeArray", "decodePlotSpec", "generateHeatMap"])
+    script = "var g_typedArrays = {float64: Float64Array, float32: Float32Array, int32: Int32Array};\nvar g_data = {};\n%s\n" % functions
+    script += "var Plotly = {newPlot: function (div, data) { data[0].z = data[0].z.map(function (row) { return Array.from(row); }); console.log(JSON.stringify(data)); }};\n"
+    script += "var spec = %s;\ndecodePlotSpec(spec);\ngenerateHeatMap('plot', spec);" % json.dumps(plot_spec(html))
+    trace = json.loads(subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout)[0]
+    assert trace["type"] == "heatmap" and trace["showscale"] is False and trace["zmin"] == -2 and trace["zmax"] == 0.5
+    np.testing.assert_array_equal(np.array(trace["z"]), decode_matrix(plot_spec(html)["z"]))
+    assert trace["x"] == list(df.columns) and trace["y"] == list(df.index)
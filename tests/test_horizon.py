@@ -0,0 +1,122 @@
+""" tests of horizon charts: idealreport.downsample.resample_pixels and PlotSpec.horizon """
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+from .test_heatmap import plot_spec
+from .test_serialize import decode_typed_array
+
+
+def seconds(days=1, columns=2, seed=0):
+    """ a random walk per column, one row per second """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-03-01", periods=days * 86400, freq="s")
+    return pd.DataFrame(rng.standard_normal((len(index), columns)).cumsum(axis=0), index=index, columns=["m%d" % j for j in range(columns)])
+
+
+def expected_buckets(df, step, method):
+    """ value of each bucket of length step, computed with pandas resample """
+    return df.resample(step, origin=df.index[0]).agg(method)
+
+
+@pytest.mark.parametrize("width", [1, 2, 100, 960, 2000])
+def test_one_bucket_per_pixel(width):
+    df = seconds()
+    (result, step) = idealreport.downsample.resample_pixels(df, width)
+    assert 0 < len(result) <= width
+    assert result.index[0] == df.index[0] and (np.diff(result.index.asi8) == step.value).all()
+    assert step.value % 10 ** 6 == 0  # whole milliseconds
+    if width > 1:
+        assert len(result) >= width - 1  # buckets of about span / (width - 1)
+        assert step == pd.Timedelta(-(-86399000 // (width - 1)), "ms")
+
+
+@pytest.mark.parametrize("method", idealreport.downsample.PIXEL_METHODS)
+def test_bucket_values(method):
+    df = seconds()
+    (result, step) = idealreport.downsample.resample_pixels(df, 960, method)
+    expected = expected_buckets(df, step, method)
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+
+def test_buckets_without_data_are_nan():
+    df = seconds()
+    df = df[(df.index.hour < 10) | (df.index.hour >= 12)]
+    (result, step) = idealreport.downsample.resample_pixels(df, 240)
+    assert 239 <= len(result) <= 240
+    empty = (result.index >= pd.Timestamp("2024-03-01 10:00")) & (result.index + step <= pd.Timestamp("2024-03-01 12:00"))
+    assert empty.sum() >= 18
+    assert result[empty].isna().all().all() and result[~empty].notna().all().all()
+
+
+def test_sparse_data_uses_the_median_spacing():
+    df = seconds().iloc[::600]  # every 10 minutes
+    (result, step) = idealreport.downsample.resample_pixels(df, 960)
+    assert step == pd.Timedelta(minutes=10)
+    np.testing.assert_array_equal(result.to_numpy(), df.to_numpy())
+
+
+def test_tz_aware_and_unsorted():
+    df = seconds(columns=1).iloc[:7200]
+    local = df.tz_localize("US/Eastern")
+    (result, step) = idealreport.downsample.resample_pixels(local.iloc[::-1], 100)
+    (naive, naive_step) = idealreport.downsample.resample_pixels(df, 100)
+    assert step == naive_step and result.index.tz is None
+    assert result.index[0] == pd.Timestamp("2024-03-01 05:00")  # UTC
+    np.testing.assert_array_equal(result.to_numpy(), naive.to_numpy())
+
+
+def test_single_row():
+    df = pd.DataFrame({"a": [1.5]}, index=pd.DatetimeIndex(["2024-03-01 09:30"]))
+    (result, step) = idealreport.downsample.resample_pixels(df, 960)
+    assert step == pd.Timedelta(1, "ms")
+    pd.testing.assert_frame_equal(result, df)
+
+
+@pytest.mark.parametrize("df, message", [(pd.DataFrame({"a": [1.0]}), "non-empty DatetimeIndex"), (pd.DataFrame({"a": []}, index=pd.DatetimeIndex([])), "non-empty DatetimeIndex")])
+def test_invalid_inputs(df, message):
+    with pytest.raises(Exception, match=message):
+        idealreport.downsample.resample_pixels(df, 10)
+    with pytest.raises(Exception, match="width must be positive"):
+        idealreport.downsample.resample_pixels(seconds().iloc[:10], 0)
+    with pytest.raises(Exception, match="method must be in"):
+        idealreport.downsample.resample_pixels(seconds().iloc[:10], 10, "median")
+
+
+def test_horizon_sends_one_value_per_pixel():
+    df = seconds(columns=3)
+    spec = plot_spec(idealreport.plot.PlotSpec(return_html=True).horizon(df, width=500, height=20, method="max"))
+    (expected, step) = idealreport.downsample.resample_pixels(df, 500, "max")
+    assert spec["type"] == "cubism" and [p["label"] for p in spec["plots"]] == ["m0", "m1", "m2"]
+    for (j, item) in enumerate(spec["plots"]):
+        (values, dtype) = decode_typed_array(json.dumps(item["data"]))
+        assert dtype == "float64" and len(values) == len(expected) <= 500
+        np.testing.assert_array_equal(values, expected.iloc[:, j].to_numpy())
+        assert (item["min"], item["max"], item["height"]) == (values.min(), values.max(), 20)
+    # cubism: start, step (seconds) and the number of values give the time axis
+    assert spec["startTimestamp"] == "2024-03-01T00:00:00Z"
+    assert spec["timeStep"] == step.total_seconds() == 173.145
+    assert spec["timestampFormat"] == "%H:%M"
+
+
+def test_horizon_tz_aware_start():
+    df = seconds(columns=1).iloc[:3600].tz_localize("Europe/London").tz_convert("Asia/Tokyo")
+    spec = plot_spec(idealreport.plot.PlotSpec(return_html=True).horizon(df, width=60, extent=(-5, 5), precision="float32"))
+    assert spec["startTimestamp"] == "2024-03-01T00:00:00Z" and spec["timeStep"] == 61.0
+    (values, dtype) = decode_typed_array(json.dumps(spec["plots"][0]["data"]))
+    assert dtype == "float32" and len(values) == 60
+    assert (spec["plots"][0]["min"], spec["plots"][0]["max"]) == (-5, 5)
+
+
+def test_horizon_single_row_and_gaps():
+    df = pd.DataFrame({"a": [1.5], "b": [np.nan]}, index=pd.DatetimeIndex(["2024-03-01 09:30"]))
+    spec = plot_spec(idealreport.plot.PlotSpec(return_html=True).horizon(df))
+    assert spec["startTimestamp"] == "2024-03-01T09:30:00Z" and spec["timeStep"] == 0.001
+    assert decode_typed_array(json.dumps(spec["plots"][0]["data"]))[0].tolist() == [1.5]
+    assert np.isnan(decode_typed_array(json.dumps(spec["plots"][1]["data"]))[0]).all()
+    assert (spec["plots"][1]["min"], spec["plots"][1]["max"]) == (0.0, 1.0)  # no values: default extent
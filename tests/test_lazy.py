@@ -0,0 +1,150 @@
+""" tests of lazy rendering: create_html.plot / plotly with lazy= and purge=, and plotting.js registerLazyPlot """
+
+import json
+import re
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+from .test_box import js_function
+
+SPEC = {"data": [{"df": pd.DataFrame({"a": [1.0, 2.0]}), "type": "line"}]}
+DATA = [{"x": [1, 2], "y": [3.0, 4.0], "type": "scatter"}]
+
+
+def calls(html, name):
+    """ the calls of a plotting.js function in the script of a plot """
+    return re.findall(r"\b%s\((.*)\);" % name, html)
+
+
+def test_plot_is_generated_eagerly_by_default():
+    html = idealreport.create_html.plot(SPEC)
+    plot_id = re.search(r'<div id="(plot\d+)">', html).group(1)
+    assert calls(html, "generatePlot") == ['"%s", g_%s' % (plot_id, plot_id)]
+    assert not calls(html, "registerPlot") and not calls(html, "registerLazyPlot")
+
+
+@pytest.mark.parametrize("purge", [False, True])
+def test_lazy_plot_is_registered(purge):
+    html = idealreport.create_html.plot(SPEC, lazy=True, purge=purge)
+    plot_id = re.search(r'<div id="(plot\d+)">', html).group(1)
+    assert calls(html, "registerPlot") == ['"%s", g_%s, %s' % (plot_id, plot_id, json.dumps(purge))]
+    assert not calls(html, "generatePlot")
+    assert re.search(r"var g_%s = \{" % plot_id, html)  # the spec is defined either way
+
+
+def test_purge_without_lazy_is_eager():
+    html = idealreport.create_html.plot(SPEC, purge=True)
+    assert calls(html, "generatePlot") and not calls(html, "registerPlot")
+
+
+def test_plotly_is_eager_by_default():
+    html = idealreport.create_html.plotly(DATA, {"title": "t"})
+    plot_id = re.search(r'<div id="(plot\d+)">', html).group(1)
+    assert calls(html, "Plotly.newPlot") == ['"%s", %s, {"title": "t"}, {"displayModeBar": false}' % (plot_id, idealreport.serialize.dumps(DATA))]
+    assert not calls(html, "registerPlotly")
+
+
+@pytest.mark.parametrize("purge", [False, True])
+def test_lazy_plotly_is_registered(purge):
+    html = idealreport.create_html.plotly(DATA, {"title": "t"}, modebar=True, lazy=True, purge=purge)
+    plot_id = re.search(r'<div id="(plot\d+)">', html).group(1)
+    assert calls(html, "registerPlotly") == ['"%s", %s, {"title": "t"}, {"displayModeBar": true}, %s' % (plot_id, idealreport.serialize.dumps(DATA), json.dumps(purge))]
+    assert not calls(html, "Plotly.newPlot")
+
+
+def test_plot_spec_and_reporter_pass_lazy_and_purge(tmp_path):
+    df = pd.DataFrame({"a": np.arange(10.0)})
+    assert calls(idealreport.plot.PlotSpec(return_html=True).line(df), "generatePlot")
+    assert calls(idealreport.plot.PlotSpec(return_html=True, lazy=True).line(df), "registerPlot")[0].endswith(", false")
+    assert calls(idealreport.plot.PlotSpec(return_html=True, lazy=True, purge=True).line(df), "registerPlot")[0].endswith(", true")
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), lazy=True, purge=True)
+    r.h += r.plot.line(df)
+    r.h += r.plot.bar(df)
+    r.generate()
+    html = (tmp_path / "r.html").read_text()
+    assert len(calls(html, "registerPlot")) == 2 and all(c.endswith(", true") for c in calls(html, "registerPlot"))
+    assert not calls(html, "generatePlot")
+
+
+# a minimal page for the lazy functions of plotting.js: divs, IntersectionObserver (entries are sent by
+# scroll()) and Plotly / generatePlot stubs that record what is rendered and purged
+JS_PAGE = """
+var g_pendingPlots = {}, g_lazyObserver = null, g_purgeObserver = null, g_purgeMargin = '3000px';
+var log = [], observers = [], divs = {};
+function div(id) {
+    return divs[id] || (divs[id] = {id: id, style: {}, offsetHeight: 300, attributes: {}, classes: [],
+        setAttribute: function (k, v) { this.attributes[k] = v; }, getAttribute: function (k) { return this.attributes[k]; },
+        classList: {contains: function (c) { return divs[id].classes.indexOf(c) >= 0; }}});
+}
+var document = {getElementById: div};
+var window = {IntersectionObserver: true, addEventListener: function (name) { log.push('listen ' + name); }};
+function IntersectionObserver(callback, options) {
+    this.callback = callback; this.options = options; this.targets = {}; observers.push(this);
+}
+IntersectionObserver.prototype.observe = function (target) { this.targets[target.id] = true; };
+IntersectionObserver.prototype.unobserve = function (target) { delete this.targets[target.id]; };
+function scroll(id, isIntersecting) {
+    observers.forEach(function (o) { if (o.targets[id]) { o.callback([{target: div(id), isIntersecting: isIntersecting}]); } });
+}
+function generatePlot(id, spec) { log.push('generatePlot ' + id + ' ' + spec.title); div(id).classes = ['js-plotly-plot']; }
+var Plotly = {
+    newPlot: function (plotDiv, data, layout) { log.push('newPlot ' + plotDiv.id + ' ' + layout.title); plotDiv.classes = ['js-plotly-plot']; },
+    purge: function (plotDiv) { log.push('purge ' + plotDiv.id); plotDiv.classes = []; }
+};
+"""
+
+
+def run_page(script, observers=True):
+    """ run the lazy functions of plotting.js and a script in node, returning the log """
+    functions = "\n".join(js_function(name) for name in ["registerPlot", "registerPlotly", "registerLazyPlot", "renderPendingPlot", "purgePlot", "renderAllPlots"])
+    page = JS_PAGE if observers else JS_PAGE.replace("IntersectionObserver: true, ", "")
+    source = page + functions + "\n" + script + "\nconsole.log(JSON.stringify(log));"
+    return json.loads(subprocess.run(["node", "-e", source], capture_output=True, text=True, check=True).stdout)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_lazy_plots_render_in_view():
+    log = run_page("""
+        registerPlot('p1', {title: 'one'}, false);
+        registerPlotly('p2', [], {title: 'two', height: 600}, {}, false);
+        log.push('height ' + div('p1').style.minHeight + ' ' + div('p2').style.minHeight);
+        scroll('p2', true);
+        scroll('p2', true);
+        scroll('p1', false);
+        scroll('p1', true);
+    """)
+    assert log == ["listen beforeprint", "height 450px 600px", "newPlot p2 two", "generatePlot p1 one"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_purged_plots_render_again():
+    log = run_page("""
+        registerPlot('p1', {title: 'one'}, true);
+        registerPlot('p2', {title: 'two'}, false);
+        scroll('p1', true);
+        scroll('p2', true);
+        log.push('margin ' + observers[1].options.rootMargin);
+        scroll('p1', false);
+        scroll('p2', false);
+        log.push('pending ' + Object.keys(g_pendingPlots));
+        scroll('p1', true);
+    """)
+    assert log == ["listen beforeprint", "generatePlot p1 one", "generatePlot p2 two", "margin 3000px", "purge p1", "pending p1", "generatePlot p1 one"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_without_intersection_observer_renders_immediately():
+    log = run_page("registerPlot('p1', {title: 'one'}, true);\nregisterPlotly('p2', [], {title: 'two'}, {}, true);\nrenderAllPlots();", observers=False)
+    assert log == ["generatePlot p1 one", "newPlot p2 two"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_js_print_renders_everything():
+    log = run_page("registerPlot('p1', {title: 'one'}, false);\nregisterPlot('p2', {title: 'two'}, true);\nrenderAllPlots();\nlog.push('pending ' + Object.keys(g_pendingPlots).length);")
+    assert log == ["listen beforeprint", "generatePlot p1 one", "generatePlot p2 two", "pending 0"]
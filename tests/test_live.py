@@ -0,0 +1,115 @@
+""" tests of idealreport.live (Server-Sent Events of live plots) """
+
+import io
+import json
+import queue
+import threading
+import time
+import urllib.request
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+class EventReader(object):
+    """ read the event stream of a server in a thread, putting each (id, data) event in a queue """
+
+    def __init__(self, server, last_id=None):
+        request = urllib.request.Request(server.url + idealreport.live.EVENTS_PATH.lstrip("/"))
+        if last_id is not None:
+            request.add_header("Last-Event-ID", str(last_id))
+        self.response = urllib.request.urlopen(request, timeout=10)
+        assert self.response.headers["Content-Type"] == "text/event-stream"
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        event = {}
+        for line in self.response:
+            line = line.decode("utf-8").rstrip("\n")
+            if line == "":
+                if event:
+                    self.events.put((int(event["id"]), json.loads(event["data"])))
+                event = {}
+            elif not line.startswith(":"):
+                (field, value) = line.split(": ", 1)
+                event[field] = value
+        self.events.put(None)
+
+    def get(self):
+        return self.events.get(timeout=10)
+
+
+def wait_for_clients(server, count):
+    deadline = time.time() + 10
+    while len(server._clients) < count:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def values(event):
+    return [column["values"] for column in event[1]["df"]]
+
+
+def rows(start, count):
+    return pd.DataFrame({"a": [float(i) for i in range(start, start + count)]}, index=range(start, start + count))
+
+
+@pytest.fixture
+def report(tmp_path):
+    r = idealreport.Reporter("live", str(tmp_path / "live.html"), live=True)
+    yield r
+    r.live.close()
+
+
+def test_append_is_pushed(report):
+    plot = report.plot.line(rows(0, 2), live=True)
+    report.h += plot
+    report.generate()
+    page = urllib.request.urlopen(report.live.url_for(report.output_file), timeout=10).read().decode("utf-8")
+    assert plot.key in page
+
+    reader = EventReader(report.live)
+    wait_for_clients(report.live, 1)
+    plot.append(rows(2, 3))
+    event = reader.get()
+    assert event[1]["key"] == plot.key
+    assert values(event) == [[2, 3, 4], [2.0, 3.0, 4.0]]
+
+    report.live.close()
+    assert reader.get() is None
+
+
+def test_last_event_id_replay_and_trimming(report):
+    plot = report.plot.line(rows(0, 1), live=True, live_points=4)
+    other = report.plot.line(rows(0, 1), live=True)
+    for start in range(0, 10, 2):
+        plot.append(rows(start, 2))  # events 1, 2, 3, 4, 5 of 2 rows each
+    other.append(rows(0, 1))  # event 6 (not trimmed)
+
+    # only the updates with points kept (the last 4 of the plot) are replayed to a new page
+    reader = EventReader(report.live)
+    replayed = [reader.get() for i in range(3)]
+    assert [event[0] for event in replayed] == [4, 5, 6]
+    assert values(replayed[0]) == [[6, 7], [6.0, 7.0]]
+
+    # a reconnecting page only gets what it has not seen
+    reader = EventReader(report.live, last_id=5)
+    assert reader.get()[0] == 6
+    wait_for_clients(report.live, 2)
+    plot.append(rows(10, 1))
+    assert reader.get()[0] == 7
+
+
+def test_max_points_must_be_positive(report):
+    with pytest.raises(Exception, match="max_points must be positive"):
+        report.plot.line(rows(0, 1), live=True, live_points=0)
+
+
+@pytest.mark.parametrize("options", [{"compression": "gzip"}, {"keep_html": False, "compression": "gzip"}])
+def test_file_like_stream_cannot_be_compressed(tmp_path, options):
+    with pytest.raises(Exception, match="compression"):
+        idealreport.Reporter("t", str(tmp_path / "r.html"), stream=io.StringIO(), **options)
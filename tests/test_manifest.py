@@ -0,0 +1,129 @@
+""" tests of the report manifest: Reporter(profile=, on_element=), Reporter.generate(manifest=...) and write_manifest """
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def frame(rows):
+    return pd.DataFrame({"a": np.arange(rows, dtype="float64"), "b": np.ones(rows)})
+
+
+def build(r):
+    """ add one element of each kind to a report, returning the HTML of each (in order) """
+    parts = []
+    for html in [r.plot.line(frame(100), title="line"), idealreport.create_html.plotly([{"x": np.arange(7), "y": np.ones(7)}], {"title": "direct"}, context=r.context)]:
+        r.h += html
+        parts.append(html)
+    r.table(frame(5))
+    r.table_chunks([frame(3), frame(4)])
+    r.text("some text")
+    r.section("s", r.plot.bar, frame(10), title="section")
+    return parts
+
+
+def test_generate_writes_the_manifest(tmp_path):
+    output_file = str(tmp_path / "report.html")
+    r = idealreport.Reporter("title", output_file, profile=True)
+    (line, direct) = build(r)
+    r.generate(manifest=True)
+    with open(str(tmp_path / "report.manifest.json")) as f:
+        manifest = json.load(f)
+
+    assert (manifest["title"], manifest["output_file"], manifest["idealreport"], manifest["profile"]) == ("title", output_file, idealreport.__version__, True)
+    assert manifest["output_bytes"] == os.path.getsize(output_file)
+    assert manifest["save_seconds"] > 0
+    elements = manifest["elements"]
+    assert [e["kind"] for e in elements] == ["plot", "plotly", "table", "table", "text", "plot", "section"]
+    assert [e["index"] for e in elements] == list(range(7))
+    (plot, plotly, table, chunks, text, section_plot, section) = elements
+    assert (plot["name"], plot["title"], plot["points"], plot["bytes"]) == ("line", "line", 300, len(line))
+    assert plot["plot_id"] in line and plotly["plot_id"] in direct and plot["plot_id"] != plotly["plot_id"]
+    assert (plotly["title"], plotly["points"], plotly["bytes"]) == ("direct", 14, len(direct))
+    assert (table["rows"], table["cells"]) == (5, 10)
+    assert (chunks["rows"], chunks["cells"]) == (7, 14) and chunks["bytes"] > 0
+    assert text["bytes"] == len(idealreport.create_html.paragraph("some text"))
+    assert (section["name"], section["cached"], section_plot["name"]) == ("s", False, "bar")
+    assert section["bytes"] == section_plot["bytes"]
+
+    for e in elements:
+        if e["kind"] in ("plot", "plotly"):
+            assert 0 <= e["prep_seconds"] <= e["seconds"]
+            assert e["seconds"] == pytest.approx(e["prep_seconds"] + e["serialize_seconds"], abs=1e-6)
+    totals = manifest["totals"]
+    assert totals["plot"]["count"] == 2 and totals["plot"]["points"] == plot["points"] + section_plot["points"]
+    assert totals["plot"]["bytes"] == plot["bytes"] + section_plot["bytes"]
+    assert totals["table"] == {"count": 2, "seconds": pytest.approx(table["seconds"] + chunks["seconds"]), "bytes": table["bytes"] + chunks["bytes"], "cells": 24}
+    assert totals["text"] == {"count": 1, "seconds": 0.0, "bytes": text["bytes"]}
+
+
+def test_manifest_file_name(tmp_path):
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), profile=True)
+    r.text("x")
+    r.generate(manifest=str(tmp_path / "other.json"))
+    assert not os.path.exists(str(tmp_path / "r.manifest.json"))
+    with open(str(tmp_path / "other.json")) as f:
+        assert [e["kind"] for e in json.load(f)["elements"]] == ["text"]
+    r.generate()
+    assert not os.path.exists(str(tmp_path / "r.manifest.json"))
+
+
+def test_manifest_without_profile(tmp_path):
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"))
+    build(r)
+    assert r.context.profile is None
+    r.write_manifest(str(tmp_path / "m.json"))
+    with open(str(tmp_path / "m.json")) as f:
+        manifest = json.load(f)
+    assert (manifest["profile"], manifest["elements"], manifest["totals"], manifest["save_seconds"]) == (False, [], {}, None)
+    assert "output_bytes" not in manifest  # not saved yet
+
+
+def test_streamed_report_manifest(tmp_path):
+    output_file = str(tmp_path / "r.html")
+    r = idealreport.Reporter("t", output_file, stream=True, profile=True)
+    build(r)
+    r.generate(manifest=True)
+    with open(str(tmp_path / "r.manifest.json")) as f:
+        manifest = json.load(f)
+    assert manifest["output_bytes"] == os.path.getsize(output_file)
+    assert len(manifest["elements"]) == 7
+
+
+def test_on_element_is_called_as_elements_are_added(tmp_path):
+    seen = []
+
+    def on_element(record):
+        seen.append((record["kind"], len(r.context.profile)))
+
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), on_element=on_element)
+    assert r.context.profile == []  # on_element implies profile
+    r.text("a")
+    r.h += r.plot.line(frame(10))
+    r.table(frame(2))
+    assert seen == [("text", 1), ("plot", 2), ("table", 3)]
+    assert r.manifest()["elements"] == r.context.profile
+
+
+def test_spec_seconds_are_included(tmp_path, monkeypatch):
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), profile=True, max_points=50)
+    downsample = idealreport.downsample.downsample
+
+    def slow_downsample(*args, **kwargs):
+        time.sleep(0.05)
+        return downsample(*args, **kwargs)
+
+    monkeypatch.setattr(idealreport.downsample, "downsample", slow_downsample)
+    r.h += r.plot.line(frame(1000))
+    r.h += idealreport.create_html.plot({"data": [{"df": frame(10), "type": "line"}]}, context=r.context, spec_seconds=2.0)
+    (downsampled, given) = r.manifest()["elements"]
+    assert downsampled["points"] == 150  # 50 rows after downsampling
+    assert downsampled["prep_seconds"] >= 0.05 and downsampled["seconds"] >= downsampled["prep_seconds"]
+    assert given["prep_seconds"] >= 2.0 and given["seconds"] == pytest.approx(given["prep_seconds"] + given["serialize_seconds"])
+    assert given["serialize_seconds"] < 1.0
@@ -0,0 +1,77 @@
+""" tests of idealreport.plot.PlotSpec """
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def frame(rows):
+    return pd.DataFrame({"a": np.arange(rows, dtype="float64")})
+
+
+def webgl_flags(plot_dict):
+    return [data_spec.get("webgl", False) for data_spec in plot_dict["data"]]
+
+
+@pytest.mark.parametrize("plot", ["line", "scatter", "time"])
+@pytest.mark.parametrize("rows, expected", [(99, False), (100, False), (101, True)])
+def test_webgl_threshold(plot, rows, expected):
+    spec = idealreport.plot.PlotSpec(webgl_threshold=100)
+    df = frame(rows)
+    if plot == "time":
+        df.index = pd.date_range("2020-01-01", periods=rows, freq="s")
+    assert webgl_flags(getattr(spec, plot)(df)) == [expected]
+
+
+@pytest.mark.parametrize("threshold", [100, None])
+@pytest.mark.parametrize("rows", [10, 1000])
+@pytest.mark.parametrize("webgl", [True, False])
+def test_webgl_argument_overrides_threshold(threshold, rows, webgl):
+    spec = idealreport.plot.PlotSpec(webgl_threshold=threshold)
+    assert webgl_flags(spec.line(frame(rows), webgl=webgl)) == [webgl]
+
+
+def test_no_threshold_is_svg():
+    spec = idealreport.plot.PlotSpec(webgl_threshold=None)
+    assert webgl_flags(spec.line(frame(10 ** 5))) == [False]
+
+
+def test_multi_marks_only_scatter_traces():
+    spec = idealreport.plot.PlotSpec(webgl_threshold=100)
+    dfs = [frame(1000), frame(1000), frame(10), frame(1000)]
+    types = ["bar", "line", "line", "scatter"]
+    assert webgl_flags(spec.multi(dfs, types)) == [False, True, False, True]
+    assert webgl_flags(spec.multi(dfs, types, webgl=True)) == [False, True, True, True]
+    assert webgl_flags(spec.multi(dfs, types, webgl=False)) == [False, False, False, False]
+
+
+def test_webgl_in_html():
+    r = idealreport.plot.PlotSpec(return_html=True, webgl_threshold=100)
+    assert '"webgl": true' in r.line(frame(101))
+    assert '"webgl"' not in r.line(frame(100))
+
+
+def test_profile_includes_plot_spec_work(tmp_path, monkeypatch):
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), profile=True)
+    histogram_counts = idealreport.downsample.histogram_counts
+
+    def slow_histogram_counts(*args, **kwargs):
+        time.sleep(0.05)
+        return histogram_counts(*args, **kwargs)
+
+    monkeypatch.setattr(idealreport.downsample, "histogram_counts", slow_histogram_counts)
+    r.h += r.plot.histogram(frame(10 ** 5), bins=10)
+    (record,) = r.context.profile
+    assert record["prep_seconds"] >= 0.05
+    assert record["seconds"] >= record["prep_seconds"] + record["serialize_seconds"] - 1e-9
+
+
+def test_plotly_profile_counts_array_points(tmp_path):
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), profile=True)
+    data = [{"x": np.arange(5), "y": [1, 2, 3, 4, 5], "z": np.ones((2, 3)), "opacity": np.float64(0.5), "name": "a"}]
+    r.h += idealreport.create_html.plotly(data, {}, context=r.context)
+    assert r.context.profile[0]["points"] == 5 + 5 + 6
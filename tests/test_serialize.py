@@ -0,0 +1,222 @@
+""" tests of idealreport.serialize """
+
+import base64
+import importlib.util
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def baseline_dataframe_to_dict(df):
+    """ create_html.dataframe_to_dict() before idealreport.serialize (to_json --> json.loads of each column) """
+    columns = []
+    if hasattr(df, "columns"):  # data frame
+        columns.append({"name": df.index.name, "values": json.loads(df.to_json(orient="split", date_format="iso"))["index"]})
+        for col in df.columns:
+            columns.append({"name": col, "values": json.loads(df[col].to_json(orient="values", date_format="iso"))})
+    else:  # series
+        columns.append({"name": df.index.name, "values": json.loads(df.to_json(orient="split", date_format="iso"))["index"]})
+        columns.append({"name": df.name, "values": json.loads(df.to_json(orient="values", date_format="iso"))})
+    return columns
+
+
+def frames():
+    """ DataFrames and Series covering the column types of plots """
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2020-01-01", periods=50, freq="h", name="time")
+    floats = pd.DataFrame({"a": rng.normal(size=50), "b": rng.normal(size=50) * 1e6}, index=index)
+    floats.iloc[3, 0] = np.nan
+    yield floats
+    yield floats.tz_localize("UTC")
+    yield pd.DataFrame({"i": np.arange(50), "s": ["x%d" % i for i in range(50)], "flag": np.arange(50) % 2 == 0})
+    yield pd.DataFrame({"when": index, "v": np.arange(50.0)}, index=pd.Index(["r%d" % i for i in range(50)], name="row"))
+    yield pd.Series(rng.normal(size=50), index=index, name="series")
+    yield pd.Series([1.5, np.nan, 3.0], index=[10, 20, 30])
+
+
+@pytest.mark.parametrize("df", list(frames()))
+def test_dataframe_to_json_matches_baseline(df):
+    assert json.loads(idealreport.serialize.dataframe_to_json(df)) == baseline_dataframe_to_dict(df)
+
+
+@pytest.mark.parametrize("df", list(frames()))
+def test_dataframe_to_json_store_refers_to_same_values(df):
+    store = idealreport.serialize.DataStore()
+    columns = json.loads(idealreport.serialize.dataframe_to_json(df, store=store))
+    script = store.pop_definitions()
+    definitions = {}
+    for line in script.splitlines():
+        key, values = line[len('g_data["') : -1].split('"] = ', 1)
+        definitions[key] = json.loads(values)
+    resolved = [{"name": c["name"], "values": definitions[c["ref"]]} for c in columns]
+    assert resolved == baseline_dataframe_to_dict(df)
+
+
+def test_dumps_inserts_fragments():
+    df = pd.DataFrame({"a": [1.0, np.nan]})
+    spec = {"title": "t", "data": [{"df": idealreport.serialize.dataframe_to_json(df), "type": "line"}]}
+    expected = {"title": "t", "data": [{"df": baseline_dataframe_to_dict(df), "type": "line"}]}
+    assert json.loads(idealreport.serialize.dumps(spec)) == expected
+
+
+def decode_typed_array(fragment):
+    """ decode {"dtype": ..., "data": base64} the way plotting.js decodeArray() does (little-endian typed array) """
+    spec = json.loads(fragment)
+    return np.frombuffer(base64.b64decode(spec["data"]), dtype=idealreport.serialize._TYPED_ARRAY_DTYPES[spec["dtype"]]), spec["dtype"]
+
+
+def bits(values):
+    """ the bytes of float values (distinguishes -0.0 and NaN payloads), or the values of integers """
+    if values.dtype.kind == "f":
+        return values.view("<u%d" % values.dtype.itemsize).tolist()
+    return values.tolist()
+
+
+FLOAT_SPECIALS = [0.0, -0.0, 1.5, -2.25, np.nan, np.inf, -np.inf]
+
+
+@pytest.mark.parametrize(
+    "values, dtype",
+    [
+        (np.array(FLOAT_SPECIALS + [np.finfo("f8").max, np.finfo("f8").tiny, 5e-324, 0.1], dtype="f8"), "float64"),
+        (np.array(FLOAT_SPECIALS + [np.finfo("f4").max, np.finfo("f4").tiny, 0.1], dtype="f4"), "float32"),
+        (np.array(FLOAT_SPECIALS + [65504.0], dtype="f2"), "float32"),
+        (np.array([-(2 ** 31), -1, 0, 2 ** 31 - 1], dtype="i4"), "int32"),
+        (np.array([-(2 ** 31), 0, 2 ** 31 - 1], dtype="i8"), "int32"),
+        (np.array([-(2 ** 53), -(2 ** 31) - 1, 2 ** 31, 2 ** 53], dtype="i8"), "float64"),
+        (np.array([0, 2 ** 32 - 1], dtype="u4"), "float64"),
+        (np.array([-128, 127], dtype="i1"), "int32"),
+        (np.array([0, 65535], dtype="u2"), "int32"),
+        (np.array([], dtype="i8"), "int32"),
+    ],
+)
+def test_typed_array_round_trip(values, dtype):
+    decoded, encoded_dtype = decode_typed_array(idealreport.serialize.typed_array_json(values))
+    assert encoded_dtype == dtype
+    if values.dtype.itemsize == 2 and values.dtype.kind == "f":
+        values = values.astype("f4")  # float16 is widened exactly
+    if dtype == "float64" and values.dtype.kind in "iu":
+        assert decoded.astype(values.dtype).tolist() == values.tolist()
+    else:
+        assert bits(decoded) == bits(values.astype(decoded.dtype))
+
+
+@pytest.mark.parametrize("values", [np.array([0, 2 ** 53 + 1], dtype="i8"), np.array([np.iinfo("i8").min, np.iinfo("i8").max], dtype="i8"), np.array([np.iinfo("u8").max], dtype="u8")])
+def test_typed_array_inexact_integers_are_json(values):
+    assert idealreport.serialize.typed_array_json(values) is None
+    columns = json.loads(idealreport.serialize.dataframe_to_json(pd.Series(values), binary=True))
+    assert columns[1]["values"] == values.tolist()
+
+
+@pytest.mark.parametrize("values", [np.array([True, False]), np.array(["a", "b"], dtype=object), pd.date_range("2020", periods=2).values])
+def test_typed_array_non_numeric(values):
+    assert idealreport.serialize.typed_array_json(values) is None
+
+
+def test_plots_are_self_contained_by_default(tmp_path):
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"))
+    plots = [r.plot.line(df), r.plot.line(df)]
+    assert not any("g_data" in plot for plot in plots)
+
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), share_data=True)
+    plots = [r.plot.line(df), r.plot.line(df)]
+    assert "g_data[" in plots[0]
+    assert '"ref": ' in plots[1] and "g_data[" not in plots[1]
+
+
+AVAILABLE_ENGINES = [engine for engine in idealreport.serialize.ENGINES if importlib.util.find_spec(engine) is not None]
+
+NUMPY_VALUES = [
+    np.float32(0.1),
+    np.float16(0.1),
+    np.float64(1e-7),
+    np.float32(np.nan),
+    np.int64(2 ** 40),
+    np.uint8(255),
+    np.bool_(True),
+    np.datetime64("2020-01-02T03:04:05"),
+    [np.float32(0.1), 1, None, np.float64(np.inf)],
+    np.array([0.1, np.nan, -np.inf], dtype="f4"),
+    np.array([0.1, 0.2], dtype="f2"),
+    np.array([[1, 2], [3, 4]], dtype="i8"),
+    np.array(["2020-01-01", "NaT"], dtype="datetime64[ns]"),
+    {"x": np.array([0.3], dtype="f4"), "y": [np.float32(2.5)], "name": "a"},
+]
+
+
+@pytest.mark.parametrize("engine", AVAILABLE_ENGINES)
+@pytest.mark.parametrize("value", NUMPY_VALUES)
+def test_engines_encode_the_same_values(engine, value):
+    expected = json.loads(idealreport.serialize.dumps(value, "json"))
+    assert json.loads(idealreport.serialize.dumps(value, engine)) == expected
+
+
+def exact_values(values):
+    """ the values of a numeric column as python values (NaN/Infinity --> None), as an engine writes them """
+    return [None if isinstance(v, float) and not np.isfinite(v) else v for v in np.asarray(values).tolist()]
+
+
+@pytest.mark.parametrize("engine", [engine for engine in AVAILABLE_ENGINES if engine != "json"])
+@pytest.mark.parametrize("df", list(frames()) + [pd.DataFrame({"n": pd.array([1, None, 3], dtype="Int64"), "f": np.array([0.1, 1e-11, 1.5e30], dtype="f4")})])
+def test_engine_encodes_numeric_columns(engine, df):
+    columns = json.loads(idealreport.serialize.dataframe_to_json(df, engine=engine))
+    baseline = baseline_dataframe_to_dict(df)
+    series = [df.index] + ([df.iloc[:, j] for j in range(df.shape[1])] if hasattr(df, "columns") else [df])
+    assert [c["name"] for c in columns] == [c["name"] for c in baseline]
+    for (column, expected, values) in zip(columns, baseline, series):
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biuf":
+            assert column["values"] == exact_values(values.to_numpy())  # every digit
+        else:
+            assert column["values"] == expected["values"]  # dates, text and nullable dtypes: pandas
+    # the same values through a store, and the default engine
+    store = idealreport.serialize.DataStore()
+    refs = json.loads(idealreport.serialize.dataframe_to_json(df, store=store, engine=engine))
+    definitions = dict(line[len('g_data["') : -1].split('"] = ', 1) for line in store.pop_definitions().splitlines())
+    assert [json.loads(definitions[c["ref"]]) for c in refs] == [c["values"] for c in columns]
+    idealreport.serialize.set_json_engine(engine)
+    try:
+        assert json.loads(idealreport.serialize.dataframe_to_json(df)) == columns
+    finally:
+        idealreport.serialize.set_json_engine("json")
+
+
+@pytest.mark.parametrize("engine", AVAILABLE_ENGINES)
+def test_report_engine_encodes_plot_columns(engine, tmp_path):
+    df = pd.DataFrame({"a": [0.1 + 0.2, 1.5e-10, np.nan], "b": [1, 2, 3]})
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), json_engine=engine)
+    html = r.plot.line(df)
+    spec = json.loads(html[html.index(" = ") + 3 : html.index(";\n")])
+    values = [c["values"] for c in spec["data"][0]["df"]]
+    if engine == "json":
+        assert values == [c["values"] for c in baseline_dataframe_to_dict(df)]
+    else:
+        assert values == [[0, 1, 2], [0.30000000000000004, 1.5e-10, None], [1, 2, 3]]
+
+
+@pytest.mark.parametrize("precision, parsed", [(4, ("significant", 4)), (np.int64(4), ("significant", 4)), ("4g", ("significant", 4)), (".4g", ("significant", 4)), (".0f", ("fixed", 0)), (".15f", ("fixed", 15)), ("float32", ("float32", None))])
+def test_parse_precision(precision, parsed):
+    assert idealreport.serialize._parse_precision(precision) == parsed
+
+
+@pytest.mark.parametrize("precision, message", [(0, "significant digit"), (-2, "significant digit"), (".0g", "significant digit"), (".-1f", "decimal places"), (".16f", "decimal places"), ("4x", "must be an int"), (".f", "must be an int"), (2.5, "must be an int"), (True, "must be an int"), ("float16", "must be an int")])
+def test_invalid_precision(precision, message):
+    with pytest.raises(Exception, match=message):
+        idealreport.serialize.quantize(np.array([0.5]), precision)
+    with pytest.raises(Exception, match=message):
+        idealreport.plot.PlotSpec().line(pd.DataFrame({"a": [0.5]}), precision=precision)
+
+
+@pytest.mark.parametrize("precision", [1, 3, 15, "float32"])
+def test_quantize_tiny_values_stay_finite(precision):
+    values = np.array([1e-310, 1.5, 5e-324, -2.5e-320, np.finfo("f8").tiny, 1e-300, 1.23456e-305, 0.0, np.nan])
+    with np.errstate(over="raise", invalid="raise", divide="raise"):  # (underflow to subnormal values is expected)
+        (rounded, decimals) = idealreport.serialize.quantize(values, precision)
+    assert np.isfinite(rounded[:-1]).all() and np.isnan(rounded[-1])
+    assert np.allclose(rounded[:-1], values[:-1], rtol=0.5, atol=0)
+    assert 1 <= decimals <= 15
+    assert rounded[1] == (2.0 if precision == 1 else 1.5)
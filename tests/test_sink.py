@@ -0,0 +1,55 @@
+""" tests of idealreport.sink """
+
+import io
+
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def build(r):
+    """ add elements of various sizes to a report (several times the buffer size in total) """
+    df = pd.DataFrame({"a": range(500), "b": [i / 7.0 for i in range(500)]})
+    for i in range(20):
+        r.h += "<h4>section %d</h4>\n" % i
+        r.table(df.head(10 * i + 1))
+        r.h += r.plot.line(df, title="plot %d" % i)
+        r.text("text & more <%d>" % i)
+
+
+@pytest.mark.parametrize("buffer_size", [1, 1000, 1 << 15])
+def test_streamed_report_equals_saved_report(tmp_path, buffer_size):
+    saved = str(tmp_path / "saved" / "report.html")
+    r = idealreport.Reporter("t", saved)
+    build(r)
+    r.generate()
+
+    streamed = str(tmp_path / "streamed" / "report.html")
+    r = idealreport.Reporter("t", streamed, stream=True, buffer_size=buffer_size)
+    build(r)
+    sink = r.h
+    r.generate()
+    html = open(saved).read()
+    assert open(streamed).read() == html
+    assert sink.bytes_written == len(html) > 4 * buffer_size
+    assert sink.peak_pending_size <= buffer_size
+
+
+def test_buffer_bound():
+    f = io.StringIO()
+    sink = idealreport.sink.HtmlSink(f, buffer_size=100)
+    parts = ["x" * n for n in [1, 50, 49, 1, 99, 100, 250, 3, 0, 60, 60, 60]]
+    for part in parts:
+        sink += part
+        assert sink.pending_size <= 100
+    sink.close()
+    assert sink.peak_pending_size <= 100
+    assert f.getvalue() == "".join(parts)
+
+
+def test_write_after_close():
+    sink = idealreport.sink.HtmlSink(io.StringIO())
+    sink.close()
+    with pytest.raises(Exception):
+        sink.write("<p></p>")
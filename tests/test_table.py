@@ -0,0 +1,104 @@
+""" tests of idealreport.create_html.table() """
+
+import os
+import re
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+
+def cells(html):
+    return re.findall(r"<td[^>]*>(.*?)</td>", html)
+
+
+TIMESTAMPS = [pd.Timestamp("2020-01-01"), pd.NaT, pd.Timestamp("2020-01-02 03:04:05.123456789")]
+DURATIONS = pd.to_timedelta([1.0, None, 2.5], unit="s")
+
+
+@pytest.mark.parametrize("other", [None, "x"])
+def test_datetime_columns_are_not_numbers(other):
+    df = pd.DataFrame({"d": TIMESTAMPS, "t": DURATIONS})
+    if other is not None:
+        df[other] = [1.5, 2.0, 1234.5]  # object rows instead of one datetime64 block
+    for column in ["d", "t"]:
+        assert df[[column]].values.dtype.kind in "mM"
+    expected = [str(v) for v in TIMESTAMPS], [str(v) for v in DURATIONS]
+    html = idealreport.create_html.table(df)
+    width = len(df.columns)
+    assert cells(html)[0::width] == expected[0]
+    assert cells(html)[1::width] == expected[1]
+    if other is not None:
+        assert cells(html)[2::width] == ["1.50", "2.00", "1,234.50"]
+    assert cells(idealreport.create_html.table(df[["d"]])) == expected[0]
+    assert cells(idealreport.create_html.table(df[["t"]])) == expected[1]
+
+
+def test_numbers_and_strings():
+    df = pd.DataFrame({"n": [1, 1234567], "s": ["a<b", "c&d"], "m": [1.0, "e"]})
+    html = idealreport.create_html.table(df, col_format={"n": {"decimal_places": 0}, "s": {"align": "left"}})
+    assert cells(html) == ["1", "a&lt;b", "1.00", "1,234,567", "c&amp;d", "e"]
+
+
+def numbers(rows, start=0):
+    rng = np.random.default_rng(start)
+    return pd.DataFrame({"x": rng.standard_normal(rows), "name": ["r<%d>" % i for i in range(start, start + rows)], "n": np.arange(start, start + rows)}, index=pd.RangeIndex(start, start + rows))
+
+
+def split(df, size):
+    return [df.iloc[i : i + size] for i in range(0, len(df), size)]
+
+
+@pytest.mark.parametrize("rows", [1, 15, 16, 40])
+@pytest.mark.parametrize("size", [1, 7, 16, 100])
+@pytest.mark.parametrize("sortable", [False, True])
+@pytest.mark.parametrize("last_row_is_footer", [False, True])
+def test_table_chunks_equal_table(rows, size, sortable, last_row_is_footer):
+    df = numbers(rows)
+    col_format = {"n": {"decimal_places": 0}, "name": {"align": "left"}}
+    expected = idealreport.create_html.table(df, sortable=sortable, last_row_is_footer=last_row_is_footer, col_format=col_format)
+    html = "".join(idealreport.create_html.table_chunks(split(df, size), sortable=sortable, last_row_is_footer=last_row_is_footer, col_format=col_format))
+    assert html == expected
+    if last_row_is_footer:
+        assert "<tfoot>" in html
+
+
+def test_table_chunks_errors():
+    with pytest.raises(Exception, match="no chunks"):
+        "".join(idealreport.create_html.table_chunks([]))
+    with pytest.raises(Exception, match="same columns"):
+        "".join(idealreport.create_html.table_chunks([numbers(2), numbers(2)[["x"]]]))
+
+
+def peak_memory(chunk_count, chunk_rows=2000):
+    """ peak memory (bytes) of streaming a table of chunk_count chunks created one at a time to a null file """
+    sink = idealreport.sink.HtmlSink(open(os.devnull, "w"), buffer_size=1 << 16, close_file=True)
+    chunks = (numbers(chunk_rows, i * chunk_rows) for i in range(chunk_count))
+    tracemalloc.start()
+    try:
+        for html in idealreport.create_html.table_chunks(chunks):
+            sink += html
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        sink.close()
+
+
+def test_table_chunks_memory_is_bounded_by_one_chunk():
+    small = peak_memory(3)
+    large = peak_memory(30)  # 10 times the rows and HTML
+    assert large < 1.5 * small
+
+
+def test_reporter_table_chunks(tmp_path):
+    df = numbers(50)
+    r = idealreport.Reporter("t", str(tmp_path / "r.html"), stream=True, buffer_size=256, profile=True)
+    r.table_chunks(split(df, 8), last_row_is_footer=True)
+    r.generate()
+    html = open(str(tmp_path / "r.html")).read()
+    assert idealreport.create_html.table(df, last_row_is_footer=True) in html
+    (record,) = r.context.profile
+    assert (record["rows"], record["cells"]) == (50, 150)
@@ -0,0 +1,102 @@
+""" tests of idealreport.timeaxis and PlotSpec.time(skip_gaps=True) """
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import idealreport
+
+DAY = 86400.0
+
+
+def minute_bars(days, start="2021-03-01"):
+    """ 9:30 to 16:00 every business day """
+    sessions = [pd.date_range(day + pd.Timedelta("9h30min"), day + pd.Timedelta("16h"), freq="min") for day in pd.bdate_range(start, periods=days)]
+    return sessions[0].append(sessions[1:])
+
+
+def test_weekends_of_daily_data_are_skipped():
+    index = pd.bdate_range("2021-01-01", periods=15)  # Friday to Thursday
+    x, segments = idealreport.timeaxis.gapless_axis(index)
+    assert x.tolist() == [i * DAY for i in range(15)]
+    mondays = np.flatnonzero(index.dayofweek == 0)
+    assert segments == [[0.0, int(index[0].value // 10 ** 6)]] + [[i * DAY, int(index[i].value // 10 ** 6)] for i in mondays]
+
+
+def test_nights_of_minute_bars_are_skipped():
+    index = minute_bars(3)
+    x, segments = idealreport.timeaxis.gapless_axis(index)
+    assert np.diff(x).tolist() == [60.0] * (len(index) - 1)
+    assert len(segments) == 3
+    # the timestamp of each x is the segment's timestamp plus the elapsed seconds
+    for (i, t) in enumerate(index):
+        segment = [s for s in segments if s[0] <= x[i]][-1]
+        assert segment[1] + (x[i] - segment[0]) * 1000 == t.value // 10 ** 6
+
+
+def test_max_gap():
+    index = pd.DatetimeIndex(["2021-01-01", "2021-01-02", "2021-01-04", "2021-01-10"])
+    x, segments = idealreport.timeaxis.gapless_axis(index, max_gap="3D")
+    assert x.tolist() == [0.0, DAY, 3 * DAY, 5 * DAY]  # the gap of 6 days counts as the median spacing (2 days)
+    assert len(segments) == 2
+
+
+def test_small_and_invalid_indexes():
+    assert idealreport.timeaxis.gapless_axis(pd.DatetimeIndex([]))[0].tolist() == []
+    x, segments = idealreport.timeaxis.gapless_axis(pd.DatetimeIndex(["2021-01-01"]))
+    assert x.tolist() == [0.0] and len(segments) == 1
+    with pytest.raises(Exception, match="sorted"):
+        idealreport.timeaxis.gapless_axis(pd.DatetimeIndex(["2021-01-02", "2021-01-01"]))
+    with pytest.raises(Exception, match="DatetimeIndex"):
+        idealreport.timeaxis.gapless_axis(pd.Index([1, 2]))
+
+
+def test_time_zones_use_wall_clock_times():
+    index = minute_bars(2)
+    x = idealreport.timeaxis.gapless_axis(index)[0]
+    x_tz, segments_tz = idealreport.timeaxis.gapless_axis(index.tz_localize("America/New_York"))
+    assert x_tz.tolist() == x.tolist()
+    assert segments_tz[0][1] == index[0].value // 10 ** 6
+
+
+def test_axis_ticks_levels():
+    index = pd.bdate_range("2018-01-01", "2020-12-31")
+    x = idealreport.timeaxis.gapless_axis(index)[0]
+    tickvals, ticktext = idealreport.timeaxis.axis_ticks(index, x, max_ticks=10)
+    assert 5 <= len(tickvals) <= 10
+    assert ticktext[0] == "Jan 2018" and all(len(text.split()) == 2 for text in ticktext)  # months
+    positions = [int(np.flatnonzero(x == v)[0]) for v in tickvals]
+    assert all(index[i].month != index[i - 1].month for i in positions[1:])
+
+    tickvals, ticktext = idealreport.timeaxis.axis_ticks(index, x, time_format="%Y-%m", max_ticks=3)
+    assert ticktext == ["2018-01", "2019-01", "2020-01"]
+
+
+def test_axis_ticks_intraday():
+    index = minute_bars(1)
+    x = idealreport.timeaxis.gapless_axis(index)[0]
+    tickvals, ticktext = idealreport.timeaxis.axis_ticks(index, x)
+    assert ticktext[:3] == ["09:30", "10:00", "11:00"]  # the first timestamp, then each hour
+    assert tickvals[:3] == [0.0, 30 * 60.0, 90 * 60.0]
+    ticktext = idealreport.timeaxis.axis_ticks(minute_bars(3), idealreport.timeaxis.gapless_axis(minute_bars(3))[0])[1]
+    assert ticktext[0] == "Mar 01 09:30"  # hours of several days
+    assert idealreport.timeaxis.axis_ticks(pd.DatetimeIndex([]), np.zeros(0)) == ([], [])
+
+
+def test_time_skip_gaps():
+    index = pd.bdate_range("2021-01-01", periods=30)
+    df = pd.DataFrame({"a": np.arange(30.0)}, index=index)
+    plot_dict = idealreport.plot.PlotSpec().time(df, skip_gaps=True)
+    assert df.index is index  # the caller's df is unchanged
+    data = plot_dict["data"][0]["df"]
+    assert data.index.tolist() == [i * DAY for i in range(30)]
+    assert data["a"].tolist() == df["a"].tolist()
+    gap_axis = plot_dict["gapAxis"]
+    assert gap_axis["seconds"] is False
+    assert len(gap_axis["segments"]) == 1 + (index.dayofweek == 0).sum()
+    assert gap_axis["ticktext"] and len(gap_axis["tickvals"]) == len(gap_axis["ticktext"])
+
+    html = idealreport.plot.PlotSpec(return_html=True).time(df, skip_gaps=True)
+    assert '"gapAxis": {"segments": [[0.0, %d]' % (index[0].value // 10 ** 6) in html
+    with pytest.raises(Exception, match="skip_gaps"):
+        idealreport.plot.PlotSpec().time(df, skip_gaps=True, live=True)